@@ -0,0 +1,9 @@
+CREATE TABLE `race_pair_counts` (
+  `model_id_1` int NOT NULL,
+  `model_id_2` int NOT NULL,
+  `occurence` int NOT NULL DEFAULT 0,
+  PRIMARY KEY (`model_id_1`, `model_id_2`),
+  KEY `ix_race_pair_counts_occurence` (`occurence`),
+  CONSTRAINT `race_pair_counts_model_id_1_fk` FOREIGN KEY (`model_id_1`) REFERENCES `racer_models` (`id`),
+  CONSTRAINT `race_pair_counts_model_id_2_fk` FOREIGN KEY (`model_id_2`) REFERENCES `racer_models` (`id`)
+);
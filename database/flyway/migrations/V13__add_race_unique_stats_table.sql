@@ -0,0 +1,33 @@
+CREATE TABLE `race_unique_stats` (
+  `race_unique_id` VARCHAR(32) NOT NULL,
+  `upvotes` int NOT NULL DEFAULT 0,
+  `downvotes` int NOT NULL DEFAULT 0,
+  `comment_count` int NOT NULL DEFAULT 0,
+  `times_raced` int NOT NULL DEFAULT 0,
+  `last_raced_at` TIMESTAMP NULL,
+  PRIMARY KEY (`race_unique_id`),
+  CONSTRAINT `race_unique_stats_race_unique_id_fk` FOREIGN KEY (`race_unique_id`) REFERENCES `race_unique` (`id`)
+);
+
+INSERT INTO race_unique_stats
+  (race_unique_id, upvotes, downvotes, comment_count, times_raced, last_raced_at)
+SELECT
+  race_unique.id,
+  COALESCE(votes.upvotes, 0),
+  COALESCE(votes.downvotes, 0),
+  COALESCE(comments.comment_count, 0),
+  COALESCE(races.times_raced, 0),
+  races.last_raced_at
+FROM race_unique
+LEFT JOIN (
+  SELECT race_unique_id, SUM(vote = 1) AS upvotes, SUM(vote = 0) AS downvotes
+  FROM race_votes GROUP BY race_unique_id
+) votes ON votes.race_unique_id = race_unique.id
+LEFT JOIN (
+  SELECT race_unique_id, COUNT(*) AS comment_count
+  FROM race_comments GROUP BY race_unique_id
+) comments ON comments.race_unique_id = race_unique.id
+LEFT JOIN (
+  SELECT race_unique_id, COUNT(*) AS times_raced, MAX(created_at) AS last_raced_at
+  FROM race_history GROUP BY race_unique_id
+) races ON races.race_unique_id = race_unique.id;
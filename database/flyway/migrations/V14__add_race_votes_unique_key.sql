@@ -0,0 +1,25 @@
+-- One vote per user and race. Duplicates left behind by concurrent double
+-- votes are deleted in place, keeping the newest, so race_votes and its
+-- foreign keys stay put if a step fails. race_votes has no key to order by,
+-- so a temporary one numbers the rows in the order they were inserted.
+ALTER TABLE `race_votes`
+  ADD COLUMN `dedup_id` int NOT NULL AUTO_INCREMENT PRIMARY KEY;
+
+DELETE older FROM race_votes older
+JOIN race_votes newer
+  ON newer.race_unique_id = older.race_unique_id
+  AND newer.user_id = older.user_id
+  AND newer.dedup_id > older.dedup_id;
+
+ALTER TABLE `race_votes`
+  DROP COLUMN `dedup_id`,
+  ADD UNIQUE KEY `race_votes_race_unique_id_user_id_uk` (`race_unique_id`, `user_id`);
+
+UPDATE race_unique_stats
+LEFT JOIN (
+  SELECT race_unique_id, SUM(vote = 1) AS upvotes, SUM(vote = 0) AS downvotes
+  FROM race_votes GROUP BY race_unique_id
+) votes ON votes.race_unique_id = race_unique_stats.race_unique_id
+SET
+  race_unique_stats.upvotes = COALESCE(votes.upvotes, 0),
+  race_unique_stats.downvotes = COALESCE(votes.downvotes, 0);
@@ -0,0 +1,8 @@
+CREATE TABLE `race_combination_counts` (
+  `race_unique_id` VARCHAR(32) NOT NULL,
+  `racer_count` tinyint NOT NULL,
+  `model_ids` VARCHAR(64) NOT NULL,
+  `occurence` int NOT NULL DEFAULT 0,
+  PRIMARY KEY (`race_unique_id`),
+  KEY `ix_race_combination_counts_racer_count_occurence` (`racer_count`, `occurence`)
+);
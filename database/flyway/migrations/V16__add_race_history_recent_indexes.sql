@@ -0,0 +1,3 @@
+ALTER TABLE
+  race_history ADD KEY `ix_race_history_user_id_created_at_id` (`user_id`, `created_at`, `id`),
+  ADD KEY `ix_race_history_created_at_id` (`created_at`, `id`);
@@ -0,0 +1,8 @@
+CREATE TABLE `race_id_sequence` (
+  `id` tinyint NOT NULL,
+  `next_id` int NOT NULL,
+  PRIMARY KEY (`id`)
+);
+
+INSERT INTO race_id_sequence (id, next_id)
+SELECT 1, COALESCE(MAX(id), 0) + 1 FROM race_history;
@@ -0,0 +1,3 @@
+ALTER TABLE
+  user_sessions ADD KEY `ix_user_sessions_token` (`token`),
+  ADD KEY `ix_user_sessions_expire` (`expire`);
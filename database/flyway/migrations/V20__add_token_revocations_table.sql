@@ -0,0 +1,12 @@
+CREATE TABLE `token_revocations` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `token_version` int NOT NULL,
+  `expire` int NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `ix_token_revocations_expire` (`expire`),
+  CONSTRAINT `token_revocations_user_id_fk` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
+);
+
+INSERT INTO token_revocations (user_id, token_version, expire)
+SELECT id, token_version, UNIX_TIMESTAMP() + 1209600 FROM users WHERE token_version > 0;
@@ -29,7 +29,7 @@ class RaceListing {
 
   addRow(race) {
     let row = _el('div', {className: 'popular-pair-row'});
-    row.addEventListener('click', () => this.newRace(race.race_id));
+    row.addEventListener('click', () => this.newRace(race));
 
     let vsItem = _el('span', {innerHTML: 'VS', className: 'vs-text'});
     row.innerHTML = race.racers.map(
@@ -39,8 +39,12 @@ class RaceListing {
     this.container.appendChild(row);
   }
 
-  newRace(raceId) {
-    racingPage.runRace(false, raceId);
+  newRace(race) {
+    if (race.race_id) {
+      racingPage.runRace(false, race.race_id);
+    } else {
+      racingPage.runRaceFromRacers(race.racers);
+    }
     if (this.window_) _hide(this.window_);
   }
 }
@@ -76,13 +76,6 @@ class Racer {
     );
   }
 
-  static async fromApi(make, model, year, race) {
-    let data = await _get(
-      `${RACING_API_URL}/racer?make=${make}&model=${model}&year=${year}`
-    );
-    if (data) return Racer.fromData(data, race);
-  }
-
   static fromData(data, race) {
     return new Racer(
       data.model_id,
@@ -198,15 +191,18 @@ class Race {
   }
 
   async setRacersFromForm() {
+    let lookups = [];
     for (let item of inputsContainer.children) {
       let make = item.children[0].value.trim();
       let model = item.children[1].value.trim();
       let year = item.children[2].value.trim();
-      if (make && model && year) {
-        let racer = await Racer.fromApi(make, model, year, this);
-        if (racer) this.racers.push(racer);
-      }
+      if (make && model && year) lookups.push({make, model, year});
     };
+    if (lookups.length == 0) return;
+    let result = await _post(`${RACING_API_URL}/racer/batch`, {racers: lookups});
+    result.racers.forEach((item) => {
+      if (item.found) this.racers.push(Racer.fromData(item.racer, this));
+    });
   }
 
   async setRacersFromRaceId(raceId) {
@@ -456,6 +452,17 @@ class Racing {
     await this.race.race(save, skip);
   }
 
+  async runRaceFromRacers(racers) {
+    // Never raced on its own yet - load from racer data and save
+    this.race = new Race();
+    racers.forEach((racer) => this.race.racers.push(
+      Racer.fromData(racer, this.race)
+    ));
+    this.setInputsFromRace();
+    this.inputState = this.getInputState();
+    await this.race.race(true, false);
+  }
+
   checkSharedRace() {
     let sharedUrlMatch = window.location.pathname.match("/r/\([0-9]+)/?$");
     if (sharedUrlMatch) {
@@ -0,0 +1,62 @@
+"""
+Measures how many DB-bound requests one server handles at once.
+
+python -m scripts.benchmark_concurrency [--url http://localhost:8000]
+    [--path /api/racing/race/votes?race_unique_id=benchmark] [--requests 500]
+
+Sends the same GET from 1, 8 and 32 clients at a time and reports throughput
+and latency for each. Start a single uvicorn worker (no --reload) and run it
+once against a build before this change and once after. Before, throughput
+stays flat as clients are added because every query blocks the event loop.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+_CLIENTS = (1, 8, 32)
+
+_sessions = threading.local()
+
+
+def _get(url: str) -> float:
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    start = time.perf_counter()
+    _sessions.session.get(url).raise_for_status()
+    return time.perf_counter() - start
+
+
+def run(url: str, count: int, clients: int) -> tuple[float, list[float]]:
+    with ThreadPoolExecutor(clients) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(_get, [url] * count))
+    return time.perf_counter() - start, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument(
+        "--path", default="/api/racing/race/votes?race_unique_id=benchmark"
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    url = args.url + args.path
+    _get(url)
+    for clients in _CLIENTS:
+        elapsed, latencies = run(url, args.requests, clients)
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{clients:>3} clients: {args.requests / elapsed:,.0f} req/s"
+            f"  p50 {quantiles[49] * 1000:.1f} ms  p99 {quantiles[98] * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measures race engine throughput.
+
+python -m scripts.benchmark_race_engine [--races 10000] [--racers 6]
+
+Scores synthetic races in a single batch through the vectorized engine and
+then, for a slice of them, one at a time through a scalar loop equivalent to
+Racer.move in frontend/race.js.
+"""
+
+import argparse
+import math
+import random
+import time
+from collections import namedtuple
+
+from src.racing.engine import TRACK_LENGTH, rank_races
+
+_SCALAR_RACES = 500
+
+BenchRacer = namedtuple(
+    "BenchRacer", ("id", "power", "torque", "weight", "weight_type")
+)
+
+
+def make_races(count: int, racers: int, seed: int = 1) -> list[list[BenchRacer]]:
+    rng = random.Random(seed)
+    return [
+        [
+            BenchRacer(
+                id=model_id,
+                power=rng.randint(5, 300),
+                torque=rng.randint(5, 250),
+                weight=rng.randint(80, 400),
+                weight_type=rng.choice(["dry", "wet"]),
+            )
+            for model_id in range(racers)
+        ]
+        for _ in range(count)
+    ]
+
+
+def scalar_race(racers: list[BenchRacer]) -> list[int]:
+    finished: dict[int, int] = {}
+    for index, racer in enumerate(racers):
+        weight = racer.weight + 20 if racer.weight_type == "dry" else racer.weight
+        ptw, acc = racer.power / weight / 5, racer.torque / weight / 5
+        progress, position, tick = racer.torque / 25, 0.0, 0
+        while math.floor(position) <= TRACK_LENGTH:
+            position = math.floor(position) + acc * progress + 1 + ptw * progress
+            progress += 0.3
+            tick += 1
+        finished[index] = tick
+    return sorted(finished, key=lambda index: finished[index])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--races", type=int, default=10_000)
+    parser.add_argument("--racers", type=int, default=6)
+    args = parser.parse_args()
+
+    races = make_races(args.races, args.racers)
+
+    start = time.perf_counter()
+    rank_races(races)  # type: ignore
+    elapsed = time.perf_counter() - start
+    print(f"  numpy: {args.races / elapsed:12.0f} races/s ({elapsed:.3f} s)")
+
+    sample = races[:_SCALAR_RACES]
+    start = time.perf_counter()
+    for racers in sample:
+        scalar_race(racers)
+    elapsed = time.perf_counter() - start
+    print(f" scalar: {len(sample) / elapsed:12.0f} races/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares direct race saves against the write-behind save buffer.
+
+python -m scripts.benchmark_race_saves [--saves 2000] [--racers 3]
+
+Both modes save the same random races through save_race into the configured
+database (DB_* env vars), so run it against a scratch copy. For the buffer,
+"reply" is how fast save_race returns and "durable" includes draining the
+queue with close().
+"""
+
+import argparse
+import random
+import time
+
+from src.racing import service
+from src.racing.catalog import get_catalog
+from src.racing.save_buffer import RaceSaveBuffer
+
+
+def make_races(count: int, racers: int, seed: int = 1) -> list[list[int]]:
+    rng = random.Random(seed)
+    model_ids = list(get_catalog().racers)
+    return [rng.sample(model_ids, racers) for _ in range(count)]
+
+
+def run_direct(races: list[list[int]]) -> float:
+    service.race_save_buffer = None
+    start = time.perf_counter()
+    for model_ids in races:
+        service.save_race(model_ids)
+    return time.perf_counter() - start
+
+
+def run_buffered(races: list[list[int]]) -> tuple[float, float]:
+    buffer = RaceSaveBuffer()
+    service.race_save_buffer = buffer
+    start = time.perf_counter()
+    for model_ids in races:
+        service.save_race(model_ids)
+    replied = time.perf_counter() - start
+    buffer.close()
+    return replied, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--saves", type=int, default=2000)
+    parser.add_argument("--racers", type=int, default=3)
+    args = parser.parse_args()
+
+    races = make_races(args.saves, args.racers)
+    direct = run_direct(races)
+    replied, durable = run_buffered(races)
+
+    print(f"   direct: {args.saves / direct:,.0f} saves/s")
+    print(f" buffered: {args.saves / replied:,.0f} saves/s (reply)")
+    print(f"           {args.saves / durable:,.0f} saves/s (durable)")
+
+
+if __name__ == "__main__":
+    main()
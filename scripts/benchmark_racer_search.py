@@ -0,0 +1,139 @@
+"""
+Compares the in-memory racer catalog against the SQL search path.
+
+python -m scripts.benchmark_racer_search [--models 100000] [--sql]
+
+The index is always benchmarked over synthetic rows. With --sql, the same rows
+are inserted into the configured database (DB_* env vars) under a temporary
+make, queried through build_search_racer_query, then removed again.
+"""
+
+import argparse
+import random
+import string
+import time
+from collections import namedtuple
+from typing import Callable
+
+from sqlalchemy import delete, text
+
+from src.racing.catalog import RacerCatalog
+
+_LIMIT = 10
+_QUERIES = 2000
+_BENCH_MAKES = ("Benchmark Alpha", "Benchmark Beta", "Benchmark Gamma")
+
+BenchRacer = namedtuple("BenchRacer", ("id", "name", "make", "make_name", "year"))
+
+
+def _random_name(rng: random.Random) -> str:
+    word = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 6)))
+    return f"{word} {rng.randint(50, 1400)}{rng.choice(['', ' R', ' S', '-X'])}"
+
+
+def make_racers(count: int, make_ids: list[int], seed: int = 1) -> list[BenchRacer]:
+    rng = random.Random(seed)
+    return [
+        BenchRacer(
+            id=model_id,
+            name=_random_name(rng),
+            make=(make := rng.choice(make_ids)),
+            make_name=_BENCH_MAKES[make_ids.index(make)],
+            year=rng.randint(1990, 2023),
+        )
+        for model_id in range(1, count + 1)
+    ]
+
+
+def make_queries(racers: list[BenchRacer], seed: int = 2) -> list[tuple[str, str, str]]:
+    """Keystroke-style queries: growing prefixes of real make and model names."""
+    rng = random.Random(seed)
+    queries: list[tuple[str, str, str]] = []
+    while len(queries) < _QUERIES:
+        racer = rng.choice(racers)
+        for i in range(1, len(racer.name) + 1):
+            queries.append((racer.make_name[:9], racer.name[:i], ""))
+    return queries[:_QUERIES]
+
+
+def run(name: str, search: Callable[[str, str, str], list], queries: list) -> None:
+    start = time.perf_counter()
+    for make, model, year in queries:
+        search(make, model, year)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8}: {elapsed / len(queries) * 1e6:10.1f} us/query")
+
+
+def bench_sql(racers: list[BenchRacer], queries: list) -> None:
+    from src.database import engine as db
+    from src.database import racer_makes_table, racer_models_table
+    from src.racing.queries import build_search_racer_query
+
+    with db.connect() as conn:
+        make_ids = []
+        for make_name in _BENCH_MAKES:
+            result = conn.execute(
+                text("INSERT INTO racer_makes (name) VALUES (:name)"),
+                {"name": make_name},
+            )
+            make_ids.append(result.lastrowid)
+        conn.execute(
+            text(
+                "INSERT INTO racer_models (name, make, year) VALUES (:name, :make, :year)"
+            ),
+            [
+                {
+                    "name": racer.name,
+                    "make": make_ids[_BENCH_MAKES.index(racer.make_name)],
+                    "year": racer.year,
+                }
+                for racer in racers
+            ],
+        )
+        conn.commit()
+        try:
+            run(
+                "sql",
+                lambda make, model, year: list(
+                    conn.execute(
+                        build_search_racer_query(make, model, year).limit(_LIMIT)
+                    )
+                ),
+                queries,
+            )
+        finally:
+            conn.execute(
+                delete(racer_models_table).where(
+                    racer_models_table.c.make.in_(make_ids)
+                )
+            )
+            conn.execute(
+                delete(racer_makes_table).where(racer_makes_table.c.id.in_(make_ids))
+            )
+            conn.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", type=int, default=100_000)
+    parser.add_argument("--sql", action="store_true")
+    args = parser.parse_args()
+
+    racers = make_racers(args.models, make_ids=[1, 2, 3])
+    queries = make_queries(racers)
+
+    start = time.perf_counter()
+    catalog = RacerCatalog(racers, list(_BENCH_MAKES))  # type: ignore
+    print(f"   build: {time.perf_counter() - start:10.3f} s ({args.models} models)")
+    run(
+        "index",
+        lambda make, model, year: catalog.search(make, model, year, limit=_LIMIT),
+        queries,
+    )
+
+    if args.sql:
+        bench_sql(racers, queries)
+
+
+if __name__ == "__main__":
+    main()
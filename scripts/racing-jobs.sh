@@ -0,0 +1 @@
+poetry run python -m src.racing.jobs "$@"
@@ -1,25 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, TypeVar
+
 from fastapi import Cookie, HTTPException, status
 from sqlalchemy import Row
 
+from src.tokens import TokenUser, is_signed_token, verify_signed_token
 from src.user.service import get_user_by_token
 
 SESSION_KEY_NAME = "session_token"
 
+_SESSION_CACHE_SECONDS = 10
+_MAX_CACHED_SESSIONS = 10_000
+_BOGUS_TOKEN_SECONDS = 10
+_MAX_BOGUS_TOKENS = 10_000
+
+_Value = TypeVar("_Value")
+
+
+class _ExpiringLRU(Generic[_Value]):
+    """LRU where every entry also has its own expiry time."""
+
+    def __init__(self, max_items: int) -> None:
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, tuple[float, _Value]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> None | _Value:
+        with self._lock:
+            if (item := self._items.get(key)) is None:
+                return None
+            if item[0] <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, value: _Value, expires_at: float) -> None:
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def pop_where(self, test: Callable[[_Value], bool]) -> None:
+        with self._lock:
+            for key in [key for key, (_, value) in self._items.items() if test(value)]:
+                del self._items[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class SessionCache:
+    """
+    Users by session token, so auth doesn't query on every request. A session
+    is held for up to _SESSION_CACHE_SECONDS and never past its own expiry.
+    Tokens with no session are remembered for a shorter time, so floods of
+    bogus cookies don't each reach the database.
+
+    The cache is per process. Logout, user edits and deletes clear the entries
+    of the worker that handled them. Other workers catch up within
+    _SESSION_CACHE_SECONDS, as the lookup skips deleted users and deleting a
+    user also deletes their sessions. Routes that must not act on a stale
+    session use auth_required_fresh, which revalidates it first.
+    """
 
-def _auth(session_token: str | None) -> None | Row:
-    if session_token and (user := get_user_by_token(session_token)):
+    def __init__(self) -> None:
+        self.sessions: _ExpiringLRU[Row] = _ExpiringLRU(_MAX_CACHED_SESSIONS)
+        self.bogus: _ExpiringLRU[bool] = _ExpiringLRU(_MAX_BOGUS_TOKENS)
+
+    def get_user(self, token: str) -> None | Row:
+        if (user := self.sessions.get(token)) is not None:
+            return user
+        if self.bogus.get(token):
+            return None
+        now = time.time()
+        if user := get_user_by_token(token):
+            expires_at = min(now + _SESSION_CACHE_SECONDS, user.expire)
+            self.sessions.put(token, user, expires_at)
+        else:
+            self.bogus.put(token, True, now + _BOGUS_TOKEN_SECONDS)
         return user
 
+    def revalidate(self, token: str) -> None | Row:
+        """Looks the session up again, replacing or dropping its entry."""
+        self.sessions.pop(token)
+        return self.get_user(token)
+
+    def forget_session(self, token: str) -> None:
+        self.sessions.pop(token)
+
+    def forget_user(self, user_id: int) -> None:
+        self.sessions.pop_where(lambda user: user.id == user_id)
+
+    def clear(self) -> None:
+        self.sessions.clear()
+        self.bogus.clear()
+
+
+session_cache = SessionCache()
+
+
+def _auth(session_token: str | None, fresh: bool = False) -> None | Row | TokenUser:
+    if not session_token:
+        return None
+    if is_signed_token(session_token):
+        return verify_signed_token(session_token)
+    if fresh:
+        return session_cache.revalidate(session_token)
+    return session_cache.get_user(session_token)
+
 
 def get_token(session_token: None | str = Cookie(None)) -> None | str:
     return session_token
 
 
-def auth_required(session_token: None | str = Cookie(None)) -> Row:
+def auth_required(session_token: None | str = Cookie(None)) -> Row | TokenUser:
     if user := _auth(session_token):
         return user
     raise HTTPException(status.HTTP_403_FORBIDDEN)
 
 
-def auth_optional(session_token: None | str = Cookie(None)) -> None | Row:
+def auth_required_fresh(session_token: None | str = Cookie(None)) -> Row | TokenUser:
+    """auth_required that doesn't trust a cached session, for actions that
+    must not go through after a logout or delete on another worker."""
+    if user := _auth(session_token, fresh=True):
+        return user
+    raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+
+def auth_optional(
+    session_token: None | str = Cookie(None),
+) -> None | Row | TokenUser:
     return _auth(session_token)
@@ -1,21 +1,31 @@
 import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Iterator, ParamSpec, TypeVar
 
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import (
     Boolean,
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     String,
     Table,
+    UniqueConstraint,
     create_engine,
+    event,
 )
-from sqlalchemy.engine.base import Engine
+from sqlalchemy.engine.base import Connection, Engine
 
 ### CONNECTION ###
 
 DB_URL = "mysql://{user}:{password}@{host}:{port}/{database}"
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
 
 
 def _create_engine() -> Engine:
@@ -32,12 +42,122 @@ def _create_engine() -> Engine:
         url,
         connect_args={"auth_plugin": "mysql_native_password"},
         pool_pre_ping=True,
+        # Routes run queries on the threadpool, which has 40 threads by default.
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
     )
 
 
 engine = _create_engine()
 
 
+class _PoolCheckouts:
+    """Connections taken from the engine's pool since the process started."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, *args: object) -> None:
+        with self._lock:
+            self.count += 1
+
+
+pool_checkouts = _PoolCheckouts()
+event.listen(engine, "checkout", pool_checkouts.add)
+
+
+class _RequestConnection:
+    """A request's connection, checked out the first time it is used so
+    requests that never query don't take one from the pool."""
+
+    def __init__(self) -> None:
+        self._conn: Connection | None = None
+
+    def get(self) -> Connection:
+        if self._conn is None:
+            self._conn = engine.connect()
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_request_connection: ContextVar[_RequestConnection | None] = ContextVar(
+    "request_connection", default=None
+)
+
+
+@contextmanager
+def connect() -> Iterator[Connection]:
+    """
+    The current request's connection inside request_scope, otherwise a new
+    one from the pool. Services commit their own writes either way. A shared
+    connection is left open on exit and rolled back if the block raised.
+    """
+    if (request := _request_connection.get()) is None:
+        with engine.connect() as conn:
+            yield conn
+        return
+    conn = request.get()
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+@contextmanager
+def request_scope() -> Iterator[None]:
+    """Every connect() inside shares one connection, closed on exit."""
+    request = _RequestConnection()
+    token = _request_connection.set(request)
+    try:
+        yield
+    finally:
+        _request_connection.reset(token)
+        request.close()
+
+
+async def request_connection() -> AsyncIterator[None]:
+    """
+    Router dependency that gives each request at most one pool checkout.
+    Sync dependencies and run_in_threadpool copy the request's context, so
+    services called on worker threads get the same connection.
+    """
+    request = _RequestConnection()
+    token = _request_connection.set(request)
+    try:
+        yield
+    finally:
+        _request_connection.reset(token)
+        # Closing rolls back anything left open, which is a round trip
+        await run_in_threadpool(request.close)
+
+
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+
+
+async def run_on_own_connection(
+    func: Callable[_P, _T], *args: _P.args, **kwargs: _P.kwargs
+) -> _T:
+    """
+    run_in_threadpool with a connection of its own rather than the request's,
+    so independent queries of one request can run at the same time. Each call
+    takes its own pool checkout.
+    """
+
+    def _run() -> _T:
+        with request_scope():
+            return func(*args, **kwargs)
+
+    result: _T = await run_in_threadpool(_run)
+    return result
+
+
 ##############
 ### TABLES ###
 ##############
@@ -53,6 +173,7 @@ users_table = Table(
     Column("email", String(500)),
     Column("password", String(500)),
     Column("deleted", Boolean),
+    Column("token_version", Integer),
 )
 
 
@@ -93,6 +214,16 @@ race_history_table = Table(
     Column("created_at", DateTime),
     Column("user_id", Integer, ForeignKey(users_table.c.id)),
     Column("race_unique_id", Integer, ForeignKey(race_unique_table.c.id)),
+    Index("ix_race_history_user_id_created_at_id", "user_id", "created_at", "id"),
+    Index("ix_race_history_created_at_id", "created_at", "id"),
+)
+
+
+race_id_sequence_table = Table(
+    "race_id_sequence",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("next_id", Integer),
 )
 
 
@@ -102,6 +233,7 @@ race_votes_table = Table(
     Column("race_unique_id", Integer, ForeignKey(race_unique_table.c.id)),
     Column("user_id", Integer, ForeignKey(users_table.c.id)),
     Column("vote", Integer),
+    UniqueConstraint("race_unique_id", "user_id"),
 )
 
 race_racers_table = Table(
@@ -112,12 +244,67 @@ race_racers_table = Table(
 )
 
 
+race_pair_counts_table = Table(
+    "race_pair_counts",
+    metadata,
+    Column(
+        "model_id_1", Integer, ForeignKey(racer_models_table.c.id), primary_key=True
+    ),
+    Column(
+        "model_id_2", Integer, ForeignKey(racer_models_table.c.id), primary_key=True
+    ),
+    Column("occurence", Integer, index=True),
+)
+
+
+race_combination_counts_table = Table(
+    "race_combination_counts",
+    metadata,
+    Column("race_unique_id", String(32), primary_key=True),
+    Column("racer_count", Integer),
+    Column("model_ids", String(64)),
+    Column("occurence", Integer),
+    Index(
+        "ix_race_combination_counts_racer_count_occurence", "racer_count", "occurence"
+    ),
+)
+
+
+race_unique_stats_table = Table(
+    "race_unique_stats",
+    metadata,
+    Column(
+        "race_unique_id",
+        String(32),
+        ForeignKey(race_unique_table.c.id),
+        primary_key=True,
+    ),
+    Column("upvotes", Integer),
+    Column("downvotes", Integer),
+    Column("comment_count", Integer),
+    Column("times_raced", Integer),
+    Column("last_raced_at", DateTime),
+)
+
+
 user_sessions_table = Table(
     "user_sessions",
     metadata,
     Column("token", String(32)),
     Column("user_id", Integer, ForeignKey(users_table.c.id)),
     Column("expire", Integer),
+    Index("ix_user_sessions_token", "token"),
+    Index("ix_user_sessions_expire", "expire"),
+)
+
+token_revocations_table = Table(
+    "token_revocations",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, ForeignKey(users_table.c.id)),
+    Column("token_version", Integer),
+    Column("expire", Integer),
+    Index("ix_token_revocations_expire", "expire"),
 )
 
 user_garage_table = Table(
@@ -7,10 +7,16 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from starlette.responses import FileResponse
 
+from src.racing.catalog import reload_catalog
+from src.racing.catalog import start_polling as start_catalog_polling
+from src.racing.recent import recent_races, start_polling
 from src.racing.routes import router as racing_api_router
+from src.racing.save_buffer import close_save_buffer
 from src.social.routes import router as social_api_router
 from src.startup import run_startup_sequence
+from src.tokens import start_polling as start_token_polling
 from src.user.routes import router as user_api_router
+from src.user.sweeper import start_sweeping
 
 _FE_DIR = os.path.join(os.getcwd(), "frontend")
 
@@ -22,6 +28,33 @@ app.include_router(social_api_router)
 app.mount("/static", StaticFiles(directory=_FE_DIR), name="static")
 
 
+@app.on_event("startup")
+def _load_catalog() -> None:
+    reload_catalog()
+    start_catalog_polling()
+
+
+@app.on_event("startup")
+def _load_recent_races() -> None:
+    recent_races.seed()
+    start_polling()
+
+
+@app.on_event("startup")
+def _load_token_versions() -> None:
+    start_token_polling()
+
+
+@app.on_event("startup")
+def _sweep_user_sessions() -> None:
+    start_sweeping()
+
+
+@app.on_event("shutdown")
+def _drain_save_buffer() -> None:
+    close_save_buffer()
+
+
 @app.get("/intro.html")
 async def intro() -> FileResponse:
     return FileResponse(os.path.join(_FE_DIR, "intro.html"))
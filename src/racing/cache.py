@@ -0,0 +1,132 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+
+from pydantic import BaseModel
+from sqlalchemy import Row
+
+from src.database import run_on_own_connection
+from src.racing.catalog import get_catalog
+from src.racing.models import Race
+from src.racing.service import RaceRecord, get_race_rows, get_races, get_races_racers
+
+_MAX_CACHED_RACES = 10_000
+_MAX_CACHED_BYTES = 32 * 1024 * 1024
+
+
+class RaceCache:
+    """
+    LRU of serialized races, bounded by count and total size. Races never
+    change once saved, so entries only ever leave through eviction.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int) -> None:
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._items: OrderedDict[int, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, race_id: int) -> bytes | None:
+        with self._lock:
+            if (payload := self._items.get(race_id)) is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(race_id)
+            return payload
+
+    def put(self, race_id: int, payload: bytes) -> None:
+        with self._lock:
+            if race_id in self._items:
+                return
+            self._items[race_id] = payload
+            self._size += len(payload)
+            while len(self._items) > self.max_items or self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+race_cache = RaceCache(_MAX_CACHED_RACES, _MAX_CACHED_BYTES)
+
+
+def serialize(model: BaseModel) -> bytes:
+    data: str = model.json(separators=(",", ":"))
+    return data.encode()
+
+
+def get_races_json(race_ids: list[int]) -> dict[int, bytes]:
+    payloads = {}
+    for race_id in race_ids:
+        if (payload := race_cache.get(race_id)) is not None:
+            payloads[race_id] = payload
+    missing = [race_id for race_id in race_ids if race_id not in payloads]
+    for race_id, (race, racers) in zip(missing, get_races(missing)):
+        if payload := _cache_race(race, racers):
+            payloads[race_id] = payload
+    return payloads
+
+
+def cache_race(race: RaceRecord, racers: list[Row]) -> bytes:
+    payload = serialize(Race.from_service(race, racers))
+    race_cache.put(race.id, payload)
+    return payload
+
+
+def _cache_race(race: None | Row, racers: list[Row]) -> bytes | None:
+    return cache_race(race, racers) if race and racers else None
+
+
+async def get_race_json(race_id: int) -> bytes | None:
+    """A race missing from the cache is read with its racers at the same time,
+    each on a connection of its own."""
+    if (payload := race_cache.get(race_id)) is not None:
+        return payload
+    races, racers = await asyncio.gather(
+        run_on_own_connection(get_race_rows, [race_id]),
+        run_on_own_connection(get_races_racers, [race_id]),
+    )
+    return _cache_race(races.get(race_id), racers[race_id])
+
+
+def get_listing_json(
+    races: list[tuple[None | int, list[int]]], next_cursor: None | str = None
+) -> bytes:
+    """Joins cached races into a RaceListing body. Entries without a race id
+    are built from the catalog and not cached."""
+    payloads = get_races_json([race_id for race_id, _ in races if race_id])
+    parts = []
+    for race_id, model_ids in races:
+        if race_id in payloads:
+            parts.append(payloads[race_id])
+        elif race_id is None and (racers := get_catalog().get_many(model_ids)):
+            parts.append(serialize(Race.from_racers(racers)))
+    return join_listing_json(parts, next_cursor)
+
+
+def join_listing_json(parts: list[bytes], next_cursor: None | str = None) -> bytes:
+    return (
+        b'{"races":['
+        + b",".join(parts)
+        + b'],"next_cursor":'
+        + json.dumps(next_cursor).encode()
+        + b"}"
+    )
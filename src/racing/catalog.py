@@ -0,0 +1,185 @@
+import hashlib
+import heapq
+import threading
+import time
+from array import array
+from collections import defaultdict
+from typing import Iterator
+
+from sqlalchemy import Row
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database import connect
+from src.racing.queries import (
+    _SEARCH_PATCHES,
+    build_get_catalog_version_query,
+    build_get_makes_query,
+    build_get_racers_by_id_query,
+    build_get_racers_query,
+)
+
+_NGRAM_SIZE = 3
+REFRESH_SECONDS = 30.0
+
+
+def normalise_model_name(name: str) -> str:
+    for before, target in _SEARCH_PATCHES.items():
+        name = name.replace(before, target)
+    return name.lower()
+
+
+def _ngrams(key: str, size: int = _NGRAM_SIZE) -> set[str]:
+    return {key[i : i + size] for i in range(len(key) - size + 1)}
+
+
+class MakeIndex:
+    """Case-insensitive substring search over make names, with every 1-3
+    character query answered up front."""
+
+    def __init__(self, names: list[str]) -> None:
+        self.names = sorted(names, key=str.lower)
+        self.version = hashlib.md5("\n".join(self.names).encode()).hexdigest()
+        self._answers: dict[str, list[str]] = defaultdict(list)
+        for name in self.names:
+            key = name.lower()
+            for size in range(1, _NGRAM_SIZE + 1):
+                for gram in _ngrams(key, size):
+                    self._answers[gram].append(name)
+
+    def search(self, make: str, limit: int) -> list[str]:
+        key = make.lower()
+        if not key:
+            return self.names[:limit]
+        answer = self._answers.get(key[:_NGRAM_SIZE], [])
+        if len(key) > _NGRAM_SIZE:
+            answer = [name for name in answer if key in name.lower()]
+        return answer[:limit]
+
+
+class RacerCatalog:
+    """In-memory equivalent of build_search_racer_query, using n-gram postings."""
+
+    def __init__(self, racers: list[Row], make_names: list[str]) -> None:
+        self.makes = MakeIndex(make_names)
+        self.racers: dict[int, Row] = {}
+        self._model_keys: dict[int, str] = {}
+        self._make_keys: dict[int, str] = {}
+        self._models_by_make: dict[int, array] = defaultdict(lambda: array("i"))
+        self._postings: dict[str, array] = defaultdict(lambda: array("i"))
+        self._by_make_model: dict[tuple[str, str], list[Row]] = defaultdict(list)
+
+        for racer in sorted(racers, key=lambda racer: racer.id):
+            key = normalise_model_name(racer.name)
+            self.racers[racer.id] = racer
+            self._by_make_model[racer.make_name.lower(), racer.name.lower()].append(
+                racer
+            )
+            self._model_keys[racer.id] = key
+            self._make_keys[racer.make] = racer.make_name.lower()
+            self._models_by_make[racer.make].append(racer.id)
+            for size in range(1, _NGRAM_SIZE + 1):
+                for gram in _ngrams(key, size):
+                    self._postings[gram].append(racer.id)
+
+    def _candidates(self, make_ids: list[int], model_key: str) -> Iterator[int]:
+        if not model_key:
+            return heapq.merge(*(self._models_by_make[make] for make in make_ids))
+        size = min(len(model_key), _NGRAM_SIZE)
+        postings = [self._postings.get(gram) for gram in _ngrams(model_key, size)]
+        if not all(postings):
+            return iter(())
+        return iter(min(postings, key=len))  # type: ignore
+
+    def get_many(self, model_ids: list[int]) -> list[Row]:
+        if all(model_id in self.racers for model_id in model_ids):
+            return [self.racers[model_id] for model_id in model_ids]
+        return []
+
+    def get(self, make: str, model: str, year: str | None) -> Row | None:
+        for racer in self._by_make_model.get((make.lower(), model.lower()), []):
+            if not year or year == str(racer.year):
+                return racer
+        return None
+
+    def search(self, make: str, model: str, year: str, limit: int) -> list[Row]:
+        make = make.lower()
+        make_ids = [make_id for make_id, key in self._make_keys.items() if make in key]
+        if not make_ids:
+            return []
+
+        make_id_set = set(make_ids)
+        model_key = normalise_model_name(model)
+        results = []
+        for model_id in self._candidates(make_ids, model_key):
+            racer = self.racers[model_id]
+            if (
+                racer.make in make_id_set
+                and model_key in self._model_keys[model_id]
+                and year in str(racer.year)
+            ):
+                results.append(racer)
+                if len(results) == limit:
+                    break
+        return results
+
+
+_catalog: RacerCatalog | None = None
+_catalog_version: tuple | None = None
+
+
+def reload_catalog() -> RacerCatalog:
+    global _catalog, _catalog_version
+    with connect() as conn:
+        version = tuple(conn.execute(build_get_catalog_version_query()).one())
+        racers = list(conn.execute(build_get_racers_query()))
+        make_names = [row.name for row in conn.execute(build_get_makes_query())]
+    _catalog = RacerCatalog(racers, make_names)
+    _catalog_version = version
+    return _catalog
+
+
+def refresh_catalog() -> bool:
+    """Reloads the catalog if models or makes were added or removed since it
+    was loaded, for example by sync_data. Edits to existing rows aren't seen."""
+    with connect() as conn:
+        version = tuple(conn.execute(build_get_catalog_version_query()).one())
+    if version == _catalog_version:
+        return False
+    reload_catalog()
+    return True
+
+
+def get_catalog() -> RacerCatalog:
+    return _catalog or reload_catalog()
+
+
+def lookup_racers(model_ids: list[int]) -> list[Row]:
+    """Like RacerCatalog.get_many, but ids the catalog hasn't loaded yet are
+    looked up in the database."""
+    if not model_ids:
+        return []
+    if racers := get_catalog().get_many(model_ids):
+        return racers
+    with connect() as conn:
+        rows = {
+            row.id: row for row in conn.execute(build_get_racers_by_id_query(model_ids))
+        }
+    if all(model_id in rows for model_id in model_ids):
+        return [rows[model_id] for model_id in model_ids]
+    return []
+
+
+def _poll(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            if refresh_catalog():
+                print("[CATALOG] Reloaded")
+        except SQLAlchemyError as error:
+            print(f"[CATALOG] Refresh failed: {error}")
+
+
+def start_polling(interval: float = REFRESH_SECONDS) -> threading.Thread:
+    thread = threading.Thread(target=_poll, args=(interval,), daemon=True)
+    thread.start()
+    return thread
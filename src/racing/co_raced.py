@@ -0,0 +1,174 @@
+"""
+"People who raced X also raced Y", from co-occurrence in race_racers.
+
+build_co_raced streams (race_id, model_id) rows ordered by race and sums
+every chunk's pairs into a sparse model x model CSR matrix, where cell (x, y)
+is the number of races with both x and y. Only the top neighbours of each
+model are kept and written to an .npz file as CSR-style arrays:
+
+    model_ids   models with any neighbours, sorted
+    indptr      neighbours of model_ids[i] are at indptr[i]:indptr[i + 1]
+    neighbours  model ids, most raced together first
+    counts      races shared with that neighbour
+
+Workers load the file into memory and reload it when a build replaces it.
+"""
+
+import os
+from typing import Iterable
+
+import numpy as np
+from scipy import sparse
+
+from src.database import engine as db
+from src.racing.queries import build_stream_race_racers_query
+
+CO_RACED_PATH = os.environ.get("CO_RACED_PATH", "/tmp/moto/co_raced.npz")
+TOP_NEIGHBOURS = 20
+
+_CHUNK_ROWS = 100_000
+
+
+class CoRacedBuilder:
+    """Accumulates chunks of (race_id, model_id) rows sorted by race_id. A race
+    split across two chunks is held back until the next chunk completes it."""
+
+    def __init__(self) -> None:
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.int32)
+        self._race_ids = np.empty(0, dtype=np.int64)
+        self._model_ids = np.empty(0, dtype=np.int64)
+
+    def add(self, race_ids: np.ndarray, model_ids: np.ndarray) -> None:
+        race_ids = np.concatenate([self._race_ids, race_ids])
+        model_ids = np.concatenate([self._model_ids, model_ids])
+        if not len(race_ids):
+            return
+        held = race_ids == race_ids[-1]
+        self._race_ids, self._model_ids = race_ids[held], model_ids[held]
+        self._add_races(race_ids[~held], model_ids[~held])
+
+    def finish(self) -> sparse.csr_matrix:
+        self._add_races(self._race_ids, self._model_ids)
+        self._race_ids = self._model_ids = np.empty(0, dtype=np.int64)
+        return self.matrix
+
+    def _add_races(self, race_ids: np.ndarray, model_ids: np.ndarray) -> None:
+        if not len(race_ids):
+            return
+        # One row per model per race, however many times it was entered
+        stride = int(model_ids.max()) + 1
+        keys = np.unique(race_ids * stride + model_ids)
+        race_ids, model_ids = keys // stride, keys % stride
+        starts = np.flatnonzero(np.r_[True, race_ids[1:] != race_ids[:-1]])
+        sizes = np.diff(np.r_[starts, len(race_ids)])
+
+        # Pair every row with every row of its own race
+        row_sizes = np.repeat(sizes, sizes)
+        left = np.repeat(np.arange(len(race_ids)), row_sizes)
+        offsets = np.arange(len(left)) - np.repeat(
+            np.cumsum(row_sizes) - row_sizes, row_sizes
+        )
+        right = np.repeat(np.repeat(starts, sizes), row_sizes) + offsets
+        pairs = left != right
+        left, right = model_ids[left[pairs]], model_ids[right[pairs]]
+
+        size = max(self.matrix.shape[0], int(model_ids.max()) + 1)
+        chunk = sparse.csr_matrix(
+            (np.ones(len(left), dtype=np.int32), (left, right)), shape=(size, size)
+        )
+        self.matrix.resize((size, size))
+        self.matrix = self.matrix + chunk
+
+
+def top_neighbours(matrix: sparse.csr_matrix, k: int) -> dict[str, np.ndarray]:
+    """The k most co-raced models per row, ties broken by lower model id."""
+    coo = matrix.tocoo()
+    order = np.lexsort((coo.col, -coo.data, coo.row))
+    rows, cols, counts = coo.row[order], coo.col[order], coo.data[order]
+    row_starts = np.searchsorted(rows, rows, side="left")
+    keep = np.arange(len(rows)) - row_starts < k
+    rows, cols, counts = rows[keep], cols[keep], counts[keep]
+
+    model_ids, row_counts = np.unique(rows, return_counts=True)
+    return {
+        "model_ids": model_ids.astype(np.int32),
+        "indptr": np.r_[0, np.cumsum(row_counts)].astype(np.int64),
+        "neighbours": cols.astype(np.int32),
+        "counts": counts.astype(np.int32),
+    }
+
+
+def build_from_chunks(
+    chunks: Iterable[tuple[np.ndarray, np.ndarray]], k: int = TOP_NEIGHBOURS
+) -> dict[str, np.ndarray]:
+    builder = CoRacedBuilder()
+    for race_ids, model_ids in chunks:
+        builder.add(race_ids, model_ids)
+    return top_neighbours(builder.finish(), k)
+
+
+def write_co_raced(path: str, arrays: dict[str, np.ndarray]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        model_ids=arrays["model_ids"],
+        indptr=arrays["indptr"],
+        neighbours=arrays["neighbours"],
+        counts=arrays["counts"],
+    )
+    os.replace(tmp_path, path)
+
+
+def _stream_race_racers() -> Iterable[tuple[np.ndarray, np.ndarray]]:
+    with db.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=_CHUNK_ROWS
+        ).execute(build_stream_race_racers_query())
+        for rows in result.partitions():
+            chunk = np.array(rows, dtype=np.int64)
+            yield chunk[:, 0], chunk[:, 1]
+
+
+def build_co_raced(path: str | None = None) -> int:
+    arrays = build_from_chunks(_stream_race_racers())
+    write_co_raced(path or CO_RACED_PATH, arrays)
+    return len(arrays["model_ids"])
+
+
+class CoRaced:
+    def __init__(self, path: str) -> None:
+        with np.load(path) as data:
+            self.model_ids = data["model_ids"]
+            self.indptr = data["indptr"]
+            self.neighbours = data["neighbours"]
+            self.counts = data["counts"]
+
+    def get(self, model_id: int, limit: int) -> list[tuple[int, int]]:
+        """(model_id, races together) for the most co-raced models."""
+        index = int(np.searchsorted(self.model_ids, model_id))
+        if index == len(self.model_ids) or self.model_ids[index] != model_id:
+            return []
+        start = self.indptr[index]
+        end = min(self.indptr[index + 1], start + limit)
+        return list(
+            zip(self.neighbours[start:end].tolist(), self.counts[start:end].tolist())
+        )
+
+
+_co_raced: CoRaced | None = None
+_co_raced_version: tuple[int, int] | None = None
+
+
+def get_co_raced() -> CoRaced | None:
+    """The current file's neighbours, reloaded whenever a build replaces it."""
+    global _co_raced, _co_raced_version
+    try:
+        stat = os.stat(CO_RACED_PATH)
+    except FileNotFoundError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns)
+    if version != _co_raced_version:
+        _co_raced = CoRaced(CO_RACED_PATH)
+        _co_raced_version = version
+    return _co_raced
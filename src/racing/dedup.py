@@ -0,0 +1,58 @@
+"""
+Recently saved races, so "race again" with the same lineup doesn't save a copy.
+
+A save is keyed by the user who made it and its race_unique_id. Logged out
+saves aren't deduplicated. Repeating it within SAVE_DEDUP_SECONDS gets the first
+save's reply back, straight from memory. Windows all have the same length, so
+entries expire in insertion order and pruning only looks at the oldest.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+SAVE_DEDUP_SECONDS = float(os.environ.get("SAVE_DEDUP_SECONDS", 10))
+_MAX_ENTRIES = 100_000
+
+SaveKey = tuple[int, str]
+
+_Saved = TypeVar("_Saved")
+
+
+class SaveDedup(Generic[_Saved]):
+    def __init__(self, seconds: float, max_entries: int = _MAX_ENTRIES) -> None:
+        self.seconds = seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[SaveKey, tuple[float, _Saved]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self, now: float) -> None:
+        while self._entries and next(iter(self._entries.values()))[0] <= now:
+            self._entries.popitem(last=False)
+
+    def get(self, key: SaveKey) -> None | _Saved:
+        with self._lock:
+            self._expire(time.monotonic())
+            if entry := self._entries.get(key):
+                return entry[1]
+            return None
+
+    def put(self, key: SaveKey, saved: _Saved) -> None:
+        if self.seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.seconds, saved)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
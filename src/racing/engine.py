@@ -0,0 +1,102 @@
+"""
+Server-side port of the race in frontend/race.js.
+
+Each racer starts with progress = torque / 25 and, every tick, moves
+floor(position) + (acc + ptw) * progress + 1, with progress growing by 0.3.
+A racer finishes on the first tick its whole-pixel position passes the track
+length. Racers finishing on the same tick keep their starting order, as the
+browser runs their intervals in that order.
+
+Races are scored as (races, racers) arrays, so a batch of any size is one
+tick loop. Shorter races are padded with NaN stats, which never finish.
+"""
+
+import numpy as np
+from sqlalchemy import Row
+
+TRACK_LENGTH = 1200
+_PROGRESS_STEP = 0.3
+_DRY_WEIGHT_ADJUSTMENT = 20
+_MAX_TICKS = 10_000
+
+
+def resolve_weight(weight: float, weight_type: str | None) -> float:
+    if weight_type == "dry":
+        return weight + _DRY_WEIGHT_ADJUSTMENT
+    return weight
+
+
+def _stat(value: int | str | None) -> float:
+    try:
+        return float(int(value))  # type: ignore
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def racer_stats(races: list[list[Row]]) -> np.ndarray:
+    """(power, torque, weight) per racer, shaped (3, races, max racers)."""
+    width = max((len(racers) for racers in races), default=0)
+    stats = np.full((len(races), width, 3), np.nan)
+    for i, racers in enumerate(races):
+        if racers:
+            stats[i, : len(racers)] = [
+                (
+                    _stat(racer.power),
+                    _stat(racer.torque),
+                    resolve_weight(_stat(racer.weight), racer.weight_type),
+                )
+                for racer in racers
+            ]
+    return stats.transpose(2, 0, 1)
+
+
+def finish_ticks(
+    power: np.ndarray,
+    torque: np.ndarray,
+    weight: np.ndarray,
+    track_length: float = TRACK_LENGTH,
+) -> np.ndarray:
+    """Tick on which each racer crosses the line, or inf if it never does.
+    Only racers still running are stepped, so the loop shrinks as they finish."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ptw = power / weight / 5
+        acc = torque / weight / 5
+        progress = torque / 25
+    ticks = np.full(progress.shape, np.inf)
+    running = np.flatnonzero(np.isfinite(ptw + acc + progress))
+    ptw, acc = ptw.ravel()[running], acc.ravel()[running]
+    progress = progress.ravel()[running]
+    position = np.zeros(len(running))
+    # floor(position) > track_length
+    finish_line = np.floor(track_length) + 1
+
+    tick = 0
+    while len(running) and tick < _MAX_TICKS:
+        tick += 1
+        np.floor(position, out=position)
+        # Same operation order as the browser, so rounding matches too
+        position += acc * progress + 1 + ptw * progress
+        progress += _PROGRESS_STEP
+        finished = position >= finish_line
+        if finished.any():
+            ticks.flat[running[finished]] = tick
+            left = ~finished
+            running, position = running[left], position[left]
+            progress, ptw, acc = progress[left], ptw[left], acc[left]
+    return ticks
+
+
+def finishing_order(ticks: np.ndarray) -> np.ndarray:
+    """Racer indexes per race, winner first. Ties keep starting order."""
+    return np.argsort(ticks, axis=-1, kind="stable")
+
+
+def rank_races(
+    races: list[list[Row]], track_length: float = TRACK_LENGTH
+) -> list[list[Row]]:
+    power, torque, weight = racer_stats(races)
+    order = finishing_order(finish_ticks(power, torque, weight, track_length))
+    return [
+        [racers[j] for j in order[i] if j < len(racers)]
+        for i, racers in enumerate(races)
+    ]
@@ -0,0 +1,132 @@
+"""
+All-pairs head-to-head outcomes for the racer catalog.
+
+build_head_to_head runs offline (see src.racing.jobs) and writes one file:
+
+    header     magic, model count N, bytes per matrix row
+    model_ids  int32[N], sorted, so a model's row is its searchsorted index
+    wins       int32[N]
+    ranks      int32[N], 1 = most wins
+    matrix     uint8[N, ceil(N / 8)], bit j of row i set when i beats j
+
+A racer beats another when it finishes on an earlier tick of a race between
+the two. The file is swapped in atomically and read through np.memmap, so
+every uvicorn worker shares the same read-only pages.
+"""
+
+import os
+
+import numpy as np
+from sqlalchemy import Row
+
+from src.database import engine as db
+from src.racing.engine import finish_ticks, racer_stats
+from src.racing.queries import build_get_racers_query
+
+HEAD_TO_HEAD_PATH = os.environ.get("HEAD_TO_HEAD_PATH", "/tmp/moto/head_to_head.bin")
+
+_MAGIC = b"MOTOH2H1"
+_HEADER = np.dtype([("magic", "S8"), ("size", "<u4"), ("row_bytes", "<u4")])
+_BLOCK_ROWS = 1024
+
+
+def build_matrix(racers: list[Row]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sorted model ids, their win counts and the bitpacked outcome matrix."""
+    racers = sorted(racers, key=lambda racer: racer.id)
+    model_ids = np.array([racer.id for racer in racers], dtype="<i4")
+    power, torque, weight = racer_stats([racers])
+    ticks = finish_ticks(power, torque, weight)[0]
+
+    wins = np.zeros(len(racers), dtype="<i4")
+    matrix = np.zeros((len(racers), (len(racers) + 7) // 8), dtype=np.uint8)
+    for start in range(0, len(racers), _BLOCK_ROWS):
+        block = ticks[start : start + _BLOCK_ROWS, None] < ticks[None, :]
+        wins[start : start + _BLOCK_ROWS] = block.sum(axis=1)
+        matrix[start : start + _BLOCK_ROWS] = np.packbits(block, axis=1)
+    return model_ids, wins, matrix
+
+
+def write_head_to_head(
+    path: str, model_ids: np.ndarray, wins: np.ndarray, matrix: np.ndarray
+) -> None:
+    # 1 + the number of models with strictly more wins
+    more_wins = len(wins) - np.searchsorted(np.sort(wins), wins, side="right")
+    ranks = (more_wins + 1).astype("<i4")
+    header = np.array([(_MAGIC, len(model_ids), matrix.shape[1])], dtype=_HEADER)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for part in (header, model_ids, wins, ranks, matrix):
+            f.write(part.tobytes())
+    os.replace(tmp_path, path)
+
+
+def build_head_to_head(path: str | None = None) -> int:
+    with db.connect() as conn:
+        racers = list(conn.execute(build_get_racers_query()))
+    write_head_to_head(path or HEAD_TO_HEAD_PATH, *build_matrix(racers))
+    return len(racers)
+
+
+class HeadToHead:
+    def __init__(self, path: str) -> None:
+        header = np.fromfile(path, dtype=_HEADER, count=1)[0]
+        if header["magic"] != _MAGIC:
+            raise ValueError(f"{path} is not a head-to-head file")
+        size, row_bytes = int(header["size"]), int(header["row_bytes"])
+
+        offset = _HEADER.itemsize
+        arrays = []
+        for shape, dtype in (
+            ((size,), "<i4"),
+            ((size,), "<i4"),
+            ((size,), "<i4"),
+            ((size, row_bytes), np.uint8),
+        ):
+            arrays.append(
+                np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+                if size
+                else np.zeros(shape, dtype=dtype)
+            )
+            offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.model_ids, self.wins, self.ranks, self.matrix = arrays
+
+    def __len__(self) -> int:
+        return len(self.model_ids)
+
+    def _index(self, model_id: int) -> int | None:
+        index = int(np.searchsorted(self.model_ids, model_id))
+        if index < len(self) and self.model_ids[index] == model_id:
+            return index
+        return None
+
+    def record(self, model_id: int) -> None | tuple[int, int]:
+        """(wins, rank) against the rest of the catalog."""
+        if (index := self._index(model_id)) is None:
+            return None
+        return int(self.wins[index]), int(self.ranks[index])
+
+    def beats(self, model_id: int, other_model_id: int) -> None | bool:
+        index, other = self._index(model_id), self._index(other_model_id)
+        if index is None or other is None:
+            return None
+        return bool(self.matrix[index, other // 8] & (0x80 >> (other % 8)))
+
+
+_head_to_head: HeadToHead | None = None
+_head_to_head_version: tuple[int, int] | None = None
+
+
+def get_head_to_head() -> HeadToHead | None:
+    """The current file's matrix, reopened whenever a build replaces it."""
+    global _head_to_head, _head_to_head_version
+    try:
+        stat = os.stat(HEAD_TO_HEAD_PATH)
+    except FileNotFoundError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns)
+    if version != _head_to_head_version:
+        _head_to_head = HeadToHead(HEAD_TO_HEAD_PATH)
+        _head_to_head_version = version
+    return _head_to_head
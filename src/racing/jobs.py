@@ -0,0 +1,97 @@
+import sys
+from itertools import groupby
+
+from sqlalchemy import delete
+
+from src.database import engine as db
+from src.database import (
+    race_combination_counts_table,
+    race_pair_counts_table,
+    race_unique_stats_table,
+)
+from src.racing.co_raced import build_co_raced
+from src.racing.head_to_head import build_head_to_head
+from src.racing.queries import (
+    build_backfill_race_pair_counts_query,
+    build_increment_race_combination_counts_query,
+    build_rebuild_race_stats_query,
+    build_stream_race_racers_query,
+)
+from src.racing.service import count_race_combinations
+
+_BATCH_SIZE = 1000
+
+
+def backfill_race_pair_counts() -> None:
+    """Rebuilds race_pair_counts from race_racers"""
+    with db.connect() as conn:
+        conn.execute(delete(race_pair_counts_table))
+        conn.execute(build_backfill_race_pair_counts_query())
+        conn.commit()
+
+
+def backfill_race_combination_counts() -> None:
+    """Rebuilds race_combination_counts from race_racers"""
+    counts: dict[str, tuple[tuple[int, ...], int]] = {}
+    with db.connect() as conn:
+        racers = conn.execution_options(
+            stream_results=True, yield_per=_BATCH_SIZE
+        ).execute(build_stream_race_racers_query())
+        for _, rows in groupby(racers, key=lambda row: row.race_id):
+            model_ids = [row.model_id for row in rows]
+            for race_unique_id, (combination, _) in count_race_combinations(
+                model_ids
+            ).items():
+                occurence = counts.get(race_unique_id, (combination, 0))[1]
+                counts[race_unique_id] = (combination, occurence + 1)
+
+    with db.connect() as conn:
+        conn.execute(delete(race_combination_counts_table))
+        items = list(counts.items())
+        for start in range(0, len(items), _BATCH_SIZE):
+            conn.execute(
+                build_increment_race_combination_counts_query(
+                    dict(items[start : start + _BATCH_SIZE])
+                )
+            )
+        conn.commit()
+
+
+def reconcile_race_stats() -> None:
+    """Rebuilds race_unique_stats from race_votes, race_comments and race_history"""
+    with db.connect() as conn:
+        conn.execute(delete(race_unique_stats_table))
+        conn.execute(build_rebuild_race_stats_query())
+        conn.commit()
+
+
+def build_head_to_head_matrix() -> None:
+    """Writes the all-pairs head-to-head file served by /racer/head-to-head"""
+    print(f"Built for {build_head_to_head()} models")
+
+
+def build_co_raced_neighbours() -> None:
+    """Writes the co-raced neighbours served by /insight/co-raced"""
+    print(f"Built for {build_co_raced()} models")
+
+
+JOBS = {
+    "backfill-pair-counts": backfill_race_pair_counts,
+    "backfill-combination-counts": backfill_race_combination_counts,
+    "reconcile-race-stats": reconcile_race_stats,
+    "build-head-to-head": build_head_to_head_matrix,
+    "build-co-raced": build_co_raced_neighbours,
+}
+
+
+def main() -> None:
+    if job := JOBS.get(sys.argv[-1]):
+        print(f"[JOB] Running {sys.argv[-1]}")
+        job()
+        print("Done!")
+    else:
+        print("Unknown job. Choose from: " + ", ".join(JOBS))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 from sqlalchemy import Row
 
+from src.racing.service import RaceRecord, make_unique_race_id
+
 
 class SuccessResponse(BaseModel):
     success: bool
@@ -35,18 +37,67 @@ class Racer(BaseModel):
         )
 
 
+class RacerLookup(BaseModel):
+    make: str
+    model: str
+    year: str = ""
+
+
+class RacerBatchRequest(BaseModel):
+    racers: list[RacerLookup]
+
+
+class RacerBatchItem(BaseModel):
+    found: bool
+    racer: Racer | None = None
+
+
+class RacerBatchResponse(BaseModel):
+    racers: list[RacerBatchItem]
+
+    @classmethod
+    def from_service(cls, racers: list[Row | None]) -> "RacerBatchResponse":
+        return cls(
+            racers=[
+                RacerBatchItem(found=True, racer=Racer.from_db_data(racer))
+                if racer
+                else RacerBatchItem(found=False)
+                for racer in racers
+            ]
+        )
+
+
+class HeadToHeadResponse(BaseModel):
+    model_id: int
+    wins: int
+    rank: int
+    total: int
+
+
 class SaveRequest(BaseModel):
     model_ids: list[int]
 
 
+class RaceResultRequest(BaseModel):
+    model_ids: list[int]
+
+
+class RaceResultResponse(BaseModel):
+    racers: list[Racer]
+
+    @classmethod
+    def from_service(cls, racers: list[Row]) -> "RaceResultResponse":
+        return cls(racers=[Racer.from_db_data(racer) for racer in racers])
+
+
 class Race(BaseModel):
-    race_id: int
+    race_id: int | None
     racers: list[Racer]
     user_id: int | None = None
     race_unique_id: str
 
     @classmethod
-    def from_service(cls, race: Row, racers: list[Row]) -> "Race":
+    def from_service(cls, race: RaceRecord, racers: list[Row]) -> "Race":
         return cls(
             race_id=race.id,
             racers=[Racer.from_db_data(racer_data) for racer_data in racers],
@@ -54,19 +105,34 @@ class Race(BaseModel):
             race_unique_id=race.race_unique_id,
         )
 
+    @classmethod
+    def from_racers(cls, racers: list[Row]) -> "Race":
+        return cls(
+            race_id=None,
+            racers=[Racer.from_db_data(racer_data) for racer_data in racers],
+            race_unique_id=make_unique_race_id([racer.id for racer in racers]),
+        )
+
 
 class RaceListing(BaseModel):
     races: list[Race]
+    next_cursor: None | str = None
+
+
+class CoRacedRacer(BaseModel):
+    racer: Racer
+    races: int
+
+
+class CoRacedResponse(BaseModel):
+    racers: list[CoRacedRacer]
 
     @classmethod
-    def from_service(
-        cls, races_and_racers: list[tuple[None | Row, list[Row]]]
-    ) -> "RaceListing":
+    def from_service(cls, co_raced: list[tuple[Row, int]]) -> "CoRacedResponse":
         return cls(
-            races=[
-                Race.from_service(race, racers)
-                for race, racers in races_and_racers
-                if race and racers
+            racers=[
+                CoRacedRacer(racer=Racer.from_db_data(racer), races=races)
+                for racer, races in co_raced
             ]
         )
 
@@ -76,6 +142,37 @@ class RaceVotesResponse(BaseModel):
     downvotes: int
 
 
+class RaceVotesBatchRequest(BaseModel):
+    race_unique_ids: list[str]
+
+
+class RaceVotesSummary(BaseModel):
+    race_unique_id: str
+    upvotes: int
+    downvotes: int
+    voted: bool
+
+
+class RaceVotesBatchResponse(BaseModel):
+    votes: list[RaceVotesSummary]
+
+    @classmethod
+    def from_service(
+        cls, summaries: list[tuple[str, int, int, bool]]
+    ) -> "RaceVotesBatchResponse":
+        return cls(
+            votes=[
+                RaceVotesSummary(
+                    race_unique_id=race_unique_id,
+                    upvotes=upvotes,
+                    downvotes=downvotes,
+                    voted=voted,
+                )
+                for race_unique_id, upvotes, downvotes, voted in summaries
+            ]
+        )
+
+
 class RaceVoteRequest(BaseModel):
     race_unique_id: str
     vote: int
@@ -1,19 +1,31 @@
+from datetime import datetime
+
 from sqlalchemy import (
     Insert,
     Select,
     Text,
+    TextClause,
+    Update,
     distinct,
     func,
     insert,
+    literal,
     literal_column,
     select,
     text,
+    tuple_,
+    update,
 )
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.sql.expression import func
 
 from src.database import (
+    race_combination_counts_table,
     race_history_table,
+    race_pair_counts_table,
     race_racers_table,
+    race_unique_stats_table,
+    race_unique_table,
     race_votes_table,
     racer_makes_table,
     racer_models_table,
@@ -47,19 +59,41 @@ def build_search_racer_query(make: str, model: str, year: str) -> Select:
     )
 
 
-def build_search_racer_makes_query(make: str) -> Select:
-    return select(racer_makes_table.c.name).where(
-        racer_makes_table.c.name.contains(make)
+def build_get_racers_query() -> Select:
+    return (
+        select(
+            racer_models_table.columns,
+            racer_makes_table.c.name.label("make_name"),
+        )
+        .join(racer_makes_table, racer_makes_table.c.id == racer_models_table.c.make)
+        .order_by(racer_models_table.c.id)
     )
 
 
-def build_get_race_racers_query(race_id: int) -> Select:
+def build_get_racers_by_id_query(model_ids: list[int]) -> Select:
+    return build_get_racers_query().where(racer_models_table.c.id.in_(model_ids))
+
+
+def build_get_catalog_version_query() -> Select:
+    return select(
+        func.count(racer_models_table.c.id),
+        func.max(racer_models_table.c.id),
+        select(func.count(racer_makes_table.c.id)).scalar_subquery(),
+    )
+
+
+def build_get_makes_query() -> Select:
+    return select(racer_makes_table.c.name)
+
+
+def build_get_races_racers_query(race_ids: list[int]) -> Select:
     return (
         select(
             racer_models_table,
             racer_makes_table.c.name.label("make_name"),
+            race_racers_table.c.race_id,
         )
-        .where(race_racers_table.c.race_id == race_id)
+        .where(race_racers_table.c.race_id.in_(race_ids))
         .join(
             race_racers_table, race_racers_table.c.model_id == racer_models_table.c.id
         )
@@ -70,100 +104,252 @@ def build_get_race_racers_query(race_id: int) -> Select:
     )
 
 
-def build_get_race_query(race_id: int) -> Select:
-    return select(race_history_table).where(race_history_table.c.id == race_id)
+def build_stream_race_racers_query() -> Select:
+    return select(race_racers_table.c.race_id, race_racers_table.c.model_id).order_by(
+        race_racers_table.c.race_id
+    )
 
 
-def build_get_racer_by_make_model_query(
-    make: str, model: str, year: str | None
-) -> Select:
-    filters = [
-        racer_models_table.c.name == model,
-        literal_column("make_name") == make,
-    ]
-    if year:
-        filters.append(racer_models_table.c.year == year)
+def build_get_races_query(race_ids: list[int]) -> Select:
+    return select(race_history_table).where(race_history_table.c.id.in_(race_ids))
+
+
+def build_get_first_race_ids_query(race_unique_ids: list[str]) -> Select:
     return (
         select(
-            racer_models_table.columns,
-            racer_makes_table.c.name.label("make_name"),
+            race_history_table.c.race_unique_id,
+            func.min(race_history_table.c.id).label("id"),
         )
-        .having(*filters)
-        .join(racer_makes_table, racer_makes_table.c.id == racer_models_table.c.make)
+        .where(race_history_table.c.race_unique_id.in_(race_unique_ids))
+        .group_by(race_history_table.c.race_unique_id)
     )
 
 
-def build_insert_race_query(race_unique_id: str, user_id: None | int = None) -> Insert:
+def build_insert_race_query(
+    race_unique_id: str, user_id: None | int, created_at: datetime
+) -> Insert:
     return insert(race_history_table).values(
-        race_unique_id=race_unique_id, user_id=user_id
+        race_unique_id=race_unique_id, user_id=user_id, created_at=created_at
+    )
+
+
+def build_insert_race_racers_query() -> Insert:
+    """Run with executemany, one parameter set of race_id, model_id per racer."""
+    return insert(race_racers_table)
+
+
+def build_reserve_race_ids_query(count: int) -> TextClause:
+    """Moves race_id_sequence count ids on, never behind race_history, leaving
+    the new next_id in LAST_INSERT_ID() for this connection."""
+    return text(
+        """
+    UPDATE race_id_sequence
+    SET next_id = LAST_INSERT_ID(
+        GREATEST(next_id, (SELECT COALESCE(MAX(id), 0) + 1 FROM race_history))
+        + :count
+    )
+    """
+    ).bindparams(count=count)
+
+
+def build_last_insert_id_query() -> TextClause:
+    return text("SELECT LAST_INSERT_ID()")
+
+
+def build_insert_race_uniques_query(unique_ids: list[str]) -> Insert:
+    return (
+        insert(race_unique_table)
+        .prefix_with("IGNORE")
+        .values([dict(id=unique_id) for unique_id in unique_ids])
     )
 
 
-def build_insert_race_racers_query(race_id: int, model_ids: list[int]) -> Insert:
-    return insert(race_racers_table).values(
-        [dict(race_id=race_id, model_id=model_id) for model_id in model_ids]
+def build_insert_races_query(races: list[dict]) -> Insert:
+    """Races with their ids, as reserved through build_reserve_race_ids_query."""
+    return insert(race_history_table).values(races)
+
+
+def build_increment_race_pair_counts_query(
+    pair_counts: dict[tuple[int, int], int]
+) -> Insert:
+    query = mysql_insert(race_pair_counts_table).values(
+        [
+            dict(model_id_1=model_id_1, model_id_2=model_id_2, occurence=occurence)
+            for (model_id_1, model_id_2), occurence in pair_counts.items()
+        ]
+    )
+    return query.on_duplicate_key_update(
+        occurence=race_pair_counts_table.c.occurence + query.inserted.occurence
     )
 
 
-def build_popular_pairs_query(limit: int) -> Text:
+def build_backfill_race_pair_counts_query() -> TextClause:
     return text(
-        f"""
+        """
+    INSERT INTO race_pair_counts (model_id_1, model_id_2, occurence)
     SELECT
-      p1.id AS id_1,
-      p2.id AS id_2,
-      occurence
-    FROM (
-      SELECT
-          t1.model_id AS t1_id,
-          t2.model_id AS t2_id,
-          COUNT(*) AS occurence
-      FROM race_racers t1
-      JOIN race_racers t2
-      ON t1.race_id = t2.race_id
-      AND t1.model_id < t2.model_id
-      GROUP BY
-          t1_id,
-          t2_id
-    ) AS pairs
-    JOIN racer_models p1
-      ON p1.id = pairs.t1_id
-    JOIN racer_models p2
-      ON p2.id = pairs.t2_id
-    WHERE occurence > 1
-    ORDER BY occurence DESC LIMIT {limit}
+        t1.model_id,
+        t2.model_id,
+        COUNT(*)
+    FROM race_racers t1
+    JOIN race_racers t2
+    ON t1.race_id = t2.race_id
+    AND t1.model_id < t2.model_id
+    GROUP BY
+        t1.model_id,
+        t2.model_id
     """
     )
 
 
-def build_most_recent_races_query(user_id: int | None = None) -> Select:
-    filters = (race_history_table.c.user_id == user_id,) if user_id else ()
+def build_popular_pairs_query(limit: int) -> Select:
     return (
-        select(race_history_table)
+        select(
+            race_pair_counts_table.c.model_id_1.label("id_1"),
+            race_pair_counts_table.c.model_id_2.label("id_2"),
+            race_pair_counts_table.c.occurence,
+        )
+        .where(race_pair_counts_table.c.occurence > 1)
+        .order_by(race_pair_counts_table.c.occurence.desc())
+        .limit(limit)
+    )
+
+
+def build_most_recent_races_query(
+    user_id: int | None = None, before: None | tuple[datetime, int] = None
+) -> Select:
+    """Newest first, seeking past before=(created_at, id) rather than using
+    OFFSET, so every page is one index range scan."""
+    filters = [race_history_table.c.user_id == user_id] if user_id else []
+    if before:
+        filters.append(
+            tuple_(race_history_table.c.created_at, race_history_table.c.id)
+            < tuple_(literal(before[0]), literal(before[1]))
+        )
+    return (
+        select(race_history_table.c.id, race_history_table.c.created_at)
         .where(*filters)
-        .order_by(race_history_table.c.created_at.desc())
+        .order_by(
+            race_history_table.c.created_at.desc(), race_history_table.c.id.desc()
+        )
     )
 
 
-def build_check_race_by_racers_query(race_unique_id: str) -> Select:
-    return select(race_history_table).where(
-        race_history_table.c.race_unique_id == race_unique_id
+def build_increment_race_combination_counts_query(
+    combination_counts: dict[str, tuple[tuple[int, ...], int]]
+) -> Insert:
+    query = mysql_insert(race_combination_counts_table).values(
+        [
+            dict(
+                race_unique_id=race_unique_id,
+                racer_count=len(model_ids),
+                model_ids=",".join(map(str, model_ids)),
+                occurence=occurence,
+            )
+            for race_unique_id, (model_ids, occurence) in combination_counts.items()
+        ]
+    )
+    return query.on_duplicate_key_update(
+        occurence=race_combination_counts_table.c.occurence + query.inserted.occurence
     )
 
 
-def build_get_race_upvotes_query(race_unique_id: str) -> Text:
-    return text(
-        f"""
-      SELECT COUNT(*) as count FROM race_votes WHERE race_unique_id = '{race_unique_id}'
-      AND vote = 1
-    """
+def build_popular_combinations_query(racer_count: int, limit: int) -> Select:
+    return (
+        select(race_combination_counts_table)
+        .where(
+            race_combination_counts_table.c.racer_count == racer_count,
+            race_combination_counts_table.c.occurence > 1,
+        )
+        .order_by(race_combination_counts_table.c.occurence.desc())
+        .limit(limit)
+    )
+
+
+def build_get_race_stats_query(race_unique_id: str) -> Select:
+    return select(race_unique_stats_table).where(
+        race_unique_stats_table.c.race_unique_id == race_unique_id
+    )
+
+
+def build_get_races_stats_query(race_unique_ids: list[str]) -> Select:
+    return select(race_unique_stats_table).where(
+        race_unique_stats_table.c.race_unique_id.in_(race_unique_ids)
     )
 
 
-def build_get_race_downvotes_query(race_unique_id: str) -> Text:
+def build_increment_race_stats_query(race_unique_id: str, **deltas: int) -> Insert:
+    """Adds deltas (upvotes, downvotes, comment_count, times_raced) to the
+    race's stats row, creating it if needed. Racing also bumps last_raced_at."""
+    values: dict = {
+        "upvotes": 0,
+        "downvotes": 0,
+        "comment_count": 0,
+        "times_raced": 0,
+        **deltas,
+    }
+    if deltas.get("times_raced"):
+        values["last_raced_at"] = func.now()
+    query = mysql_insert(race_unique_stats_table).values(
+        race_unique_id=race_unique_id, **values
+    )
+    updates = {
+        name: race_unique_stats_table.c[name] + query.inserted[name] for name in deltas
+    }
+    if "last_raced_at" in values:
+        updates["last_raced_at"] = query.inserted.last_raced_at
+    return query.on_duplicate_key_update(**updates)
+
+
+def build_increment_races_raced_query(
+    times_raced: dict[str, tuple[int, datetime]]
+) -> Insert:
+    """build_increment_race_stats_query(times_raced=...) for many races, each
+    with its own count and last raced time."""
+    query = mysql_insert(race_unique_stats_table).values(
+        [
+            dict(
+                race_unique_id=race_unique_id,
+                upvotes=0,
+                downvotes=0,
+                comment_count=0,
+                times_raced=count,
+                last_raced_at=last_raced_at,
+            )
+            for race_unique_id, (count, last_raced_at) in times_raced.items()
+        ]
+    )
+    return query.on_duplicate_key_update(
+        times_raced=race_unique_stats_table.c.times_raced + query.inserted.times_raced,
+        last_raced_at=query.inserted.last_raced_at,
+    )
+
+
+def build_rebuild_race_stats_query() -> TextClause:
     return text(
-        f"""
-      SELECT COUNT(*) as count FROM race_votes WHERE race_unique_id = '{race_unique_id}'
-      AND vote = 0
+        """
+    INSERT INTO race_unique_stats
+        (race_unique_id, upvotes, downvotes, comment_count, times_raced, last_raced_at)
+    SELECT
+        race_unique.id,
+        COALESCE(votes.upvotes, 0),
+        COALESCE(votes.downvotes, 0),
+        COALESCE(comments.comment_count, 0),
+        COALESCE(races.times_raced, 0),
+        races.last_raced_at
+    FROM race_unique
+    LEFT JOIN (
+        SELECT race_unique_id, SUM(vote = 1) AS upvotes, SUM(vote = 0) AS downvotes
+        FROM race_votes GROUP BY race_unique_id
+    ) votes ON votes.race_unique_id = race_unique.id
+    LEFT JOIN (
+        SELECT race_unique_id, COUNT(*) AS comment_count
+        FROM race_comments GROUP BY race_unique_id
+    ) comments ON comments.race_unique_id = race_unique.id
+    LEFT JOIN (
+        SELECT race_unique_id, COUNT(*) AS times_raced, MAX(created_at) AS last_raced_at
+        FROM race_history GROUP BY race_unique_id
+    ) races ON races.race_unique_id = race_unique.id
     """
     )
 
@@ -175,11 +361,30 @@ def build_check_user_vote_query(race_unique_id: str, user_id: int) -> Select:
     )
 
 
+def build_get_user_votes_query(race_unique_ids: list[str], user_id: int) -> Select:
+    return select(race_votes_table.c.race_unique_id).where(
+        race_votes_table.c.race_unique_id.in_(race_unique_ids),
+        race_votes_table.c.user_id == user_id,
+    )
+
+
+def build_change_vote_query(race_unique_id: str, user_id: int, vote: int) -> Update:
+    return (
+        update(race_votes_table)
+        .where(
+            race_votes_table.c.race_unique_id == race_unique_id,
+            race_votes_table.c.user_id == user_id,
+            race_votes_table.c.vote != vote,
+        )
+        .values(vote=vote)
+    )
+
+
 def build_vote_race_query(race_unique_id: str, user_id: int, vote: int) -> Insert:
-    return insert(race_votes_table).values(
-        race_unique_id=race_unique_id,
-        user_id=user_id,
-        vote=vote,
+    return (
+        insert(race_votes_table)
+        .prefix_with("IGNORE")
+        .values(race_unique_id=race_unique_id, user_id=user_id, vote=vote)
     )
 
 
@@ -0,0 +1,119 @@
+"""
+The global recent-races feed, held in memory by every worker.
+
+RecentRaces is a ring buffer of the newest races, already serialized. It is
+seeded from race_history on first use and races saved through this worker
+are pushed onto it. Races saved by other workers or pods are picked up by
+polling the ids of the newest races, which only reads the (created_at, id)
+index. The buffer is reseeded when any of them isn't held. Ids aren't
+compared by size, since the save buffer hands them out in blocks that don't
+follow created_at. Until then /insight/recent-races runs no queries.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import Row
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database import engine as db
+from src.racing.cache import cache_race, get_races_json, join_listing_json
+from src.racing.queries import build_most_recent_races_query
+from src.racing.service import _MAX_RECENT_RACES, RaceRecord, make_race_cursor
+
+REFRESH_SECONDS = 2.0
+
+
+class RecentRaces:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._lock = threading.Lock()
+        self._races: deque[tuple[int, datetime, bytes]] | None = None
+        self._has_more = False
+
+    @property
+    def seeded(self) -> bool:
+        return self._races is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._races = None
+            self._has_more = False
+
+    def seed(self) -> None:
+        with db.connect() as conn:
+            results = conn.execute(
+                build_most_recent_races_query().limit(self.size + 1)
+            ).all()
+        page = results[: self.size]
+        payloads = get_races_json([result.id for result in page])
+        races = deque(
+            (
+                (result.id, result.created_at, payloads[result.id])
+                for result in page
+                if result.id in payloads
+            ),
+            maxlen=self.size,
+        )
+        with self._lock:
+            self._races = races
+            self._has_more = len(results) > self.size
+
+    def add(self, race_id: int, created_at: datetime, payload: bytes) -> None:
+        with self._lock:
+            if self._races is None:
+                return  # Not seeded yet, the seed will include it
+            if any(held_id == race_id for held_id, *_ in self._races):
+                return  # A repeated save, see src.racing.dedup
+            if len(self._races) == self.size:
+                self._has_more = True
+            self._races.appendleft((race_id, created_at, payload))
+
+    def refresh(self) -> None:
+        """Reseeds if one of the newest races was saved elsewhere."""
+        with db.connect() as conn:
+            newest = set(
+                conn.execute(build_most_recent_races_query().limit(self.size)).scalars()
+            )
+        with self._lock:
+            held = {race_id for race_id, *_ in self._races or ()}
+        if self._races is None or newest - held:
+            self.seed()
+
+    def listing_json(self) -> bytes:
+        """A RaceListing body, with a cursor to continue from the database.
+        Empty until seeded."""
+        with self._lock:
+            races = list(self._races or ())
+            has_more = self._has_more
+        next_cursor = None
+        if has_more and races:
+            race_id, created_at, _ = races[-1]
+            next_cursor = make_race_cursor(created_at, race_id)
+        return join_listing_json([payload for *_, payload in races], next_cursor)
+
+
+recent_races = RecentRaces(_MAX_RECENT_RACES)
+
+
+def add_saved_race(race: RaceRecord, racers: list[Row]) -> None:
+    """Also caches the race, so this worker serves it before it is read back,
+    and while the save buffer still holds it."""
+    recent_races.add(race.id, race.created_at, cache_race(race, racers))
+
+
+def _poll(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            recent_races.refresh()
+        except SQLAlchemyError as error:
+            print(f"[RECENT RACES] Refresh failed: {error}")
+
+
+def start_polling(interval: float = REFRESH_SECONDS) -> threading.Thread:
+    thread = threading.Thread(target=_poll, args=(interval,), daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,72 @@
+"""
+Nearest rivals by performance, from KD-trees over the racer catalog.
+
+Each racer is a point of (power, torque, wet weight), every axis scaled to
+unit variance so no single stat dominates the distance. There is one tree over
+the whole catalog and one per style. Trees are rebuilt the first time they are
+asked for after the catalog has been reloaded.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from scipy.spatial import cKDTree
+from sqlalchemy import Row
+
+from src.racing.catalog import RacerCatalog, get_catalog
+from src.racing.engine import racer_stats
+
+
+class _Tree:
+    def __init__(self, model_ids: list[int], points: np.ndarray) -> None:
+        self.model_ids = model_ids
+        self.tree = cKDTree(points)
+
+
+class RivalIndex:
+    def __init__(self, racers: list[Row]) -> None:
+        stats = racer_stats([racers])[:, 0].T if racers else np.empty((0, 3))
+        complete = np.flatnonzero(np.isfinite(stats).all(axis=1))
+        racers = [racers[index] for index in complete]
+        stats = stats[complete]
+        scale = stats.std(axis=0) if len(stats) else np.ones(3)
+        points = stats / np.where(scale > 0, scale, 1)
+
+        self.points = {racer.id: point for racer, point in zip(racers, points)}
+        self.styles = {racer.id: racer.style for racer in racers}
+        self._all = _Tree([racer.id for racer in racers], points)
+        by_style = defaultdict(list)
+        for index, racer in enumerate(racers):
+            by_style[racer.style].append(index)
+        self._by_style = {
+            style: _Tree([racers[i].id for i in indexes], points[indexes])
+            for style, indexes in by_style.items()
+        }
+
+    def rivals(self, model_id: int, limit: int, same_style: bool = False) -> list[int]:
+        """Closest model ids to model_id, nearest first, excluding itself."""
+        if model_id not in self.points:
+            return []
+        tree = self._by_style[self.styles[model_id]] if same_style else self._all
+        k = min(limit + 1, len(tree.model_ids))
+        if k < 2:
+            return []
+        _, indexes = tree.tree.query(self.points[model_id], k=k)
+        return [
+            tree.model_ids[index]
+            for index in indexes
+            if tree.model_ids[index] != model_id
+        ][:limit]
+
+
+_index: RivalIndex | None = None
+_index_catalog: RacerCatalog | None = None
+
+
+def get_rival_index() -> RivalIndex:
+    global _index, _index_catalog
+    catalog = get_catalog()
+    if _index is None or _index_catalog is not catalog:
+        _index = RivalIndex(list(catalog.racers.values()))
+        _index_catalog = catalog
+    return _index
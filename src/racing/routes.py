@@ -1,24 +1,48 @@
-from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, status
+import asyncio
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import Row
 
 from src.auth import auth_optional, auth_required
+from src.database import request_connection, run_on_own_connection
+from src.racing.cache import get_listing_json, get_race_json
 from src.racing.models import (
+    CoRacedResponse,
     HasVotedResponse,
+    HeadToHeadResponse,
     MakesSearchResponse,
     Race,
     RaceListing,
     Racer,
+    RacerBatchRequest,
+    RacerBatchResponse,
+    RaceResultRequest,
+    RaceResultResponse,
     RaceVoteRequest,
+    RaceVotesBatchRequest,
+    RaceVotesBatchResponse,
     RaceVotesResponse,
     SaveRequest,
     SuccessResponse,
 )
+from src.racing.recent import add_saved_race, recent_races
 from src.racing.service import (
+    COMBINATION_SIZES,
+    get_co_raced_racers,
+    get_head_to_head_record,
+    get_popular_combinations,
     get_popular_pairs,
-    get_race,
+    get_race_result,
     get_racer,
-    get_recent_races,
+    get_racers,
+    get_races_votes,
+    get_recent_race_ids,
+    get_rivals,
+    get_user_voted,
     get_votes,
+    get_votes_summary,
+    parse_race_cursor,
     save_race,
     search_racer_makes,
     search_racers,
@@ -26,46 +50,115 @@ from src.racing.service import (
     vote_race,
 )
 
-router = APIRouter(prefix="/api/racing")
+router = APIRouter(prefix="/api/racing", dependencies=[Depends(request_connection)])
+
+_MAKES_MAX_AGE = 300
+_MAX_BATCH_RACERS = 20
+_MAX_BATCH_VOTES = 50
+_MAX_RACE_RACERS = 50
+
+
+def _etag_matches(etag: str, if_none_match: None | str) -> bool:
+    if not isinstance(if_none_match, str):
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags or "*" in tags
 
 
 @router.get("/racer")
 async def _get_racer(make: str, model: str, year: str) -> Racer | None:
-    if racer := get_racer(make, model, year):
+    if racer := await run_in_threadpool(get_racer, make, model, year):
         return Racer.from_db_data(racer)
 
 
-@router.get("/racer/makes/search")
-async def _search_racer_makes(make: str) -> MakesSearchResponse:
-    return MakesSearchResponse(makes=search_racer_makes(make))
+@router.post("/racer/batch")
+async def _get_racers(request: RacerBatchRequest) -> RacerBatchResponse:
+    if len(request.racers) > _MAX_BATCH_RACERS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+    return RacerBatchResponse.from_service(
+        await run_in_threadpool(
+            get_racers,
+            [(item.make, item.model, item.year) for item in request.racers],
+        )
+    )
+
+
+@router.get("/racer/head-to-head")
+async def _get_head_to_head(model_id: int) -> HeadToHeadResponse:
+    if record := await run_in_threadpool(get_head_to_head_record, model_id):
+        wins, rank, total = record
+        return HeadToHeadResponse(model_id=model_id, wins=wins, rank=rank, total=total)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+
+@router.get("/racer/rivals")
+async def _get_rivals(
+    model_id: int, limit: int = 5, same_style: bool = False
+) -> list[Racer]:
+    return [
+        Racer.from_db_data(racer)
+        for racer in await run_in_threadpool(
+            get_rivals, model_id, limit, same_style=same_style
+        )
+    ]
+
+
+@router.get("/racer/makes/search", response_model=MakesSearchResponse)
+async def _search_racer_makes(
+    make: str,
+    response: Response,
+    if_none_match: None | str = Header(None),
+) -> MakesSearchResponse | Response:
+    makes, version = await run_in_threadpool(search_racer_makes, make)
+    headers = {"ETag": f'"{version}"', "Cache-Control": f"max-age={_MAKES_MAX_AGE}"}
+    if _etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return MakesSearchResponse(makes=makes)
+
+
+def _json_response(content: bytes) -> Response:
+    return Response(content=content, media_type="application/json")
+
+
+@router.get("/race", response_model=Race)
+async def _get_race(race_id: int) -> Response:
+    if content := await get_race_json(race_id):
+        return _json_response(content)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
 
-@router.get("/race")
-async def _get_race(race_id: int) -> Race | None:
-    race, racers = get_race(race_id)
-    if race and racers:
-        return Race.from_service(race, racers)
+@router.post("/race/result")
+async def _get_race_result(request: RaceResultRequest) -> RaceResultResponse:
+    if not request.model_ids or len(request.model_ids) > _MAX_RACE_RACERS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+    if racers := await run_in_threadpool(get_race_result, request.model_ids):
+        return RaceResultResponse.from_service(racers)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
 
 # TODO: Remove when old version unused by app
 @router.get("/race/search")
 async def _search_racers_legacy(make: str, model: str, year: str) -> list[Racer]:
-    return [Racer.from_db_data(result) for result in search_racers(make, model, year)]
+    results = await run_in_threadpool(search_racers, make, model, year)
+    return [Racer.from_db_data(result) for result in results]
 
 
 @router.get("/racer/search")
 async def _search_racers(make: str, model: str, year: str) -> list[Racer]:
-    return [Racer.from_db_data(result) for result in search_racers(make, model, year)]
+    results = await run_in_threadpool(search_racers, make, model, year)
+    return [Racer.from_db_data(result) for result in results]
 
 
 @router.post("/race/save")
 async def _save_race(
-    request: SaveRequest, user: None | Row = Depends(auth_optional)
-) -> Race | None:
+    request: SaveRequest,
+    user: None | Row = Depends(auth_optional),
+) -> Race:
     user_id = user.id if user else None
-    race, racers = save_race(request.model_ids, user_id)
+    race, racers = await run_in_threadpool(save_race, request.model_ids, user_id)
     if race and racers:
+        add_saved_race(race, racers)
         return Race.from_service(race, racers)
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
 
@@ -76,31 +169,83 @@ async def _vote_race(
 ) -> SuccessResponse:
     if request.vote not in {1, 0}:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
-    success = vote_race(request.race_unique_id, user.id, request.vote)
+    success = await run_in_threadpool(
+        vote_race, request.race_unique_id, user.id, request.vote
+    )
     return SuccessResponse(success=success)
 
 
 @router.get("/race/votes")
 async def _get_votes(race_unique_id: str) -> RaceVotesResponse:
-    if votes := get_votes(race_unique_id):
-        return RaceVotesResponse(upvotes=votes[0], downvotes=votes[1])
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    upvotes, downvotes = await run_in_threadpool(get_votes, race_unique_id)
+    return RaceVotesResponse(upvotes=upvotes, downvotes=downvotes)
+
+
+@router.post("/race/votes/batch")
+async def _get_votes_batch(
+    request: RaceVotesBatchRequest, user: None | Row = Depends(auth_optional)
+) -> RaceVotesBatchResponse:
+    if len(request.race_unique_ids) > _MAX_BATCH_VOTES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+    user_id = user.id if user else None
+    votes, voted = await asyncio.gather(
+        run_on_own_connection(get_races_votes, request.race_unique_ids),
+        run_on_own_connection(get_user_voted, request.race_unique_ids, user_id),
+    )
+    return RaceVotesBatchResponse.from_service(
+        get_votes_summary(request.race_unique_ids, votes, voted)
+    )
 
 
 @router.get("/race/vote/voted")
 async def _get_voted(
     race_unique_id: str, user: Row = Depends(auth_optional)
 ) -> HasVotedResponse:
-    if user and user_has_voted(race_unique_id, user.id):
-        return HasVotedResponse(voted=True)
-    return HasVotedResponse(voted=False)
+    if not user:
+        return HasVotedResponse(voted=False)
+    return HasVotedResponse(
+        voted=await run_in_threadpool(user_has_voted, race_unique_id, user.id)
+    )
 
 
-@router.get("/insight/popular-pairs")
-async def _get_insight_popular_pairs() -> RaceListing:
-    return RaceListing.from_service(get_popular_pairs())
+@router.get("/insight/popular-pairs", response_model=RaceListing)
+async def _get_insight_popular_pairs() -> Response:
+    pairs = await run_in_threadpool(get_popular_pairs)
+    return _json_response(await run_in_threadpool(get_listing_json, pairs))
 
 
-@router.get("/insight/recent-races")
-async def _get_insight_recent_races(user_id: None | int = None) -> RaceListing:
-    return RaceListing.from_service(get_recent_races(user_id))
+@router.get("/insight/popular-combinations", response_model=RaceListing)
+async def _get_insight_popular_combinations(racer_count: int = 3) -> Response:
+    if racer_count not in COMBINATION_SIZES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+    combinations = await run_in_threadpool(get_popular_combinations, racer_count)
+    return _json_response(await run_in_threadpool(get_listing_json, combinations))
+
+
+@router.get("/insight/co-raced")
+async def _get_insight_co_raced(model_id: int, limit: int = 5) -> CoRacedResponse:
+    return CoRacedResponse.from_service(
+        await run_in_threadpool(get_co_raced_racers, model_id, limit)
+    )
+
+
+@router.get("/insight/recent-races", response_model=RaceListing)
+async def _get_insight_recent_races(
+    user_id: None | int = None, cursor: None | str = None
+) -> Response:
+    try:
+        before = parse_race_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+    if user_id is None and before is None:
+        if not recent_races.seeded:
+            await run_in_threadpool(recent_races.seed)
+        return _json_response(recent_races.listing_json())
+    race_ids, next_cursor = await run_in_threadpool(
+        get_recent_race_ids, user_id, before
+    )
+    return _json_response(
+        await run_in_threadpool(
+            get_listing_json, [(race_id, []) for race_id in race_ids], next_cursor
+        )
+    )
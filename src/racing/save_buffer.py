@@ -0,0 +1,216 @@
+"""
+Write-behind race saves, enabled with RACE_SAVE_BUFFER=1.
+
+save_race takes the race id from a block reserved in race_id_sequence and
+replies straight away from the racer catalog. The race is queued, and a
+background thread writes queued races in multi-row batches once FLUSH_RACES
+have queued up or FLUSH_SECONDS after the first one arrived, whichever comes
+first. close() drains the queue and runs on app shutdown. A batch that keeps
+failing is split and retried in halves, so only the races that can't be
+written are dropped.
+
+The client is told its race was saved before it is written, which is the
+trade-off of writing behind:
+
+- A new race_unique row is written before replying, so votes and comments
+  work straight away. The saving worker also caches the race.
+- Until the batch is written, which is normally a few milliseconds but up
+  to a few seconds while retrying, /race/{id} on any other worker answers
+  404, and listings read from the database don't include the race.
+- A race dropped after its retries was still reported as saved. Its id is
+  printed, and it lives on only in the saving worker's cache and recent
+  feed until they evict it.
+
+Reserved ids are written explicitly rather than taken from AUTO_INCREMENT, so
+every worker saving races should run with the same setting.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import Connection
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from src.database import engine as db
+from src.racing.queries import (
+    build_increment_race_combination_counts_query,
+    build_increment_race_pair_counts_query,
+    build_increment_races_raced_query,
+    build_insert_race_racers_query,
+    build_insert_race_uniques_query,
+    build_insert_races_query,
+    build_last_insert_id_query,
+    build_reserve_race_ids_query,
+)
+
+FLUSH_RACES = 200
+FLUSH_SECONDS = 0.005
+ID_BLOCK = 100
+FLUSH_ATTEMPTS = 3
+RETRY_SECONDS = 0.5
+
+
+class PendingRace(NamedTuple):
+    """A queued race. Has the same fields as a race_history row."""
+
+    id: int
+    created_at: datetime
+    user_id: None | int
+    race_unique_id: str
+    model_ids: list[int]
+    pair_counts: dict[tuple[int, int], int]
+    combination_counts: dict[str, tuple[tuple[int, ...], int]]
+
+
+class RaceIdAllocator:
+    """Hands out race ids from blocks reserved in race_id_sequence."""
+
+    def __init__(self, block_size: int) -> None:
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next == self._end:
+                with db.connect() as conn:
+                    conn.execute(build_reserve_race_ids_query(self.block_size))
+                    self._end = conn.execute(build_last_insert_id_query()).scalar_one()
+                    conn.commit()
+                self._next = self._end - self.block_size
+            race_id = self._next
+            self._next += 1
+            return race_id
+
+
+def write_races(conn: Connection, races: list[PendingRace]) -> None:
+    """Everything save_race writes, for a batch of races."""
+    pair_counts: Counter[tuple[int, int]] = Counter()
+    combination_counts: dict[str, tuple[tuple[int, ...], int]] = {}
+    times_raced: dict[str, tuple[int, datetime]] = {}
+    for race in races:
+        pair_counts.update(race.pair_counts)
+        for race_unique_id, (model_ids, count) in race.combination_counts.items():
+            total = combination_counts.get(race_unique_id, (model_ids, 0))[1]
+            combination_counts[race_unique_id] = (model_ids, total + count)
+        count = times_raced.get(race.race_unique_id, (0, race.created_at))[0]
+        times_raced[race.race_unique_id] = (count + 1, race.created_at)
+
+    conn.execute(build_insert_race_uniques_query(list(times_raced)))
+    conn.execute(
+        build_insert_races_query(
+            [
+                dict(
+                    id=race.id,
+                    created_at=race.created_at,
+                    user_id=race.user_id,
+                    race_unique_id=race.race_unique_id,
+                )
+                for race in races
+            ]
+        )
+    )
+    conn.execute(
+        build_insert_race_racers_query(),
+        [
+            dict(race_id=race.id, model_id=model_id)
+            for race in races
+            for model_id in race.model_ids
+        ],
+    )
+    if pair_counts:
+        conn.execute(build_increment_race_pair_counts_query(pair_counts))
+    if combination_counts:
+        conn.execute(build_increment_race_combination_counts_query(combination_counts))
+    conn.execute(build_increment_races_raced_query(times_raced))
+
+
+class RaceSaveBuffer:
+    def __init__(
+        self,
+        flush_races: int = FLUSH_RACES,
+        flush_seconds: float = FLUSH_SECONDS,
+        id_block: int = ID_BLOCK,
+    ) -> None:
+        self.flush_races = flush_races
+        self.flush_seconds = flush_seconds
+        self.ids = RaceIdAllocator(id_block)
+        self._queue: queue.Queue[PendingRace | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def put(self, race: PendingRace) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._queue.put(race)
+
+    def close(self) -> None:
+        """Writes everything queued so far and stops the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(None)
+        thread.join()
+
+    def _run(self) -> None:
+        closing = False
+        while not closing:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.flush_races and batch[-1] is not None:
+                try:
+                    batch.append(
+                        self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    )
+                except queue.Empty:
+                    break
+            closing = batch[-1] is None
+            if races := [race for race in batch if race is not None]:
+                try:
+                    self._flush(races)
+                except Exception as error:
+                    # Keep the writer alive for whatever is queued behind
+                    print(f"[SAVE BUFFER] Dropped {len(races)} races: {error!r}")
+
+    def _flush(self, races: list[PendingRace]) -> None:
+        """Writes the batch, retrying it FLUSH_ATTEMPTS times. A batch that
+        still fails is split in half, so one bad race doesn't lose the rest."""
+        last_error: SQLAlchemyError | None = None
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            try:
+                with db.connect() as conn:
+                    write_races(conn, races)
+                    conn.commit()
+                return
+            except SQLAlchemyError as error:
+                last_error = error
+                print(
+                    f"[SAVE BUFFER] Writing {len(races)} races failed "
+                    f"(attempt {attempt}/{FLUSH_ATTEMPTS}): {error}"
+                )
+                if attempt < FLUSH_ATTEMPTS:
+                    time.sleep(RETRY_SECONDS * attempt)
+        # Splitting can't help when the database itself is unreachable
+        if len(races) == 1 or isinstance(last_error, OperationalError):
+            race_ids = ", ".join(str(race.id) for race in races)
+            print(f"[SAVE BUFFER] Dropped races {race_ids}: {last_error}")
+            return
+        middle = len(races) // 2
+        self._flush(races[:middle])
+        self._flush(races[middle:])
+
+
+race_save_buffer = RaceSaveBuffer() if os.environ.get("RACE_SAVE_BUFFER") else None
+
+
+def close_save_buffer() -> None:
+    if race_save_buffer:
+        race_save_buffer.close()
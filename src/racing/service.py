@@ -1,134 +1,396 @@
 import hashlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import combinations
+from typing import NamedTuple, Protocol
 
-from sqlalchemy import Row
+from sqlalchemy import Connection, Row
 
-from src.database import engine as db
+from src.database import connect
+from src.racing.catalog import get_catalog, lookup_racers
+from src.racing.co_raced import get_co_raced
+from src.racing.dedup import SAVE_DEDUP_SECONDS, SaveDedup
+from src.racing.engine import rank_races
+from src.racing.head_to_head import get_head_to_head
 from src.racing.queries import (
-    build_check_race_by_racers_query,
+    build_change_vote_query,
     build_check_user_vote_query,
-    build_get_race_downvotes_query,
-    build_get_race_query,
-    build_get_race_racers_query,
-    build_get_race_upvotes_query,
-    build_get_racer_by_make_model_query,
+    build_get_first_race_ids_query,
+    build_get_race_stats_query,
+    build_get_races_query,
+    build_get_races_racers_query,
+    build_get_races_stats_query,
+    build_get_user_votes_query,
+    build_increment_race_combination_counts_query,
+    build_increment_race_pair_counts_query,
+    build_increment_race_stats_query,
     build_insert_race_query,
     build_insert_race_racers_query,
     build_insert_race_unique_query,
     build_most_recent_races_query,
+    build_popular_combinations_query,
     build_popular_pairs_query,
-    build_search_racer_makes_query,
-    build_search_racer_query,
     build_vote_race_query,
 )
+from src.racing.rivals import get_rival_index
+from src.racing.save_buffer import PendingRace, race_save_buffer
 
 _MAX_SEARCH_RESULT = 10
 _MAX_RECENT_RACES = 30
 _MAX_POPULAR_PAIRS = 10
+_MAX_POPULAR_COMBINATIONS = 10
+_MAX_RIVALS = 20
+_MAX_CO_RACED = 20
+
+COMBINATION_SIZES = (3, 4)
+# Bigger races skip combination counts, as C(n, 4) grows quickly
+_MAX_COMBINATION_RACERS = 10
+
+# race_unique ids this worker has inserted, so saves can skip INSERT IGNORE
+_MAX_KNOWN_RACE_UNIQUE_IDS = 100_000
+known_race_unique_ids: set[str] = set()
 
 
 def make_unique_race_id(model_ids: list[int]) -> str:
     return hashlib.md5("".join(map(str, sorted(model_ids))).encode()).hexdigest()
 
 
+def count_race_pairs(model_ids: list[int]) -> dict[tuple[int, int], int]:
+    return Counter(
+        pair for pair in combinations(sorted(model_ids), 2) if pair[0] < pair[1]
+    )
+
+
+def count_race_combinations(
+    model_ids: list[int],
+) -> dict[str, tuple[tuple[int, ...], int]]:
+    """Every 3 and 4 racer combination within the race, by race unique id."""
+    model_ids = sorted(set(model_ids))
+    if len(model_ids) > _MAX_COMBINATION_RACERS:
+        return {}
+    return {
+        make_unique_race_id(list(combination)): (combination, 1)
+        for size in COMBINATION_SIZES
+        for combination in combinations(model_ids, size)
+    }
+
+
 def get_racer(make: str, model: str, year: str) -> Row | None:
     if make and model:
-        with db.connect() as conn:
-            return conn.execute(
-                build_get_racer_by_make_model_query(make, model, year)
-            ).first()
+        return get_catalog().get(make, model, year)
+    return None
+
+
+def get_racers(lookups: list[tuple[str, str, str]]) -> list[Row | None]:
+    catalog = get_catalog()
+    return [
+        catalog.get(make, model, year) if make and model else None
+        for make, model, year in lookups
+    ]
+
+
+def get_races_racers(race_ids: list[int]) -> defaultdict[int, list[Row]]:
+    racers_by_race: defaultdict[int, list[Row]] = defaultdict(list)
+    if race_ids:
+        with connect() as conn:
+            for racer in conn.execute(build_get_races_racers_query(race_ids)):
+                racers_by_race[racer.race_id].append(racer)
+    return racers_by_race
+
+
+def get_race_rows(race_ids: list[int]) -> dict[int, Row]:
+    if not race_ids:
+        return {}
+    with connect() as conn:
+        return {race.id: race for race in conn.execute(build_get_races_query(race_ids))}
+
+
+def get_races(race_ids: list[int]) -> list[tuple[None | Row, list[Row]]]:
+    races = get_race_rows(race_ids)
+    racers_by_race = get_races_racers(list(races))
+    return [
+        (races[race_id], racers_by_race[race_id]) if race_id in races else (None, [])
+        for race_id in race_ids
+    ]
+
+
+def get_race_result(model_ids: list[int]) -> list[Row]:
+    """Racers in finishing order, or empty if any model is unknown."""
+    if racers := get_catalog().get_many(model_ids):
+        return rank_races([racers])[0]
+    return []
+
 
+def get_head_to_head_record(model_id: int) -> None | tuple[int, int, int]:
+    """(wins, rank, catalog size) from the latest head-to-head build."""
+    if (head_to_head := get_head_to_head()) and (
+        record := head_to_head.record(model_id)
+    ):
+        return (*record, len(head_to_head))
+    return None
 
-def get_race(race_id: int) -> tuple[None | Row, list[Row]]:
-    with db.connect() as conn:
-        race = conn.execute(build_get_race_query(race_id)).one_or_none()
-        racers = conn.execute(build_get_race_racers_query(race_id))
-        if race and racers:
-            return race, list(racers)
-    return None, []
+
+def get_rivals(model_id: int, limit: int, same_style: bool = False) -> list[Row]:
+    model_ids = get_rival_index().rivals(
+        model_id, min(limit, _MAX_RIVALS), same_style=same_style
+    )
+    return get_catalog().get_many(model_ids)
 
 
 def search_racers(make: str, model: str, year: str) -> list[Row]:
     if make:
-        with db.connect() as conn:
-            return list(
-                conn.execute(
-                    build_search_racer_query(make, model, year).limit(
-                        _MAX_SEARCH_RESULT
-                    )
-                )
-            )
+        return get_catalog().search(make, model, year, _MAX_SEARCH_RESULT)
     return []
 
 
-def search_racer_makes(make: str) -> list[str]:
-    with db.connect() as conn:
-        return [
-            row.name
-            for row in conn.execute(
-                build_search_racer_makes_query(make).limit(_MAX_SEARCH_RESULT)
+def search_racer_makes(make: str) -> tuple[list[str], str]:
+    makes = get_catalog().makes
+    return makes.search(make, _MAX_SEARCH_RESULT), makes.version
+
+
+class RaceRecord(Protocol):
+    """What a race reply needs, from a race_history row or a SavedRace."""
+
+    @property
+    def id(self) -> int:
+        ...
+
+    @property
+    def created_at(self) -> datetime:
+        ...
+
+    @property
+    def user_id(self) -> None | int:
+        ...
+
+    @property
+    def race_unique_id(self) -> str:
+        ...
+
+
+class SavedRace(NamedTuple):
+    """The race_history row save_race wrote, without reading it back."""
+
+    id: int
+    created_at: datetime
+    user_id: None | int
+    race_unique_id: str
+
+
+recent_saves: SaveDedup[tuple[SavedRace, list[Row]]] = SaveDedup(SAVE_DEDUP_SECONDS)
+
+
+def _remember_race_unique_id(race_unique_id: str) -> None:
+    if len(known_race_unique_ids) >= _MAX_KNOWN_RACE_UNIQUE_IDS:
+        known_race_unique_ids.clear()
+    known_race_unique_ids.add(race_unique_id)
+
+
+def _queue_race(
+    model_ids: list[int], user_id: None | int = None
+) -> tuple[None | SavedRace, list[Row]]:
+    """The reply save_race would give, with the writes left to
+    race_save_buffer. A new race_unique row is still written straight away,
+    since votes and comments on the race reference it."""
+    if not race_save_buffer or not (racers := lookup_racers(model_ids)):
+        return None, []
+    race_unique_id = make_unique_race_id(model_ids)
+    if race_unique_id not in known_race_unique_ids:
+        with connect() as conn:
+            conn.execute(build_insert_race_unique_query(race_unique_id))
+            conn.commit()
+        _remember_race_unique_id(race_unique_id)
+    race = PendingRace(
+        id=race_save_buffer.ids.next_id(),
+        created_at=datetime.now().replace(microsecond=0),
+        user_id=user_id,
+        race_unique_id=race_unique_id,
+        model_ids=model_ids,
+        pair_counts=count_race_pairs(model_ids),
+        combination_counts=count_race_combinations(model_ids),
+    )
+    race_save_buffer.put(race)
+    return SavedRace(race.id, race.created_at, user_id, race.race_unique_id), racers
+
+
+def _write_race(
+    model_ids: list[int], user_id: None | int = None
+) -> tuple[None | SavedRace, list[Row]]:
+    """Writes the race in one transaction. The reply is built from what was
+    written and the catalog, rather than read back."""
+    if not (racers := lookup_racers(model_ids)):
+        return None, []
+    race_unique_id = make_unique_race_id(model_ids)
+    created_at = datetime.now().replace(microsecond=0)
+    with connect() as conn:
+        if race_unique_id not in known_race_unique_ids:
+            conn.execute(build_insert_race_unique_query(race_unique_id))
+        race_id = conn.execute(
+            build_insert_race_query(race_unique_id, user_id, created_at)
+        ).lastrowid
+        conn.execute(
+            build_insert_race_racers_query(),
+            [dict(race_id=race_id, model_id=model_id) for model_id in model_ids],
+        )
+        if pair_counts := count_race_pairs(model_ids):
+            conn.execute(build_increment_race_pair_counts_query(pair_counts))
+        if combination_counts := count_race_combinations(model_ids):
+            conn.execute(
+                build_increment_race_combination_counts_query(combination_counts)
             )
-        ]
+        conn.execute(build_increment_race_stats_query(race_unique_id, times_raced=1))
+        conn.commit()
+    _remember_race_unique_id(race_unique_id)
+    return SavedRace(race_id, created_at, user_id, race_unique_id), racers
 
 
 def save_race(
     model_ids: list[int], user_id: None | int = None
-) -> tuple[None | Row, list[Row]]:
-    with db.connect() as conn:
-        race_unique_id = make_unique_race_id(model_ids)
-        conn.execute(build_insert_race_unique_query(race_unique_id))
-        race = conn.execute(build_insert_race_query(race_unique_id, user_id))
-
-        race_id = race.lastrowid
-        conn.execute(build_insert_race_racers_query(race_id, model_ids))
-        conn.commit()
-        return get_race(race_id)
+) -> tuple[None | SavedRace, list[Row]]:
+    """Repeats of a user's recent save return that race. Logged out saves are
+    always written, as clients behind the same proxy can't be told apart."""
+    race_unique_id = make_unique_race_id(model_ids)
+    if user_id and (saved := recent_saves.get((user_id, race_unique_id))):
+        return saved
+    if race_save_buffer:
+        race, racers = _queue_race(model_ids, user_id)
+    else:
+        race, racers = _write_race(model_ids, user_id)
+    if user_id and race and racers:
+        recent_saves.put((user_id, race_unique_id), (race, racers))
+    return race, racers
 
 
-def get_popular_pairs() -> list[tuple[None | Row, list[Row]]]:
-    pairs = []
-    with db.connect() as conn:
+def get_popular_pairs() -> list[tuple[None | int, list[int]]]:
+    """Pairs only ever raced within bigger races come back without a race id."""
+    with connect() as conn:
         results = conn.execute(build_popular_pairs_query(_MAX_POPULAR_PAIRS))
-        for result in results:
-            model_ids = [result.id_1, result.id_2]
-            race_unique_id = make_unique_race_id(model_ids)
-            check = conn.execute(
-                build_check_race_by_racers_query(race_unique_id)
-            ).first()
-            if check:
-                pairs.append(get_race(check.id))
-            else:
-                pairs.append(save_race(model_ids))
-    return pairs
-
-
-def get_recent_races(user_id: int | None = None) -> list[tuple[None | Row, list[Row]]]:
-    races = []
-    with db.connect() as conn:
+        pairs = {
+            make_unique_race_id([result.id_1, result.id_2]): [result.id_1, result.id_2]
+            for result in results
+        }
+        race_ids = {}
+        if pairs:
+            race_ids = {
+                result.race_unique_id: result.id
+                for result in conn.execute(build_get_first_race_ids_query(list(pairs)))
+            }
+    return [
+        (race_ids.get(race_unique_id), model_ids)
+        for race_unique_id, model_ids in pairs.items()
+    ]
+
+
+def get_popular_combinations(
+    racer_count: int,
+) -> list[tuple[None | int, list[int]]]:
+    """Like get_popular_pairs, for combinations of racer_count racers."""
+    with connect() as conn:
         results = conn.execute(
-            build_most_recent_races_query(user_id).limit(_MAX_RECENT_RACES)
+            build_popular_combinations_query(racer_count, _MAX_POPULAR_COMBINATIONS)
         )
-        for result in results:
-            races.append(get_race(result.id))
-    return races
-
-
-def get_votes(race_unique_id: str) -> None | tuple[int, int]:
-    with db.connect() as conn:
-        upvotes = conn.execute(
-            build_get_race_upvotes_query(race_unique_id)
-        ).one_or_none()
-        if not upvotes:
-            return None
-        downvotes = conn.execute(
-            build_get_race_downvotes_query(race_unique_id)
-        ).one_or_none()
-        if not downvotes:
-            return None
-    return upvotes.count, downvotes.count
+        popular = {
+            result.race_unique_id: list(map(int, result.model_ids.split(",")))
+            for result in results
+        }
+        race_ids = {}
+        if popular:
+            race_ids = {
+                result.race_unique_id: result.id
+                for result in conn.execute(
+                    build_get_first_race_ids_query(list(popular))
+                )
+            }
+    return [
+        (race_ids.get(race_unique_id), model_ids)
+        for race_unique_id, model_ids in popular.items()
+    ]
+
+
+def get_co_raced_racers(model_id: int, limit: int) -> list[tuple[Row, int]]:
+    """Models most often raced alongside model_id, with how many races."""
+    if (co_raced := get_co_raced()) is None:
+        return []
+    catalog = get_catalog()
+    return [
+        (catalog.racers[neighbour], races)
+        for neighbour, races in co_raced.get(model_id, min(limit, _MAX_CO_RACED))
+        if neighbour in catalog.racers
+    ]
+
+
+def make_race_cursor(created_at: datetime, race_id: int) -> str:
+    return f"{created_at.isoformat()}_{race_id}"
+
+
+def parse_race_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ValueError for anything make_race_cursor didn't produce."""
+    created_at, race_id = cursor.rsplit("_", 1)
+    return datetime.fromisoformat(created_at), int(race_id)
+
+
+def get_recent_race_ids(
+    user_id: int | None = None, before: None | tuple[datetime, int] = None
+) -> tuple[list[int], None | str]:
+    """A page of race ids, newest first, and the cursor for the next page."""
+    with connect() as conn:
+        results = conn.execute(
+            build_most_recent_races_query(user_id, before).limit(_MAX_RECENT_RACES + 1)
+        ).all()
+    page = results[:_MAX_RECENT_RACES]
+    next_cursor = None
+    if len(results) > _MAX_RECENT_RACES:
+        next_cursor = make_race_cursor(page[-1].created_at, page[-1].id)
+    return [result.id for result in page], next_cursor
+
+
+def get_race_stats(race_unique_id: str) -> None | Row:
+    with connect() as conn:
+        return conn.execute(build_get_race_stats_query(race_unique_id)).one_or_none()
+
+
+def get_votes(race_unique_id: str) -> tuple[int, int]:
+    """(upvotes, downvotes), both 0 for races nobody has voted on or that
+    don't exist."""
+    if stats := get_race_stats(race_unique_id):
+        return stats.upvotes, stats.downvotes
+    return 0, 0
+
+
+def get_races_votes(race_unique_ids: list[str]) -> dict[str, tuple[int, int]]:
+    """(upvotes, downvotes) of each id that has any votes."""
+    if not race_unique_ids:
+        return {}
+    with connect() as conn:
+        return {
+            row.race_unique_id: (row.upvotes, row.downvotes)
+            for row in conn.execute(build_get_races_stats_query(race_unique_ids))
+        }
+
+
+def get_user_voted(race_unique_ids: list[str], user_id: None | int) -> set[str]:
+    if not race_unique_ids or not user_id:
+        return set()
+    with connect() as conn:
+        return set(
+            conn.execute(build_get_user_votes_query(race_unique_ids, user_id)).scalars()
+        )
+
+
+def get_votes_summary(
+    race_unique_ids: list[str],
+    votes: dict[str, tuple[int, int]],
+    voted: set[str],
+) -> list[tuple[str, int, int, bool]]:
+    """(race_unique_id, upvotes, downvotes, voted) for each id, in input order."""
+    return [
+        (race_unique_id, *votes.get(race_unique_id, (0, 0)), race_unique_id in voted)
+        for race_unique_id in race_unique_ids
+    ]
 
 
 def user_has_voted(race_unique_id: str, user_id: int) -> bool:
-    with db.connect() as conn:
+    with connect() as conn:
         return bool(
             conn.execute(
                 build_check_user_vote_query(race_unique_id, user_id)
@@ -137,10 +399,23 @@ def user_has_voted(race_unique_id: str, user_id: int) -> bool:
 
 
 def vote_race(race_unique_id: str, user_id: int, vote: int) -> bool:
-    with db.connect() as conn:
-        if not user_has_voted(race_unique_id, user_id):
-            conn.execute(build_vote_race_query(race_unique_id, user_id, vote))
-            conn.commit()
-            return True
+    """Records or changes a user's vote. False if it was already cast.
+
+    The update only matches a vote that differs, and the unique key makes
+    the insert skip one that exists, so each statement's row count says
+    whether it changed anything."""
+    voted, unvoted = ("upvotes", "downvotes") if vote else ("downvotes", "upvotes")
+    with connect() as conn:
+        if conn.execute(
+            build_change_vote_query(race_unique_id, user_id, vote)
+        ).rowcount:
+            deltas = {voted: 1, unvoted: -1}
+        elif conn.execute(
+            build_vote_race_query(race_unique_id, user_id, vote)
+        ).rowcount:
+            deltas = {voted: 1}
         else:
             return False
+        conn.execute(build_increment_race_stats_query(race_unique_id, **deltas))
+        conn.commit()
+        return True
@@ -22,6 +22,13 @@ def build_delete_comment_query(comment_id: int, user_id: int) -> Delete:
     )
 
 
+def build_get_user_comment_query(comment_id: int, user_id: int) -> Select:
+    return select(race_comments_table).where(
+        race_comments_table.c.id == comment_id,
+        race_comments_table.c.user_id == user_id,
+    )
+
+
 def build_get_comments_query(race_unique_id: str) -> Select:
     return (
         select(race_comments_table, users_table.c.username)
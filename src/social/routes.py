@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import Row
 
 from src.auth import auth_optional, auth_required
+from src.database import request_connection
 from src.social.models import (
     AddCommentRequest,
     CommentsResponse,
@@ -11,7 +13,7 @@ from src.social.models import (
 from src.social.service import add_comment, delete_comment, get_comments
 from src.social.validation import invalid_comment_text
 
-router = APIRouter(prefix="/api/social")
+router = APIRouter(prefix="/api/social", dependencies=[Depends(request_connection)])
 
 
 @router.post("/add-comment")
@@ -21,7 +23,7 @@ async def _add_comment(
 ) -> SuccessResponse:
     if err := invalid_comment_text(request.text):
         return SuccessResponse(success=False, errors=[err])
-    add_comment(request.text, request.race_unique_id, user.id)
+    await run_in_threadpool(add_comment, request.text, request.race_unique_id, user.id)
     return SuccessResponse(success=True)
 
 
@@ -29,7 +31,9 @@ async def _add_comment(
 async def _get_comments(
     race_unique_id: str,
 ) -> CommentsResponse:
-    return CommentsResponse.from_service(get_comments(race_unique_id))
+    return CommentsResponse.from_service(
+        await run_in_threadpool(get_comments, race_unique_id)
+    )
 
 
 @router.post("/delete-comment")
@@ -37,5 +41,5 @@ async def _delete_comment(
     request: DeleteCommentRequest,
     user: Row = Depends(auth_required),
 ) -> SuccessResponse:
-    success = delete_comment(request.comment_id, user.id)
+    success = await run_in_threadpool(delete_comment, request.comment_id, user.id)
     return SuccessResponse(success=success)
@@ -2,11 +2,13 @@ import bleach
 from sqlalchemy import Row
 
 from src.constants import GarageItemRelations
-from src.database import engine as db
+from src.database import connect
+from src.racing.queries import build_increment_race_stats_query
 from src.social.queries import (
     build_add_comment_query,
     build_delete_comment_query,
     build_get_comments_query,
+    build_get_user_comment_query,
     build_user_garage_race_relation_query,
 )
 
@@ -20,14 +22,15 @@ GARAGE_RELATION_SENTENCE_MAP = {
 
 def add_comment(text: str, race_unique_id: str, user_id: int) -> bool:
     text = bleach.clean(text)
-    with db.connect() as conn:
+    with connect() as conn:
         conn.execute(build_add_comment_query(text, race_unique_id, user_id))
+        conn.execute(build_increment_race_stats_query(race_unique_id, comment_count=1))
         conn.commit()
         return True
 
 
 def _get_user_garage_race_relation(user_id: int, race_unique_id: str) -> str:
-    with db.connect() as conn:
+    with connect() as conn:
         results = conn.execute(
             build_user_garage_race_relation_query(user_id, race_unique_id)
         ).all()
@@ -45,7 +48,7 @@ def _get_user_garage_race_relation(user_id: int, race_unique_id: str) -> str:
 
 def get_comments(race_unique_id: str) -> list[tuple[Row, str]]:
     results = []
-    with db.connect() as conn:
+    with connect() as conn:
         garage_relation_sentences = {}
         comments = conn.execute(build_get_comments_query(race_unique_id)).all()
         for comment in comments:
@@ -58,7 +61,16 @@ def get_comments(race_unique_id: str) -> list[tuple[Row, str]]:
 
 
 def delete_comment(comment_id: int, user_id: int) -> bool:
-    with db.connect() as conn:
-        conn.execute(build_delete_comment_query(comment_id, user_id))
-        conn.commit()
+    with connect() as conn:
+        comment = conn.execute(
+            build_get_user_comment_query(comment_id, user_id)
+        ).one_or_none()
+        if comment:
+            conn.execute(build_delete_comment_query(comment_id, user_id))
+            conn.execute(
+                build_increment_race_stats_query(
+                    comment.race_unique_id, comment_count=-1
+                )
+            )
+            conn.commit()
         return True
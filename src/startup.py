@@ -1,15 +1,8 @@
-from datetime import datetime
-
-from sqlalchemy import text
-
-from src.database import engine as db
+from src.user.sweeper import sweep_expired_sessions
 
 
 def _expire_user_sessions() -> None:
-    timestamp_now = int(datetime.timestamp(datetime.now()))
-    with db.connect() as conn:
-        conn.execute(text(f"DELETE FROM user_sessions WHERE expire < {timestamp_now}"))
-        conn.commit()
+    sweep_expired_sessions()
 
 
 SEQUENCE = {"Expire user sessions": _expire_user_sessions}
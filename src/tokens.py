@@ -0,0 +1,194 @@
+"""
+Signed session tokens, enabled by setting SESSION_SECRET.
+
+A signed token carries the user and its own expiry, so auth can check it
+without a query:
+
+    s1.<base64url JSON payload>.<base64url HMAC-SHA256 of the payload>
+
+Revocation is by version. Each user has a users.token_version, copied into
+every token it is issued. Logging out, changing password or details and
+deleting the account bump it, which invalidates every token issued before,
+and record the bump in token_revocations. A revocation only matters until
+the last token issued before it has expired, so its row expires
+TOKEN_SECONDS later and the session sweeper deletes it.
+
+Workers keep the latest unexpired revocation of each user in memory. Every
+REFRESH_SECONDS they read only the rows added since their last refresh,
+starting _REREAD_IDS back because auto-increment ids can commit out of
+order.
+
+A token is rejected only when its version is below the one a worker knows.
+One above it was signed after a bump this worker hasn't seen yet, so it is
+trusted rather than refused until the next refresh.
+
+Tokens without the prefix are the older random session tokens, and are
+still looked up in user_sessions.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from typing import NamedTuple, cast
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database import connect
+from src.user.queries import (
+    build_add_token_revocation_query,
+    build_bump_token_version_query,
+    build_get_token_revocations_query,
+    build_get_token_version_query,
+)
+
+SESSION_SECRET = os.environ.get("SESSION_SECRET", "")
+REFRESH_SECONDS = 5.0
+TOKEN_SECONDS = 86400 * 7 * 2  # The longest a token is issued for
+
+_REREAD_IDS = 100
+
+_PREFIX = "s1."
+
+
+class TokenUser(NamedTuple):
+    """The user a signed token was issued to. Has the fields of the row
+    auth gets for a session token."""
+
+    id: int
+    username: str
+    email: str
+    expire: int
+    version: int
+
+
+def signed_tokens_enabled() -> bool:
+    return bool(SESSION_SECRET)
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(_PREFIX)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(SESSION_SECRET.encode(), payload.encode(), hashlib.sha256)
+    return _b64encode(digest.digest())
+
+
+def make_signed_token(
+    user_id: int, username: str, email: str, expire: int, version: int
+) -> str:
+    payload = _b64encode(
+        json.dumps(
+            {"u": user_id, "n": username, "e": email, "x": expire, "v": version},
+            separators=(",", ":"),
+        ).encode()
+    )
+    return f"{_PREFIX}{payload}.{_sign(payload)}"
+
+
+def read_signed_token(token: str) -> None | TokenUser:
+    """The token's user if the signature holds, whether or not it has expired
+    or been revoked."""
+    if not signed_tokens_enabled() or not is_signed_token(token):
+        return None
+    payload, _, signature = token[len(_PREFIX) :].partition(".")
+    # Cookies can hold anything, and compare_digest rejects non-ASCII str
+    if not hmac.compare_digest(
+        signature.encode(errors="replace"), _sign(payload).encode()
+    ):
+        return None
+    try:
+        data = json.loads(_b64decode(payload))
+        return TokenUser(data["u"], data["n"], data["e"], data["x"], data["v"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class TokenVersions:
+    """Latest revoked token_version of every user with an unexpired
+    revocation, with the time it expires."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._versions: dict[int, tuple[int, int]] | None = None
+        self._last_id = 0
+
+    def refresh(self) -> None:
+        now = int(time.time())
+        with self._lock:
+            after_id = max(self._last_id - _REREAD_IDS, 0)
+        with connect() as conn:
+            rows = conn.execute(build_get_token_revocations_query(after_id, now)).all()
+        with self._lock:
+            versions = {
+                user_id: (version, expire)
+                for user_id, (version, expire) in (self._versions or {}).items()
+                if expire > now
+            }
+            for row in rows:
+                if row.token_version > versions.get(row.user_id, (0, 0))[0]:
+                    versions[row.user_id] = (row.token_version, row.expire)
+                self._last_id = max(self._last_id, row.id)
+            self._versions = versions
+
+    def get(self, user_id: int) -> int:
+        if self._versions is None:
+            self.refresh()
+        return (self._versions or {}).get(user_id, (0, 0))[0]
+
+    def bump(self, user_id: int) -> int:
+        expire = int(time.time()) + TOKEN_SECONDS
+        with connect() as conn:
+            conn.execute(build_bump_token_version_query(user_id))
+            version = cast(
+                int, conn.execute(build_get_token_version_query(user_id)).scalar_one()
+            )
+            conn.execute(build_add_token_revocation_query(user_id, version, expire))
+            conn.commit()
+        with self._lock:
+            if self._versions is not None:
+                self._versions[user_id] = (version, expire)
+        return version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions = None
+            self._last_id = 0
+
+
+token_versions = TokenVersions()
+
+
+def verify_signed_token(token: str) -> None | TokenUser:
+    """The token's user, if it is signed, unexpired and not revoked."""
+    if (user := read_signed_token(token)) is None:
+        return None
+    if user.expire <= time.time() or user.version < token_versions.get(user.id):
+        return None
+    return user
+
+
+def _poll(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            token_versions.refresh()
+        except SQLAlchemyError as error:
+            print(f"[TOKENS] Refresh failed: {error}")
+
+
+def start_polling(interval: float = REFRESH_SECONDS) -> None:
+    if signed_tokens_enabled():
+        threading.Thread(target=_poll, args=(interval,), daemon=True).start()
@@ -75,7 +75,7 @@ class UserGarageResponse(BaseModel):
     items: list[GarageItem]
 
     @classmethod
-    def from_db(cls, data: Row) -> "UserGarageResponse":
+    def from_db(cls, data: list[Row]) -> "UserGarageResponse":
         return cls(items=[GarageItem.from_db(item) for item in data])
 
 
@@ -21,6 +21,7 @@ from sqlalchemy import (
 from src.database import (
     racer_makes_table,
     racer_models_table,
+    token_revocations_table,
     user_garage_table,
     user_sessions_table,
     users_table,
@@ -65,18 +66,82 @@ def build_make_user_session_query(token: str, user_id: int, expire: int) -> Inse
     )
 
 
-def build_get_user_by_token_query(token: str) -> Select:
+def build_get_user_by_token_query(token: str, now: int) -> Select:
     return (
-        select(users_table.c.id, users_table.c.username, users_table.c.email)
-        .where(user_sessions_table.c.token == token)
+        select(
+            users_table.c.id,
+            users_table.c.username,
+            users_table.c.email,
+            user_sessions_table.c.expire,
+        )
+        .where(
+            user_sessions_table.c.token == token,
+            user_sessions_table.c.expire > now,
+            users_table.c.deleted == False,
+        )
         .join(users_table, user_sessions_table.c.user_id == users_table.c.id)
     )
 
 
+def build_delete_expired_sessions_query(now: int, limit: int) -> Delete:
+    return (
+        delete(user_sessions_table)
+        .where(user_sessions_table.c.expire < now)
+        .with_dialect_options(mysql_limit=limit)
+    )
+
+
+def build_get_user_query(user_id: int) -> Select:
+    return select(users_table).where(users_table.c.id == user_id)
+
+
+def build_get_token_revocations_query(after_id: int, now: int) -> Select:
+    return (
+        select(token_revocations_table)
+        .where(
+            token_revocations_table.c.id > after_id,
+            token_revocations_table.c.expire > now,
+        )
+        .order_by(token_revocations_table.c.id)
+    )
+
+
+def build_add_token_revocation_query(
+    user_id: int, token_version: int, expire: int
+) -> Insert:
+    return insert(token_revocations_table).values(
+        user_id=user_id, token_version=token_version, expire=expire
+    )
+
+
+def build_delete_expired_token_revocations_query(now: int, limit: int) -> Delete:
+    return (
+        delete(token_revocations_table)
+        .where(token_revocations_table.c.expire < now)
+        .with_dialect_options(mysql_limit=limit)
+    )
+
+
+def build_get_token_version_query(user_id: int) -> Select:
+    return select(users_table.c.token_version).where(users_table.c.id == user_id)
+
+
+def build_bump_token_version_query(user_id: int) -> Update:
+    return (
+        update(users_table)
+        .where(users_table.c.id == user_id)
+        .values(token_version=users_table.c.token_version + 1)
+    )
+
+
 def build_delete_session_query(token: str) -> Delete:
     return delete(user_sessions_table).where(user_sessions_table.c.token == token)
 
 
+def build_delete_user_sessions_query(user_id: int) -> Delete:
+    return delete(user_sessions_table).where(user_sessions_table.c.user_id == user_id)
+
+
 def build_add_user_garage_item_query(
     user_id: int, model_id: int, relation: str
 ) -> Insert:
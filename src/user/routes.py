@@ -1,7 +1,18 @@
+import time
+
 from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import Row
 
-from src.auth import SESSION_KEY_NAME, auth_required, get_token
+from src.auth import (
+    SESSION_KEY_NAME,
+    auth_required,
+    auth_required_fresh,
+    get_token,
+    session_cache,
+)
+from src.database import request_connection
+from src.tokens import TOKEN_SECONDS, TokenUser, is_signed_token, read_signed_token
 from src.user.models import (
     ChangePasswordRequest,
     DeleteGarageItemRequest,
@@ -23,17 +34,30 @@ from src.user.service import (
     delete_user,
     delete_user_garage_item,
     edit_user_field,
+    get_signed_token,
     get_user_by_token,
     get_user_garage,
     login,
+    revoke_signed_tokens,
     set_temp_password,
     signup,
 )
 from src.user.validation import invalid_email, invalid_password, invalid_username
 
-router = APIRouter(prefix="/api/user")
+router = APIRouter(prefix="/api/user", dependencies=[Depends(request_connection)])
+
+_SESSION_EXPIRE = TOKEN_SECONDS  # 2 weeks
+
 
-_SESSION_EXPIRE = 86400 * 7 * 2  # 2 weeks
+def _reissue_signed_token(user: Row | TokenUser, response: Response) -> None:
+    """Changing password or details revokes every signed token the user has.
+    Gives the session that made the change a fresh one with the same expiry."""
+    if isinstance(user, TokenUser):
+        response.set_cookie(
+            key=SESSION_KEY_NAME,
+            value=get_signed_token(user.id, user.expire),
+            expires=max(user.expire - int(time.time()), 0),
+        )
 
 
 ##############
@@ -50,7 +74,9 @@ async def _signup_user(request: SignUpRequest) -> SuccessResponse:
         errors.append(err)
     if err := invalid_email(request.email):
         errors.append(err)
-    if user := check_user_exists(request.username, request.email):
+    if user := await run_in_threadpool(
+        check_user_exists, request.username, request.email
+    ):
         if user.email == request.email:
             exists_type = "Email"
         else:
@@ -63,7 +89,7 @@ async def _signup_user(request: SignUpRequest) -> SuccessResponse:
             errors=errors,
         )
 
-    signup(request.username, request.password, request.email)
+    await run_in_threadpool(signup, request.username, request.password, request.email)
     return SuccessResponse(success=True, errors=[])
 
 
@@ -72,7 +98,9 @@ async def _login_user(
     request: LoginRequest,
     response: Response,
 ) -> SuccessResponse:
-    if token := login(request.username, request.password, _SESSION_EXPIRE):
+    if token := await run_in_threadpool(
+        login, request.username, request.password, _SESSION_EXPIRE
+    ):
         response.set_cookie(
             key=SESSION_KEY_NAME,
             value=token,
@@ -84,15 +112,15 @@ async def _login_user(
 
 @router.get("/garage")
 async def _get_garage(user_id: int) -> UserGarageResponse:
-    return UserGarageResponse.from_db(get_user_garage(user_id))
+    return UserGarageResponse.from_db(await run_in_threadpool(get_user_garage, user_id))
 
 
 @router.post("/forgot-password")
 async def _forgot_password(
     request: ForgotPasswordRequest,
 ) -> SuccessResponse:
-    if user := check_user_exists("", request.email):
-        set_temp_password(user)
+    if user := await run_in_threadpool(check_user_exists, "", request.email):
+        await run_in_threadpool(set_temp_password, user)
         return SuccessResponse(success=True)
     else:
         return SuccessResponse(success=False, errors=["No user found with that email."])
@@ -113,8 +141,14 @@ async def _logout_user(
     response: Response,
     token: None | str = Depends(get_token),
 ) -> SuccessResponse:
+    if token and is_signed_token(token):
+        if user := read_signed_token(token):
+            await run_in_threadpool(revoke_signed_tokens, user.id)
+        response.delete_cookie(SESSION_KEY_NAME)
+        return SuccessResponse(success=True)
     if token:
-        delete_session(token)
+        await run_in_threadpool(delete_session, token)
+        session_cache.forget_session(token)
         response.delete_cookie(SESSION_KEY_NAME)
         return SuccessResponse(success=True)
     return SuccessResponse(success=False)
@@ -123,7 +157,8 @@ async def _logout_user(
 @router.post("/change-password")
 async def _change_password_user(
     request: ChangePasswordRequest,
-    user: Row = Depends(auth_required),
+    response: Response,
+    user: Row = Depends(auth_required_fresh),
 ) -> SuccessResponse:
     errors = []
     if err := invalid_password(request.new):
@@ -133,8 +168,9 @@ async def _change_password_user(
             success=False,
             errors=errors,
         )
-    if user_id := authenticate(user.username, request.old):
-        change_password(user_id, request.new)
+    if user_id := await run_in_threadpool(authenticate, user.username, request.old):
+        await run_in_threadpool(change_password, user_id, request.new)
+        await run_in_threadpool(_reissue_signed_token, user, response)
     else:
         errors.append("Incorrect current password.")
     return SuccessResponse(success=not errors, errors=errors)
@@ -143,6 +179,7 @@ async def _change_password_user(
 @router.post("/edit")
 async def _edit_field_user(
     request: EditUserFieldRequest,
+    response: Response,
     user: Row = Depends(auth_required),
 ) -> SuccessResponse:
     errors = []
@@ -156,21 +193,30 @@ async def _edit_field_user(
     else:
         raise HTTPException(status.HTTP_403_FORBIDDEN)
 
-    if request.field == "username" and check_user_exists(request.value, ""):
-        errors.append("Username already in use. Please use another.")
-    elif request.field == "email" and check_user_exists("", request.value):
-        errors.append("Email already in use. Please use another.")
+    if request.field in ("username", "email"):
+        username = request.value if request.field == "username" else ""
+        email = request.value if request.field == "email" else ""
+        if await run_in_threadpool(check_user_exists, username, email):
+            errors.append(
+                f"{request.field.capitalize()} already in use. Please use another."
+            )
     if errors:
         return SuccessResponse(success=False, errors=errors)
-    success = edit_user_field(user.id, request.field, request.value)
+    success = await run_in_threadpool(
+        edit_user_field, user.id, request.field, request.value
+    )
+    session_cache.forget_user(user.id)
+    await run_in_threadpool(_reissue_signed_token, user, response)
     return SuccessResponse(success=success)
 
 
 @router.post("/delete")
 async def _delete_user(
-    user: Row = Depends(auth_required),
+    user: Row = Depends(auth_required_fresh),
 ) -> SuccessResponse:
-    return SuccessResponse(success=delete_user(user.id))
+    success = await run_in_threadpool(delete_user, user.id)
+    session_cache.forget_user(user.id)
+    return SuccessResponse(success=success)
 
 
 @router.post("/garage")
@@ -178,7 +224,8 @@ async def _add_garage_item(
     item: GarageItem,
     user: Row = Depends(auth_required),
 ) -> SuccessResponse:
-    success = add_user_garage_item(
+    success = await run_in_threadpool(
+        add_user_garage_item,
         user_id=user.id,
         make=item.make_name,
         model=item.name,
@@ -193,5 +240,7 @@ async def _delete_garage_item(
     request: DeleteGarageItemRequest,
     user: Row = Depends(auth_required),
 ) -> SuccessResponse:
-    success = delete_user_garage_item(user_id=user.id, model_id=request.model_id)
+    success = await run_in_threadpool(
+        delete_user_garage_item, user_id=user.id, model_id=request.model_id
+    )
     return SuccessResponse(success=success)
@@ -6,9 +6,10 @@ from uuid import uuid4
 from sqlalchemy import Row
 
 from src.constants import GarageItemRelations
-from src.database import engine as db
+from src.database import connect
 from src.mail import send_mail
 from src.racing.service import get_racer
+from src.tokens import make_signed_token, signed_tokens_enabled, token_versions
 from src.user.queries import (
     build_add_user_garage_item_query,
     build_change_password_query,
@@ -16,9 +17,11 @@ from src.user.queries import (
     build_delete_session_query,
     build_delete_user_garage_item_query,
     build_delete_user_query,
+    build_delete_user_sessions_query,
     build_get_model_id_query,
     build_get_user_by_token_query,
     build_get_user_garage_query,
+    build_get_user_query,
     build_get_user_session_query,
     build_make_user_session_query,
     build_signup_query,
@@ -49,14 +52,17 @@ def _generate_temp_password() -> str:
 
 
 def delete_session(token: str) -> None:
-    with db.connect() as conn:
+    with connect() as conn:
         conn.execute(build_delete_session_query(token))
         conn.commit()
 
 
 def get_user_by_token(token: str) -> Row | None:
-    with db.connect() as conn:
-        user = conn.execute(build_get_user_by_token_query(token)).one_or_none()
+    timestamp_now = int(datetime.timestamp(datetime.now()))
+    with connect() as conn:
+        user = conn.execute(
+            build_get_user_by_token_query(token, timestamp_now)
+        ).one_or_none()
         if user:
             return user
 
@@ -66,7 +72,7 @@ def expired_session(expires_timestamp: int) -> bool:
 
 
 def get_user_token(user_id: int, expires: int) -> str | None:
-    with db.connect() as conn:
+    with connect() as conn:
         session = conn.execute(build_get_user_session_query(user_id)).one_or_none()
         if session:
             if expired_session(session.expire):
@@ -86,9 +92,23 @@ def get_user_token(user_id: int, expires: int) -> str | None:
     return new_token
 
 
+def get_signed_token(user_id: int, expire: int) -> str:
+    """A signed token for the user as they are now, expiring at expire."""
+    with connect() as conn:
+        user = conn.execute(build_get_user_query(user_id)).one()
+    return make_signed_token(
+        user.id, user.username, user.email, expire, user.token_version
+    )
+
+
+def revoke_signed_tokens(user_id: int) -> None:
+    if signed_tokens_enabled():
+        token_versions.bump(user_id)
+
+
 def authenticate(username: str, password: str) -> None | int:
     encrypted_pass = _encrypt_password(password)
-    with db.connect() as conn:
+    with connect() as conn:
         user = conn.execute(
             build_user_auth_query(username, encrypted_pass)
         ).one_or_none()
@@ -97,8 +117,11 @@ def authenticate(username: str, password: str) -> None | int:
 
 
 def login(username: str, password: str, expires: int) -> str | None:
-    with db.connect() as conn:
+    with connect() as conn:
         if user_id := authenticate(username, password):
+            if signed_tokens_enabled():
+                timestamp_now = int(datetime.timestamp(datetime.now()))
+                return get_signed_token(user_id, timestamp_now + expires)
             return get_user_token(user_id, expires)
 
 
@@ -108,7 +131,7 @@ def login(username: str, password: str, expires: int) -> str | None:
 
 
 def check_user_exists(username: str, email: str) -> Row | None:
-    with db.connect() as conn:
+    with connect() as conn:
         result = conn.execute(
             build_check_user_exists_query(username, email)
         ).one_or_none()
@@ -117,7 +140,7 @@ def check_user_exists(username: str, email: str) -> Row | None:
 
 def signup(username: str, password: str, email: str) -> None:
     encrypted_pass = _encrypt_password(password)
-    with db.connect() as conn:
+    with connect() as conn:
         user = conn.execute(build_signup_query(username, encrypted_pass, email))
         user.lastrowid
         conn.commit()
@@ -143,24 +166,28 @@ def set_temp_password(user: Row) -> None:
 
 
 def change_password(user_id: int, new: str) -> None:
-    with db.connect() as conn:
+    with connect() as conn:
         conn.execute(build_change_password_query(user_id, _encrypt_password(new)))
         conn.commit()
+    revoke_signed_tokens(user_id)
 
 
 def edit_user_field(user_id: int, field: str, value: str) -> bool:
     if field not in _USER_EDITABLE_FIELDS:
         return False
-    with db.connect() as conn:
+    with connect() as conn:
         conn.execute(build_update_user_field_query(user_id, field, value))
         conn.commit()
+    revoke_signed_tokens(user_id)
     return True
 
 
 def delete_user(user_id: int) -> bool:
-    with db.connect() as conn:
+    with connect() as conn:
         conn.execute(build_delete_user_query(user_id))
+        conn.execute(build_delete_user_sessions_query(user_id))
         conn.commit()
+    revoke_signed_tokens(user_id)
     return True
 
 
@@ -169,7 +196,7 @@ def add_user_garage_item(
 ) -> bool:
     if relation not in list(GarageItemRelations):
         return False
-    with db.connect() as conn:
+    with connect() as conn:
         result = conn.execute(build_get_model_id_query(make, model, year)).first()
         if result:
             conn.execute(build_add_user_garage_item_query(user_id, result.id, relation))
@@ -179,12 +206,12 @@ def add_user_garage_item(
 
 
 def delete_user_garage_item(user_id: int, model_id: int) -> bool:
-    with db.connect() as conn:
+    with connect() as conn:
         conn.execute(build_delete_user_garage_item_query(user_id, model_id))
         conn.commit()
         return True
 
 
 def get_user_garage(user_id: int) -> list[Row]:
-    with db.connect() as conn:
+    with connect() as conn:
         return list(conn.execute(build_get_user_garage_query(user_id)).all())
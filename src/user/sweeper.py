@@ -0,0 +1,76 @@
+"""
+Deletes expired user_sessions and token_revocations in the background.
+
+Auth already ignores expired rows, so this only keeps the tables small.
+Each pass deletes BATCH_SIZE rows at a time, pausing BATCH_PAUSE seconds
+between batches so no single delete holds locks for long. Workers start
+their passes at a random point in the interval, so a rollout doesn't have
+every worker sweeping at once.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, cast
+
+from sqlalchemy import Delete
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.database import engine as db
+from src.user.queries import (
+    build_delete_expired_sessions_query,
+    build_delete_expired_token_revocations_query,
+)
+
+SWEEP_SECONDS = 300.0
+BATCH_SIZE = 1000
+BATCH_PAUSE = 0.1
+
+
+def _delete_in_batches(
+    build_query: Callable[[int, int], Delete], batch_size: int, pause: float
+) -> int:
+    timestamp_now = int(datetime.timestamp(datetime.now()))
+    deleted = 0
+    while True:
+        with db.connect() as conn:
+            result = conn.execute(build_query(timestamp_now, batch_size))
+            conn.commit()
+        deleted += cast(int, result.rowcount)
+        if result.rowcount < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def sweep_expired_sessions(
+    batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE
+) -> int:
+    return _delete_in_batches(build_delete_expired_sessions_query, batch_size, pause)
+
+
+def sweep_expired_revocations(
+    batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE
+) -> int:
+    return _delete_in_batches(
+        build_delete_expired_token_revocations_query, batch_size, pause
+    )
+
+
+def _sweep(interval: float) -> None:
+    time.sleep(random.uniform(0, interval))
+    while True:
+        try:
+            if deleted := sweep_expired_sessions():
+                print(f"[SESSIONS] Deleted {deleted} expired sessions")
+            if deleted := sweep_expired_revocations():
+                print(f"[SESSIONS] Deleted {deleted} expired token revocations")
+        except SQLAlchemyError as error:
+            print(f"[SESSIONS] Sweep failed: {error}")
+        time.sleep(interval)
+
+
+def start_sweeping(interval: float = SWEEP_SECONDS) -> threading.Thread:
+    thread = threading.Thread(target=_sweep, args=(interval,), daemon=True)
+    thread.start()
+    return thread
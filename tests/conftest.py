@@ -3,9 +3,10 @@ from typing import Generator
 
 import pytest
 import uvicorn
-from sqlalchemy import Connection, create_engine, text
+from sqlalchemy import Connection, create_engine, event, text
 from sqlalchemy.engine.base import Engine
 
+from src.database import engine as app_engine
 from tests.dummy_data import TEST_DATA_MAKES, TEST_DATA_MODELS
 
 MIGRATIONS_DIR = os.path.join(os.getcwd(), "migrations")
@@ -59,6 +60,21 @@ def db() -> Generator:
         yield conn
 
 
+@pytest.fixture
+def executed_queries() -> Generator:
+    """Statements run through the app's engine while the test runs."""
+    statements: list[str] = []
+
+    def _record(
+        conn: Connection, cursor: object, statement: str, *args: object
+    ) -> None:
+        statements.append(statement)
+
+    event.listen(app_engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(app_engine, "before_cursor_execute", _record)
+
+
 def pytest_sessionstart(session: pytest.Session) -> None:
     with db_engine.connect() as conn:
         conn.execute(text(f"DROP DATABASE IF EXISTS {DB_NAME}"))
@@ -6,7 +6,11 @@ from uuid import uuid4
 from sqlalchemy import Connection, Row, text
 
 from src.auth import auth_optional, auth_required
-from src.racing.service import make_unique_race_id
+from src.racing.service import (
+    count_race_combinations,
+    count_race_pairs,
+    make_unique_race_id,
+)
 
 _insert_user_query = """
 INSERT INTO users
@@ -20,6 +24,12 @@ INSERT INTO user_sessions
 VALUES('{token}', '{user_id}', '{expire}')
 """
 
+_insert_token_revocation_query = """
+INSERT INTO token_revocations
+  (user_id, token_version, expire)
+VALUES({user_id}, {token_version}, {expire})
+"""
+
 
 _insert_user_garage_query = """
 INSERT INTO user_garage
@@ -27,17 +37,38 @@ INSERT INTO user_garage
 VALUES({user_id}, {model_id}, '{relation}')
 """
 
+_increment_race_pair_count_query = """
+INSERT INTO race_pair_counts
+    (model_id_1, model_id_2, occurence)
+VALUES({model_id_1}, {model_id_2}, {count})
+ON DUPLICATE KEY UPDATE occurence = occurence + {count}
+"""
+
+_increment_race_combination_count_query = """
+INSERT INTO race_combination_counts
+    (race_unique_id, racer_count, model_ids, occurence)
+VALUES('{race_unique_id}', {racer_count}, '{model_ids}', {count})
+ON DUPLICATE KEY UPDATE occurence = occurence + {count}
+"""
+
+_increment_race_stats_query = """
+INSERT INTO race_unique_stats
+    (race_unique_id, {column})
+VALUES('{race_unique_id}', 1)
+ON DUPLICATE KEY UPDATE {column} = {column} + 1
+"""
+
 
 def encrypt_password(password: str) -> str:
     return hashlib.sha512(password.encode("utf-8")).hexdigest()
 
 
 def make_auth_required(token: str) -> Row:
-    return auth_required(token)
+    return cast(Row, auth_required(token))
 
 
 def make_auth_optional(token: str) -> Row:
-    return auth_optional(token)
+    return cast(Row, auth_optional(token))
 
 
 def store_user(
@@ -81,6 +112,19 @@ def store_user_session(
     return token
 
 
+def store_token_revocation(
+    db: Connection, user_id: int, token_version: int, expire: int
+) -> None:
+    db.execute(
+        text(
+            _insert_token_revocation_query.format(
+                user_id=user_id, token_version=token_version, expire=expire
+            )
+        )
+    )
+    db.commit()
+
+
 def store_race(
     db: Connection, model_ids: list[int], user_id: None | int = None
 ) -> tuple[int, str]:
@@ -101,10 +145,42 @@ def store_race(
     race_id = cast(int, result.lastrowid)
     for model_id in model_ids:
         db.execute(text(f"INSERT INTO race_racers VALUES({race_id}, {model_id})"))
+    for (model_id_1, model_id_2), count in count_race_pairs(model_ids).items():
+        db.execute(
+            text(
+                _increment_race_pair_count_query.format(
+                    model_id_1=model_id_1, model_id_2=model_id_2, count=count
+                )
+            )
+        )
+    for combination_id, (combination, count) in count_race_combinations(
+        model_ids
+    ).items():
+        db.execute(
+            text(
+                _increment_race_combination_count_query.format(
+                    race_unique_id=combination_id,
+                    racer_count=len(combination),
+                    model_ids=",".join(map(str, combination)),
+                    count=count,
+                )
+            )
+        )
+    increment_race_stat(db, race_unique_id, "times_raced")
     db.commit()
     return race_id, race_unique_id
 
 
+def increment_race_stat(db: Connection, race_unique_id: str, column: str) -> None:
+    db.execute(
+        text(
+            _increment_race_stats_query.format(
+                race_unique_id=race_unique_id, column=column
+            )
+        )
+    )
+
+
 def store_garage_item(
     db: Connection,
     user_id: int,
@@ -0,0 +1,94 @@
+import random
+from collections import Counter
+from itertools import permutations
+from pathlib import Path
+
+import numpy as np
+
+from src.racing.co_raced import CoRaced, build_from_chunks, write_co_raced
+
+
+def _random_rows(races: int, models: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = random.Random(1)
+    rows = [
+        (race_id, rng.randint(1, models))
+        for race_id in range(1, races + 1)
+        for _ in range(rng.randint(2, 6))
+    ]
+    return np.array(rows)[:, 0], np.array(rows)[:, 1]
+
+
+def _brute_force(race_ids: np.ndarray, model_ids: np.ndarray) -> Counter:
+    races: dict[int, set[int]] = {}
+    for race_id, model_id in zip(race_ids.tolist(), model_ids.tolist()):
+        races.setdefault(race_id, set()).add(model_id)
+    return Counter(
+        pair for racers in races.values() for pair in permutations(racers, 2)
+    )
+
+
+def _chunks(
+    race_ids: np.ndarray, model_ids: np.ndarray, size: int
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    return [
+        (race_ids[i : i + size], model_ids[i : i + size])
+        for i in range(0, len(race_ids), size)
+    ]
+
+
+def _load(tmp_path: Path, arrays: dict[str, np.ndarray]) -> CoRaced:
+    path = str(tmp_path / "co_raced.npz")
+    write_co_raced(path, arrays)
+    return CoRaced(path)
+
+
+def test_matches_brute_force_across_chunks(tmp_path: Path) -> None:
+    # Given
+    race_ids, model_ids = _random_rows(races=500, models=40)
+    expected = _brute_force(race_ids, model_ids)
+
+    # When
+    index = _load(tmp_path, build_from_chunks(_chunks(race_ids, model_ids, 7), k=5))
+
+    # Then
+    for model_id in range(1, 41):
+        counts = sorted(
+            (
+                (-count, other)
+                for (model, other), count in expected.items()
+                if model == model_id
+            )
+        )[:5]
+        assert index.get(model_id, 5) == [(other, -count) for count, other in counts]
+
+
+def test_chunk_size_does_not_change_result() -> None:
+    race_ids, model_ids = _random_rows(races=200, models=20)
+    whole = build_from_chunks([(race_ids, model_ids)])
+    for size in (1, 2, 3, 50):
+        split = build_from_chunks(_chunks(race_ids, model_ids, size))
+        for name, array in whole.items():
+            np.testing.assert_array_equal(split[name], array)
+
+
+def test_model_entered_twice_counts_once(tmp_path: Path) -> None:
+    # Given
+    race_ids, model_ids = np.array([1, 1, 1, 2, 2]), np.array([3, 3, 4, 3, 4])
+
+    # When
+    index = _load(tmp_path, build_from_chunks([(race_ids, model_ids)]))
+
+    # Then
+    assert index.get(3, 5) == [(4, 2)]
+    assert index.get(4, 1) == [(3, 2)]
+
+
+def test_unknown_model(tmp_path: Path) -> None:
+    index = _load(tmp_path, build_from_chunks([(np.array([1, 1]), np.array([1, 2]))]))
+    assert index.get(3, 5) == []
+    assert index.get(0, 5) == []
+
+
+def test_empty(tmp_path: Path) -> None:
+    index = _load(tmp_path, build_from_chunks([]))
+    assert index.get(1, 5) == []
@@ -0,0 +1,55 @@
+import pytest
+
+from src.racing import dedup
+from src.racing.dedup import SaveDedup
+
+
+def _at(monkeypatch: pytest.MonkeyPatch, now: float) -> None:
+    monkeypatch.setattr(dedup.time, "monotonic", lambda: now)
+
+
+def test_expires_after_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    saves: SaveDedup[str] = SaveDedup(seconds=10)
+    _at(monkeypatch, 100)
+    saves.put((1, "abc"), "race")
+
+    # When
+    _at(monkeypatch, 109.9)
+    within = saves.get((1, "abc"))
+    _at(monkeypatch, 110)
+    after = saves.get((1, "abc"))
+
+    # Then
+    assert within == "race"
+    assert after is None
+    assert len(saves) == 0
+
+
+def test_keyed_by_owner_and_race(monkeypatch: pytest.MonkeyPatch) -> None:
+    _at(monkeypatch, 0)
+    saves: SaveDedup[str] = SaveDedup(seconds=10)
+    saves.put((1, "abc"), "race")
+    assert saves.get((2, "abc")) is None
+    assert saves.get((1, "abd")) is None
+
+
+def test_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    _at(monkeypatch, 0)
+    saves: SaveDedup[int] = SaveDedup(seconds=10, max_entries=2)
+
+    # When
+    for owner in (1, 2, 3):
+        saves.put((owner, "abc"), owner)
+
+    # Then
+    assert len(saves) == 2
+    assert saves.get((1, "abc")) is None
+    assert saves.get((3, "abc")) == 3
+
+
+def test_disabled() -> None:
+    saves: SaveDedup[str] = SaveDedup(seconds=0)
+    saves.put((1, "abc"), "race")
+    assert saves.get((1, "abc")) is None
@@ -0,0 +1,110 @@
+import math
+import random
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from src.racing.engine import finish_ticks, finishing_order, rank_races
+
+EngineRacer = namedtuple(
+    "EngineRacer", ("id", "power", "torque", "weight", "weight_type")
+)
+
+
+def _js_race(racers: list[EngineRacer], track_length: float) -> list[int]:
+    """Tick-by-tick port of Racer.move in frontend/race.js."""
+    states = []
+    for racer in racers:
+        weight = racer.weight + 20 if racer.weight_type == "dry" else racer.weight
+        states.append(
+            {
+                "id": racer.id,
+                "ptw": racer.power / weight / 5,
+                "acc": racer.torque / weight / 5,
+                "progress": racer.torque / 25,
+                "margin_left": 0.0,
+            }
+        )
+    finished: list[int] = []
+    while len(finished) < len(states):
+        for state in states:
+            if state["id"] in finished:
+                continue
+            momentum = (
+                state["acc"] * state["progress"] + 1 + state["ptw"] * state["progress"]
+            )
+            state["margin_left"] = math.floor(state["margin_left"]) + momentum
+            state["progress"] += 0.3
+            if math.floor(state["margin_left"]) > track_length:
+                finished.append(state["id"])
+    return finished
+
+
+def _random_racers(rng: random.Random, count: int) -> list[EngineRacer]:
+    return [
+        EngineRacer(
+            id=model_id,
+            power=rng.randint(5, 300),
+            torque=rng.randint(5, 250),
+            weight=rng.randint(80, 400),
+            weight_type=rng.choice(["dry", "wet", "total"]),
+        )
+        for model_id in range(count)
+    ]
+
+
+@pytest.mark.parametrize("track_length", (300, 1200, 2400))
+def test_rank_races_matches_js(track_length: int) -> None:
+    # Given
+    rng = random.Random(track_length)
+    races = [_random_racers(rng, rng.randint(2, 8)) for _ in range(500)]
+
+    # When
+    results = rank_races(races, track_length)  # type: ignore
+
+    # Then
+    assert [[racer.id for racer in result] for result in results] == [
+        _js_race(racers, track_length) for racers in races
+    ]
+
+
+def test_rank_races_ties_keep_starting_order() -> None:
+    # Given
+    racer = EngineRacer(id=1, power=100, torque=100, weight=200, weight_type="wet")
+    races = [[racer, racer._replace(id=2), racer._replace(id=3)]]
+
+    # When
+    results = rank_races(races)  # type: ignore
+
+    # Then
+    assert [racer.id for racer in results[0]] == [1, 2, 3]
+
+
+def test_rank_races_missing_stats_finish_last() -> None:
+    # Given
+    racers = [
+        EngineRacer(id=1, power=None, torque=100, weight=200, weight_type="wet"),
+        EngineRacer(id=2, power=10, torque=10, weight=300, weight_type="wet"),
+    ]
+
+    # When
+    results = rank_races([racers])  # type: ignore
+
+    # Then
+    assert [racer.id for racer in results[0]] == [2, 1]
+
+
+def test_finish_ticks_padding_never_finishes() -> None:
+    # Given
+    power = np.array([[100.0, np.nan]])
+    torque = np.array([[100.0, np.nan]])
+    weight = np.array([[200.0, np.nan]])
+
+    # When
+    ticks = finish_ticks(power, torque, weight)
+
+    # Then
+    assert np.isfinite(ticks[0, 0])
+    assert np.isinf(ticks[0, 1])
+    assert finishing_order(ticks).tolist() == [[0, 1]]
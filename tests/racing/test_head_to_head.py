@@ -0,0 +1,58 @@
+from collections import namedtuple
+from pathlib import Path
+
+import pytest
+
+from src.racing.engine import rank_races
+from src.racing.head_to_head import HeadToHead, build_matrix, write_head_to_head
+
+EngineRacer = namedtuple(
+    "EngineRacer", ("id", "power", "torque", "weight", "weight_type")
+)
+
+_RACERS = [
+    EngineRacer(id=7, power=120, torque=120, weight=210, weight_type="total"),
+    EngineRacer(id=3, power=100, torque=110, weight=220, weight_type="total"),
+    EngineRacer(id=12, power=90, torque=101, weight=200, weight_type="dry"),
+    EngineRacer(id=9, power=140, torque=120, weight=190, weight_type="total"),
+    EngineRacer(id=20, power=90, torque=101, weight=220, weight_type="wet"),
+]
+
+
+@pytest.fixture
+def head_to_head(tmp_path: Path) -> HeadToHead:
+    path = str(tmp_path / "head_to_head.bin")
+    write_head_to_head(path, *build_matrix(_RACERS))  # type: ignore
+    return HeadToHead(path)
+
+
+def test_beats_matches_two_racer_races(head_to_head: HeadToHead) -> None:
+    for racer in _RACERS:
+        for other in _RACERS:
+            winner = rank_races([[racer, other]])[0][0]  # type: ignore
+            if head_to_head.beats(racer.id, other.id):
+                assert winner == racer
+                assert not head_to_head.beats(other.id, racer.id)
+
+
+def test_record(head_to_head: HeadToHead) -> None:
+    assert len(head_to_head) == 5
+    assert [head_to_head.record(racer.id) for racer in _RACERS] == [
+        (3, 2),
+        (2, 3),
+        (0, 4),
+        (4, 1),
+        (0, 4),
+    ]
+
+
+def test_unknown_model(head_to_head: HeadToHead) -> None:
+    assert head_to_head.record(8) is None
+    assert head_to_head.record(21) is None
+    assert head_to_head.beats(7, 8) is None
+
+
+def test_empty_catalog(tmp_path: Path) -> None:
+    path = str(tmp_path / "head_to_head.bin")
+    write_head_to_head(path, *build_matrix([]))
+    assert HeadToHead(path).record(1) is None
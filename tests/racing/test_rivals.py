@@ -0,0 +1,76 @@
+import random
+from collections import namedtuple
+
+import numpy as np
+
+from src.racing.rivals import RivalIndex
+
+RivalRacer = namedtuple(
+    "RivalRacer", ("id", "style", "power", "torque", "weight", "weight_type")
+)
+
+
+def _random_racers(count: int) -> list[RivalRacer]:
+    rng = random.Random(1)
+    return [
+        RivalRacer(
+            id=model_id,
+            style=rng.choice(["Sport", "Naked", "Touring"]),
+            power=rng.randint(5, 300),
+            torque=rng.randint(5, 250),
+            weight=rng.randint(80, 400),
+            weight_type=rng.choice(["dry", "wet"]),
+        )
+        for model_id in range(1, count + 1)
+    ]
+
+
+def _brute_force_rivals(
+    racers: list[RivalRacer], model_id: int, limit: int
+) -> list[int]:
+    stats = np.array(
+        [
+            (
+                racer.power,
+                racer.torque,
+                racer.weight + 20 * (racer.weight_type == "dry"),
+            )
+            for racer in racers
+        ],
+        dtype=float,
+    )
+    points = stats / stats.std(axis=0)
+    target = points[[racer.id for racer in racers].index(model_id)]
+    distances = np.linalg.norm(points - target, axis=1)
+    ranked = [racers[i].id for i in np.argsort(distances, kind="stable")]
+    return [rival for rival in ranked if rival != model_id][:limit]
+
+
+def test_rivals_match_brute_force() -> None:
+    racers = _random_racers(500)
+    index = RivalIndex(racers)  # type: ignore
+    for model_id in range(1, 501, 7):
+        assert index.rivals(model_id, 5) == _brute_force_rivals(racers, model_id, 5)
+
+
+def test_rivals_same_style() -> None:
+    racers = _random_racers(500)
+    index = RivalIndex(racers)  # type: ignore
+    styles = {racer.id: racer.style for racer in racers}
+    for model_id in range(1, 501, 7):
+        rivals = index.rivals(model_id, 5, same_style=True)
+        assert len(rivals) == 5
+        assert {styles[rival] for rival in rivals} == {styles[model_id]}
+
+
+def test_rivals_skip_incomplete_and_unknown() -> None:
+    racers = _random_racers(3) + [
+        RivalRacer(
+            id=4, style="Sport", power=None, torque=90, weight=200, weight_type="wet"
+        )
+    ]
+    index = RivalIndex(racers)  # type: ignore
+    assert 4 not in index.rivals(1, 5)
+    assert index.rivals(4, 5) == []
+    assert index.rivals(99, 5) == []
+    assert len(index.rivals(1, 5)) == 2
@@ -1,33 +1,74 @@
+import json
+from collections import deque
+from datetime import datetime
+from pathlib import Path
 from typing import Generator, cast
 
 import pytest
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from sqlalchemy import Connection, Row, text
 
+from src.database import pool_checkouts, request_connection, request_scope
+from src.racing import co_raced, head_to_head, recent, service
+from src.racing.cache import RaceCache, race_cache
+from src.racing.catalog import refresh_catalog, reload_catalog
+from src.racing.dedup import SaveDedup
+from src.racing.jobs import (
+    backfill_race_combination_counts,
+    backfill_race_pair_counts,
+    build_co_raced_neighbours,
+    build_head_to_head_matrix,
+    reconcile_race_stats,
+)
 from src.racing.models import (
+    CoRacedRacer,
+    CoRacedResponse,
+    HeadToHeadResponse,
+    MakesSearchResponse,
     Race,
     RaceListing,
     Racer,
+    RacerBatchItem,
+    RacerBatchRequest,
+    RacerBatchResponse,
+    RaceResultRequest,
+    RaceResultResponse,
+    RacerLookup,
     RaceVoteRequest,
+    RaceVotesBatchRequest,
+    RaceVotesBatchResponse,
     RaceVotesResponse,
+    RaceVotesSummary,
     SaveRequest,
     SuccessResponse,
 )
+from src.racing.recent import RecentRaces, recent_races
+from src.racing.rivals import get_rival_index
 from src.racing.routes import (
+    _get_head_to_head,
+    _get_insight_co_raced,
+    _get_insight_popular_combinations,
     _get_insight_popular_pairs,
     _get_insight_recent_races,
     _get_race,
+    _get_race_result,
     _get_racer,
+    _get_racers,
+    _get_rivals,
     _get_voted,
     _get_votes,
+    _get_votes_batch,
     _save_race,
     _search_racer_makes,
     _search_racers,
     _vote_race,
+    router,
 )
-from src.racing.service import make_unique_race_id
+from src.racing.save_buffer import RaceSaveBuffer
+from src.racing.service import make_race_cursor, make_unique_race_id
 from tests.dummy_data import TEST_DATA_MAKES, TEST_DATA_MODELS
 from tests.factories import (
+    increment_race_stat,
     make_auth_optional,
     make_auth_required,
     store_race,
@@ -40,11 +81,18 @@ from tests.factories import (
 def clear_racers(db: Connection) -> Generator:
     yield
     db.execute(text("DELETE FROM race_racers"))
+    db.execute(text("DELETE FROM race_pair_counts"))
+    db.execute(text("DELETE FROM race_combination_counts"))
     db.execute(text("DELETE FROM race_votes"))
+    db.execute(text("DELETE FROM race_unique_stats"))
     db.execute(text("DELETE FROM race_history"))
     db.execute(text("ALTER TABLE race_history AUTO_INCREMENT = 1"))
     db.execute(text("DELETE FROM race_unique"))
     db.commit()
+    race_cache.clear()
+    recent_races.clear()
+    service.recent_saves.clear()
+    service.known_race_unique_ids.clear()
 
 
 def _racer_from_data(model_id: int) -> Racer:
@@ -64,6 +112,7 @@ def _store_race_vote(
     db.execute(
         text(f"INSERT INTO race_votes VALUES('{race_unique_id}', {user_id}, {vote})")
     )
+    increment_race_stat(db, race_unique_id, "upvotes" if vote else "downvotes")
     db.commit()
 
 
@@ -73,6 +122,36 @@ def _get_race_unique(db: Connection, race_unique_id: str) -> Row:
     ).all()
 
 
+def _get_race_count(db: Connection) -> int:
+    return cast(
+        int, db.execute(text("SELECT COUNT(*) AS count FROM race_history")).one().count
+    )
+
+
+def _get_race_pair_counts(db: Connection) -> list[tuple[int, int, int]]:
+    return [
+        (row.model_id_1, row.model_id_2, row.occurence)
+        for row in db.execute(
+            text("SELECT * FROM race_pair_counts ORDER BY model_id_1, model_id_2")
+        )
+    ]
+
+
+def _get_race_combination_counts(db: Connection) -> list[tuple[str, int]]:
+    return [
+        (row.model_ids, row.occurence)
+        for row in db.execute(
+            text("SELECT * FROM race_combination_counts ORDER BY model_ids")
+        )
+    ]
+
+
+def _get_race_stats(db: Connection, race_unique_id: str) -> Row:
+    return db.execute(
+        text(f"SELECT * FROM race_unique_stats WHERE race_unique_id='{race_unique_id}'")
+    ).one()
+
+
 def _get_race_votes(db: Connection, race_unique_id: str) -> Row:
     return db.execute(
         text(f"SELECT * FROM race_votes WHERE race_unique_id='{race_unique_id}'")
@@ -107,6 +186,39 @@ async def test_get_racer(
     assert result == expected
 
 
+@pytest.mark.asyncio
+async def test_get_racers(db: Connection) -> None:
+    # Given
+    request = RacerBatchRequest(
+        racers=[
+            RacerLookup(make="MakeC", model="Name 4", year="2019"),
+            RacerLookup(make="MakeA", model="Name 1", year="2023"),
+            RacerLookup(make="makea", model="name 2", year=""),
+        ]
+    )
+
+    # When
+    result = await _get_racers(request)
+
+    # Then
+    assert result == RacerBatchResponse(
+        racers=[
+            RacerBatchItem(found=True, racer=_racer_from_data(4)),
+            RacerBatchItem(found=False),
+            RacerBatchItem(found=True, racer=_racer_from_data(2)),
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_racers_too_many(db: Connection) -> None:
+    request = RacerBatchRequest(
+        racers=[RacerLookup(make="MakeA", model="Name 1")] * 21,
+    )
+    with pytest.raises(HTTPException):
+        await _get_racers(request)
+
+
 @pytest.mark.asyncio
 async def test_get_race(db: Connection) -> None:
     # Given
@@ -114,7 +226,7 @@ async def test_get_race(db: Connection) -> None:
     store_race(db, [1, 2])
 
     # When
-    result = await _get_race(race_id_1)
+    result = Race.parse_raw((await _get_race(race_id_1)).body)
 
     # Then
     assert result == Race(
@@ -127,6 +239,200 @@ async def test_get_race(db: Connection) -> None:
     )
 
 
+@pytest.mark.asyncio
+async def test_get_race_queries_concurrently(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    race_id, _ = store_race(db, [3, 2])
+    checkouts = pool_checkouts.count
+
+    # When
+    with request_scope():
+        result = Race.parse_raw((await _get_race(race_id)).body)
+
+    # Then
+    assert result.race_id == race_id
+    assert len(executed_queries) == 2
+    assert pool_checkouts.count - checkouts == 2
+
+
+@pytest.mark.asyncio
+async def test_get_race_cached(db: Connection, executed_queries: list[str]) -> None:
+    # Given
+    race_id, _ = store_race(db, [3, 2])
+    first = await _get_race(race_id)
+    executed_queries.clear()
+
+    # When
+    result = await _get_race(race_id)
+
+    # Then
+    assert result.body == first.body
+    assert not executed_queries
+    assert (race_cache.hits, race_cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_recent_races_reuses_cached_races(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    race_id, _ = store_race(db, [1, 3, 5])
+    store_race(db, [3, 4, 1])
+    await _get_race(race_id)
+    executed_queries.clear()
+
+    # When
+    results = RaceListing.parse_raw((await _get_insight_recent_races()).body)
+
+    # Then
+    assert len(results.races) == 2
+    assert len(executed_queries) == 3
+    assert race_cache.hits == 1
+
+
+def test_race_cache_evicts_least_recently_used() -> None:
+    # Given
+    cache = RaceCache(max_items=2, max_bytes=10)
+    cache.put(1, b"1111")
+    cache.put(2, b"2222")
+    cache.get(1)
+
+    # When
+    cache.put(3, b"3333")
+
+    # Then
+    assert cache.get(2) is None
+    assert cache.get(1) == b"1111"
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+    # When
+    cache.put(4, b"44444444")
+
+    # Then
+    assert list(cache._items) == [4]
+    assert cache.evictions == 3
+
+
+@pytest.mark.asyncio
+async def test_get_race_result(db: Connection) -> None:
+    # Given
+    request = RaceResultRequest(model_ids=[1, 2, 3, 4, 5, 6])
+
+    # When
+    result = await _get_race_result(request)
+
+    # Then
+    assert result == RaceResultResponse(
+        racers=[_racer_from_data(model_id) for model_id in (4, 1, 5, 2, 3, 6)]
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("model_ids", ([], [1, 999]))
+async def test_get_race_result_invalid(db: Connection, model_ids: list[int]) -> None:
+    with pytest.raises(HTTPException):
+        await _get_race_result(RaceResultRequest(model_ids=model_ids))
+
+
+@pytest.mark.asyncio
+async def test_get_head_to_head(
+    db: Connection, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Given
+    monkeypatch.setattr(
+        head_to_head, "HEAD_TO_HEAD_PATH", str(tmp_path / "head_to_head.bin")
+    )
+    build_head_to_head_matrix()
+
+    # When
+    result = await _get_head_to_head(1)
+
+    # Then
+    assert result == HeadToHeadResponse(model_id=1, wins=4, rank=2, total=6)
+    with pytest.raises(HTTPException):
+        await _get_head_to_head(999)
+
+
+@pytest.mark.asyncio
+async def test_get_head_to_head_not_built(
+    db: Connection, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(head_to_head, "HEAD_TO_HEAD_PATH", str(tmp_path / "none"))
+    with pytest.raises(HTTPException):
+        await _get_head_to_head(1)
+
+
+@pytest.mark.asyncio
+async def test_get_insight_co_raced(
+    db: Connection, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Given
+    monkeypatch.setattr(co_raced, "CO_RACED_PATH", str(tmp_path / "co_raced.npz"))
+    store_race(db, [1, 2])
+    store_race(db, [1, 3, 2])
+    store_race(db, [1, 4])
+    store_race(db, [5, 6])
+    db.commit()
+    build_co_raced_neighbours()
+
+    # When
+    result = await _get_insight_co_raced(1)
+
+    # Then
+    assert result == CoRacedResponse(
+        racers=[
+            CoRacedRacer(racer=_racer_from_data(2), races=2),
+            CoRacedRacer(racer=_racer_from_data(3), races=1),
+            CoRacedRacer(racer=_racer_from_data(4), races=1),
+        ]
+    )
+    assert await _get_insight_co_raced(1, limit=1) == CoRacedResponse(
+        racers=[CoRacedRacer(racer=_racer_from_data(2), races=2)]
+    )
+    assert await _get_insight_co_raced(999) == CoRacedResponse(racers=[])
+
+
+@pytest.mark.asyncio
+async def test_get_insight_co_raced_not_built(
+    db: Connection, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(co_raced, "CO_RACED_PATH", str(tmp_path / "none"))
+    assert await _get_insight_co_raced(1) == CoRacedResponse(racers=[])
+
+
+@pytest.mark.asyncio
+async def test_get_rivals(db: Connection) -> None:
+    # When
+    result = await _get_rivals(1, limit=3)
+
+    # Then
+    assert result == [_racer_from_data(2), _racer_from_data(4), _racer_from_data(3)]
+
+
+def test_rival_index_rebuilt_on_catalog_reload(db: Connection) -> None:
+    # Given
+    index = get_rival_index()
+
+    # When
+    reload_catalog()
+
+    # Then
+    assert get_rival_index() is not index
+    assert get_rival_index() is get_rival_index()
+
+
+@pytest.mark.asyncio
+async def test_get_rivals_same_style(db: Connection) -> None:
+    # When
+    result = await _get_rivals(1, limit=3, same_style=True)
+
+    # Then
+    assert result == []  # Every dummy model has its own style
+
+
 @pytest.mark.asyncio
 async def test_get_race_not_found(db: Connection) -> None:
     with pytest.raises(HTTPException):
@@ -164,6 +470,8 @@ async def test_get_race_not_found(db: Connection) -> None:
         # Search patch cases...
         ("MakeA", "Name1", "", [_racer_from_data(1)]),
         ("MakeA", "Name-1", "", [_racer_from_data(1)]),
+        # Case insensitive...
+        ("makea", "NAME 1", "", [_racer_from_data(1)]),
     ),
 )
 async def test_search_racers(
@@ -176,6 +484,83 @@ async def test_search_racers(
     assert result == expected
 
 
+@pytest.mark.asyncio
+async def test_search_racers_after_catalog_reload(db: Connection) -> None:
+    # Given
+    reload_catalog()
+    db.execute(
+        text(
+            "INSERT INTO racer_models "
+            "(id, name, make, style, year, power, torque, weight, weight_type) "
+            "VALUES (100, 'Name 100', 2, 'Style 1', 2016, 100, 100, 200, 'total')"
+        )
+    )
+    db.commit()
+
+    # When
+    before = await _search_racers(make="MakeB", model="Name100", year="")
+    reload_catalog()
+    after = await _search_racers(make="MakeB", model="Name100", year="")
+    db.execute(text("DELETE FROM racer_models WHERE id = 100"))
+    db.commit()
+    reload_catalog()
+
+    # Then
+    assert before == []
+    assert [racer.model_id for racer in after] == [100]
+
+
+def _store_racer_100(db: Connection) -> None:
+    db.execute(
+        text(
+            "INSERT INTO racer_models "
+            "(id, name, make, style, year, power, torque, weight, weight_type) "
+            "VALUES (100, 'Name 100', 2, 'Style 1', 2016, 100, 100, 200, 'total')"
+        )
+    )
+    db.commit()
+
+
+def _delete_racer_100(db: Connection) -> None:
+    db.execute(text("DELETE FROM racer_models WHERE id = 100"))
+    db.commit()
+    reload_catalog()
+
+
+@pytest.mark.asyncio
+async def test_refresh_catalog_picks_up_new_racers(db: Connection) -> None:
+    # Given
+    reload_catalog()
+    unchanged = refresh_catalog()
+    _store_racer_100(db)
+
+    # When
+    changed = refresh_catalog()
+    result = await _search_racers(make="MakeB", model="Name100", year="")
+    _delete_racer_100(db)
+
+    # Then
+    assert not unchanged
+    assert changed
+    assert [racer.model_id for racer in result] == [100]
+
+
+@pytest.mark.asyncio
+async def test_save_race_racer_not_in_catalog_yet(db: Connection) -> None:
+    # Given
+    reload_catalog()
+    _store_racer_100(db)
+
+    # When
+    result = await _save_race(SaveRequest(model_ids=[1, 100]), user=None)
+    db.execute(text("DELETE FROM race_racers WHERE model_id = 100"))
+    db.commit()
+    _delete_racer_100(db)
+
+    # Then
+    assert [racer.model_id for racer in result.racers] == [1, 100]
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "make,expected",
@@ -183,18 +568,39 @@ async def test_search_racers(
         ("Make", ["MakeA", "MakeB", "MakeC"]),
         ("MakeA", ["MakeA"]),
         ("", ["MakeA", "MakeB", "MakeC"]),
+        ("akeb", ["MakeB"]),
+        ("Nope", []),
     ),
 )
 async def test_search_racer_makes(
     db: Connection, make: str, expected: list[str]
 ) -> None:
     # When
-    result = await _search_racer_makes(make=make)
+    result = await _search_racer_makes(make=make, response=Response())
 
     # Then
+    assert isinstance(result, MakesSearchResponse)
     assert result.makes == expected
 
 
+@pytest.mark.asyncio
+async def test_search_racer_makes_etag(db: Connection) -> None:
+    # Given
+    response = Response()
+    await _search_racer_makes(make="Make", response=response)
+    etag = response.headers["ETag"]
+
+    # When
+    result = await _search_racer_makes(
+        make="MakeA", response=Response(), if_none_match=etag
+    )
+
+    # Then
+    assert isinstance(result, Response)
+    assert result.status_code == 304
+    assert result.headers["ETag"] == etag
+
+
 @pytest.mark.asyncio
 async def test_save_race(db: Connection) -> None:
     # Given
@@ -284,6 +690,283 @@ async def test_save_race_with_user(db: Connection) -> None:
     )
 
 
+@pytest.mark.asyncio
+async def test_save_race_counts_pairs(db: Connection) -> None:
+    # When
+    await _save_race(SaveRequest(model_ids=[3, 1, 2]), user=None)
+    await _save_race(SaveRequest(model_ids=[2, 1]), user=None)
+
+    # Then
+    assert _get_race_pair_counts(db) == [(1, 2, 2), (1, 3, 1), (2, 3, 1)]
+
+
+def test_backfill_race_pair_counts(db: Connection) -> None:
+    # Given
+    store_race(db, [3, 2])
+    store_race(db, [3, 2, 1])
+    store_race(db, [4, 1])
+    expected = _get_race_pair_counts(db)
+    db.execute(text("DELETE FROM race_pair_counts"))
+    db.commit()
+
+    # When
+    backfill_race_pair_counts()
+
+    # Then
+    assert _get_race_pair_counts(db) == expected
+    assert expected == [(1, 2, 1), (1, 3, 1), (1, 4, 1), (2, 3, 2)]
+
+
+@pytest.mark.asyncio
+async def test_save_race_statements(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # When
+    first = await _save_race(SaveRequest(model_ids=[1, 2]), user=None)
+    first_statements = list(executed_queries)
+    executed_queries.clear()
+    await _save_race(SaveRequest(model_ids=[2, 1]), user=None)
+
+    # Then
+    assert first.racers == [_racer_from_data(1), _racer_from_data(2)]
+    assert not [query for query in first_statements if query.startswith("SELECT")]
+    assert len(first_statements) == 5  # race_unique, history, racers, pairs, stats
+    assert len(executed_queries) == 4  # race_unique already inserted
+
+
+@pytest.mark.asyncio
+async def test_save_race_unknown_model(db: Connection) -> None:
+    with pytest.raises(HTTPException):
+        await _save_race(SaveRequest(model_ids=[1, 999]), user=None)
+    assert _get_race_count(db) == 0
+
+
+@pytest.mark.asyncio
+async def test_save_race_repeat_within_window(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    user = make_auth_optional(store_user_session(db, store_user(db)))
+    first = await _save_race(SaveRequest(model_ids=[1, 2]), user=user)
+    executed_queries.clear()
+
+    # When
+    repeat = await _save_race(SaveRequest(model_ids=[2, 1]), user=user)
+
+    # Then
+    assert repeat == first
+    assert not executed_queries
+    assert _get_race_count(db) == 1
+
+
+@pytest.mark.asyncio
+async def test_save_race_repeat_by_someone_else(db: Connection) -> None:
+    # Given
+    user = make_auth_optional(store_user_session(db, store_user(db)))
+    first = await _save_race(SaveRequest(model_ids=[1, 2]), user=user)
+
+    # When
+    other = await _save_race(SaveRequest(model_ids=[1, 2]), user=None)
+
+    # Then
+    assert other.race_id != first.race_id
+    assert _get_race_count(db) == 2
+
+
+@pytest.mark.asyncio
+async def test_save_race_repeat_logged_out(db: Connection) -> None:
+    # Given
+    first = await _save_race(SaveRequest(model_ids=[1, 2]), user=None)
+
+    # When
+    repeat = await _save_race(SaveRequest(model_ids=[1, 2]), user=None)
+
+    # Then
+    assert repeat.race_id != first.race_id
+    assert _get_race_count(db) == 2
+    assert _get_race_stats(db, first.race_unique_id).times_raced == 2
+
+
+@pytest.mark.asyncio
+async def test_save_race_repeat_after_window(
+    db: Connection, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Given
+    monkeypatch.setattr(service, "recent_saves", SaveDedup(seconds=0))
+    user = make_auth_optional(store_user_session(db, store_user(db)))
+    first = await _save_race(SaveRequest(model_ids=[1, 2]), user=user)
+
+    # When
+    repeat = await _save_race(SaveRequest(model_ids=[1, 2]), user=user)
+
+    # Then
+    assert repeat.race_id != first.race_id
+
+
+@pytest.mark.asyncio
+async def test_save_race_buffered(
+    db: Connection, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Given
+    buffer = RaceSaveBuffer(flush_seconds=60)
+    monkeypatch.setattr(service, "race_save_buffer", buffer)
+    race_1 = await _save_race(SaveRequest(model_ids=[1, 2, 3]), user=None)
+    race_2 = await _save_race(SaveRequest(model_ids=[3, 2, 1]), user=None)
+    token = store_user_session(db, store_user(db))
+    assert race_1.race_id and race_2.race_id
+
+    # Still queued, but served from this worker's cache and votable
+    assert Race.parse_raw((await _get_race(race_1.race_id)).body) == race_1
+    assert _get_race_count(db) == 0
+    vote_request = RaceVoteRequest(race_unique_id=race_1.race_unique_id, vote=1)
+    vote = await _vote_race(vote_request, user=make_auth_required(token))
+    assert vote == SuccessResponse(success=True)
+
+    # When
+    buffer.close()
+    race_cache.clear()
+
+    # Then
+    assert race_2.race_id == race_1.race_id + 1
+    assert Race.parse_raw((await _get_race(race_1.race_id)).body) == race_1
+    assert Race.parse_raw((await _get_race(race_2.race_id)).body) == race_2
+    assert _get_race_count(db) == 2
+    assert _get_race_pair_counts(db) == [(1, 2, 2), (1, 3, 2), (2, 3, 2)]
+    assert _get_race_combination_counts(db) == [("1,2,3", 2)]
+    assert _get_race_stats(db, race_1.race_unique_id).times_raced == 2
+
+
+@pytest.mark.asyncio
+async def test_save_race_buffered_unknown_model(
+    db: Connection, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(service, "race_save_buffer", RaceSaveBuffer())
+    with pytest.raises(HTTPException):
+        await _save_race(SaveRequest(model_ids=[1, 999]), user=None)
+
+
+@pytest.mark.asyncio
+async def test_save_race_counts_times_raced(db: Connection) -> None:
+    # Given
+    await _save_race(SaveRequest(model_ids=[1, 2]), user=None)
+
+    # When
+    await _save_race(SaveRequest(model_ids=[2, 1]), user=None)
+
+    # Then
+    stats = _get_race_stats(db, make_unique_race_id([1, 2]))
+    assert stats.times_raced == 2
+    assert stats.last_raced_at
+    assert (stats.upvotes, stats.downvotes, stats.comment_count) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_save_race_counts_combinations(db: Connection) -> None:
+    # When
+    await _save_race(SaveRequest(model_ids=[3, 2, 1]), user=None)
+    await _save_race(SaveRequest(model_ids=[4, 1, 2, 3]), user=None)
+
+    # Then
+    assert _get_race_combination_counts(db) == [
+        ("1,2,3", 2),
+        ("1,2,3,4", 1),
+        ("1,2,4", 1),
+        ("1,3,4", 1),
+        ("2,3,4", 1),
+    ]
+
+
+def test_backfill_race_combination_counts(db: Connection) -> None:
+    # Given
+    store_race(db, [3, 2, 1])
+    store_race(db, [1, 2, 3, 4, 4])
+    store_race(db, [5, 6])
+    expected = _get_race_combination_counts(db)
+    db.execute(text("DELETE FROM race_combination_counts"))
+    db.commit()
+
+    # When
+    backfill_race_combination_counts()
+
+    # Then
+    assert _get_race_combination_counts(db) == expected
+    assert len(expected) == 5
+
+
+@pytest.mark.asyncio
+async def test_get_popular_combinations(db: Connection) -> None:
+    # Given
+    race_id_1, race_unique_id_1 = store_race(db, [1, 2, 3])
+    store_race(db, [1, 2, 3])
+    store_race(db, [1, 2, 3])
+    store_race(db, [1, 2, 3, 4])
+    race_id_2, race_unique_id_2 = store_race(db, [2, 3, 4])
+    store_race(db, [2, 3, 4])
+    store_race(db, [1, 5, 6, 2])
+    store_race(db, [1, 5, 6, 3])
+
+    # When
+    triples = RaceListing.parse_raw(
+        (await _get_insight_popular_combinations(racer_count=3)).body
+    )
+    fours = RaceListing.parse_raw(
+        (await _get_insight_popular_combinations(racer_count=4)).body
+    )
+
+    # Then
+    assert triples == RaceListing(
+        races=[
+            Race(
+                race_id=race_id_1,
+                race_unique_id=race_unique_id_1,
+                racers=[_racer_from_data(model_id) for model_id in (1, 2, 3)],
+            ),
+            Race(
+                race_id=race_id_2,
+                race_unique_id=race_unique_id_2,
+                racers=[_racer_from_data(model_id) for model_id in (2, 3, 4)],
+            ),
+            Race(
+                race_id=None,
+                race_unique_id=make_unique_race_id([1, 5, 6]),
+                racers=[_racer_from_data(model_id) for model_id in (1, 5, 6)],
+            ),
+        ]
+    )
+    assert fours == RaceListing(races=[])  # Each raced once
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("racer_count", (2, 5))
+async def test_get_popular_combinations_invalid_size(
+    db: Connection, racer_count: int
+) -> None:
+    with pytest.raises(HTTPException):
+        await _get_insight_popular_combinations(racer_count=racer_count)
+
+
+def test_reconcile_race_stats(db: Connection) -> None:
+    # Given
+    user_id_1 = store_user(db)
+    user_id_2 = store_user(db)
+    race_id, race_unique_id = store_race(db, [1, 2])
+    store_race(db, [2, 1])
+    _store_race_vote(db, race_unique_id, user_id_1, 1)
+    _store_race_vote(db, race_unique_id, user_id_2, 0)
+    increment_race_stat(db, race_unique_id, "upvotes")  # Drifted
+    db.execute(text("DELETE FROM race_unique_stats WHERE times_raced = 0"))
+    db.commit()
+
+    # When
+    reconcile_race_stats()
+
+    # Then
+    stats = _get_race_stats(db, race_unique_id)
+    assert (stats.upvotes, stats.downvotes) == (1, 1)
+    assert (stats.times_raced, stats.comment_count) == (2, 0)
+    assert stats.last_raced_at
+
+
 @pytest.mark.asyncio
 async def test_get_popular_pairs(db: Connection) -> None:
     # Given
@@ -294,7 +977,7 @@ async def test_get_popular_pairs(db: Connection) -> None:
     race_id_2, race_unique_id_2 = store_race(db, [1, 2])
 
     # When
-    results = await _get_insight_popular_pairs()
+    results = RaceListing.parse_raw((await _get_insight_popular_pairs()).body)
 
     # Then
     assert results == RaceListing(
@@ -320,7 +1003,7 @@ async def test_get_popular_pairs(db: Connection) -> None:
 
 
 @pytest.mark.asyncio
-async def test_get_popular_pairs_creates_race(db: Connection) -> None:
+async def test_get_popular_pairs_unraced_pair(db: Connection) -> None:
     # Given
     store_race(db, [3, 2, 5])
     store_race(db, [3, 4])
@@ -329,13 +1012,13 @@ async def test_get_popular_pairs_creates_race(db: Connection) -> None:
     race_id, race_unique_id_1 = store_race(db, [1, 2])
 
     # When
-    results = await _get_insight_popular_pairs()
+    results = RaceListing.parse_raw((await _get_insight_popular_pairs()).body)
 
     # Then
     assert results == RaceListing(
         races=[
             Race(
-                race_id=6,  # Created
+                race_id=None,  # Never raced on its own
                 race_unique_id=make_unique_race_id([2, 3]),
                 racers=[
                     _racer_from_data(2),
@@ -352,6 +1035,8 @@ async def test_get_popular_pairs_creates_race(db: Connection) -> None:
             ),
         ],
     )
+    assert _get_race_count(db) == 5
+    assert not _get_race_unique(db, make_unique_race_id([2, 3]))
 
 
 @pytest.mark.asyncio
@@ -364,13 +1049,13 @@ async def test_get_popular_pairs_multi_same_race(db: Connection) -> None:
     race_id, race_unique_id = store_race(db, [1, 5])
 
     # When
-    results = await _get_insight_popular_pairs()
+    results = RaceListing.parse_raw((await _get_insight_popular_pairs()).body)
 
     # Then
     assert results == RaceListing(
         races=[
             Race(
-                race_id=6,  # Created
+                race_id=None,  # Never raced on its own
                 race_unique_id=make_unique_race_id([1, 3]),
                 racers=[
                     _racer_from_data(1),
@@ -386,7 +1071,7 @@ async def test_get_popular_pairs_multi_same_race(db: Connection) -> None:
                 ],
             ),
             Race(
-                race_id=7,  # Created
+                race_id=None,  # Never raced on its own
                 race_unique_id=make_unique_race_id([3, 5]),
                 racers=[
                     _racer_from_data(3),
@@ -395,6 +1080,7 @@ async def test_get_popular_pairs_multi_same_race(db: Connection) -> None:
             ),
         ],
     )
+    assert _get_race_count(db) == 5
 
 
 @pytest.mark.asyncio
@@ -404,18 +1090,18 @@ async def test_get_recent_races(db: Connection) -> None:
     race_id_3, race_unique_id_3 = store_race(db, [3, 5, 1])
 
     # When
-    results = await _get_insight_recent_races()
+    results = RaceListing.parse_raw((await _get_insight_recent_races()).body)
 
     # Then
     assert results == RaceListing(
         races=[
             Race(
-                race_id=race_id_1,
-                race_unique_id=race_unique_id_1,
+                race_id=race_id_3,
+                race_unique_id=race_unique_id_3,
                 racers=[
-                    _racer_from_data(1),
                     _racer_from_data(3),
                     _racer_from_data(5),
+                    _racer_from_data(1),
                 ],
             ),
             Race(
@@ -428,18 +1114,50 @@ async def test_get_recent_races(db: Connection) -> None:
                 ],
             ),
             Race(
-                race_id=race_id_3,
-                race_unique_id=race_unique_id_3,
+                race_id=race_id_1,
+                race_unique_id=race_unique_id_1,
                 racers=[
+                    _racer_from_data(1),
                     _racer_from_data(3),
                     _racer_from_data(5),
-                    _racer_from_data(1),
                 ],
             ),
         ],
     )
 
 
+@pytest.mark.asyncio
+async def test_get_recent_races_query_count(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    for model_ids in ([1, 3, 5], [3, 4, 1], [3, 5, 1], [2, 6], [1, 2]):
+        store_race(db, model_ids)
+
+    # When
+    results = RaceListing.parse_raw((await _get_insight_recent_races()).body)
+
+    # Then
+    assert len(results.races) == 5
+    assert len(executed_queries) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_popular_pairs_query_count(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    for model_ids in ([3, 2], [3, 2], [1, 2], [1, 2], [1, 5], [5, 1]):
+        store_race(db, model_ids)
+
+    # When
+    results = RaceListing.parse_raw((await _get_insight_popular_pairs()).body)
+
+    # Then
+    assert len(results.races) == 3
+    assert len(executed_queries) == 4
+
+
 @pytest.mark.asyncio
 async def test_get_recent_races_with_user(db: Connection) -> None:
     # Given
@@ -449,28 +1167,28 @@ async def test_get_recent_races_with_user(db: Connection) -> None:
     store_race(db, [3, 5, 1])
 
     # When
-    results = await _get_insight_recent_races(user_id)
+    results = RaceListing.parse_raw((await _get_insight_recent_races(user_id)).body)
 
     # Then
     assert results == RaceListing(
         races=[
             Race(
-                race_id=race_id_1,
-                race_unique_id=race_unique_id_1,
+                race_id=race_id_2,
+                race_unique_id=race_unique_id_2,
                 racers=[
-                    _racer_from_data(1),
                     _racer_from_data(3),
-                    _racer_from_data(5),
+                    _racer_from_data(4),
+                    _racer_from_data(1),
                 ],
                 user_id=user_id,
             ),
             Race(
-                race_id=race_id_2,
-                race_unique_id=race_unique_id_2,
+                race_id=race_id_1,
+                race_unique_id=race_unique_id_1,
                 racers=[
-                    _racer_from_data(3),
-                    _racer_from_data(4),
                     _racer_from_data(1),
+                    _racer_from_data(3),
+                    _racer_from_data(5),
                 ],
                 user_id=user_id,
             ),
@@ -478,6 +1196,110 @@ async def test_get_recent_races_with_user(db: Connection) -> None:
     )
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("user", (False, True))
+async def test_get_recent_races_pages(
+    db: Connection, monkeypatch: pytest.MonkeyPatch, user: bool
+) -> None:
+    # Given
+    monkeypatch.setattr(service, "_MAX_RECENT_RACES", 2)
+    monkeypatch.setattr(recent, "recent_races", RecentRaces(2))
+    user_id = store_user(db) if user else None
+    race_ids = [store_race(db, [1, 2], user_id=user_id)[0] for _ in range(5)]
+    other_race_id, _ = store_race(db, [1, 3])
+
+    # When
+    pages = []
+    cursor = None
+    while True:
+        page = RaceListing.parse_raw(
+            (await _get_insight_recent_races(user_id, cursor=cursor)).body
+        )
+        pages.append([race.race_id for race in page.races])
+        if not (cursor := page.next_cursor):
+            break
+
+    # Then
+    expected = race_ids[::-1] if user else [other_race_id, *race_ids[::-1]]
+    assert pages == [expected[i : i + 2] for i in range(0, len(expected), 2)]
+
+
+@pytest.mark.asyncio
+async def test_get_recent_races_served_from_memory(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    race_id_1, _ = store_race(db, [1, 3, 5])
+    await _get_insight_recent_races()
+    race_2 = await _save_race(SaveRequest(model_ids=[2, 4]), user=None)
+    executed_queries.clear()
+
+    # When
+    results = RaceListing.parse_raw((await _get_insight_recent_races()).body)
+
+    # Then
+    assert [race.race_id for race in results.races] == [race_2.race_id, race_id_1]
+    assert not executed_queries
+
+
+@pytest.mark.asyncio
+async def test_recent_races_refresh_picks_up_other_saves(db: Connection) -> None:
+    # Given
+    race_id_1, _ = store_race(db, [1, 3, 5])
+    await _get_insight_recent_races()
+    race_id_2, _ = store_race(db, [2, 4])  # As if saved by another worker
+
+    # When
+    before = RaceListing.parse_raw((await _get_insight_recent_races()).body)
+    recent_races.refresh()
+    after = RaceListing.parse_raw((await _get_insight_recent_races()).body)
+
+    # Then
+    assert [race.race_id for race in before.races] == [race_id_1]
+    assert [race.race_id for race in after.races] == [race_id_2, race_id_1]
+
+
+@pytest.mark.asyncio
+async def test_recent_races_refresh_without_changes(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    store_race(db, [1, 3, 5])
+    await _get_insight_recent_races()
+    executed_queries.clear()
+
+    # When
+    recent_races.refresh()
+
+    # Then
+    assert len(executed_queries) == 1
+
+
+def test_recent_races_ring_buffer() -> None:
+    # Given
+    buffer = RecentRaces(2)
+    buffer._races = deque(maxlen=2)
+    created_at = datetime(2024, 1, 1)
+
+    # When
+    for race_id in (1, 2, 3):
+        buffer.add(race_id, created_at, b'{"race_id":%d}' % race_id)
+
+    # Then
+    assert buffer.seeded
+    assert json.loads(buffer.listing_json()) == {
+        "races": [{"race_id": 3}, {"race_id": 2}],
+        "next_cursor": make_race_cursor(created_at, 2),
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cursor", ("bad", "2024-01-01T00:00:00_x", "_1"))
+async def test_get_recent_races_bad_cursor(db: Connection, cursor: str) -> None:
+    with pytest.raises(HTTPException):
+        await _get_insight_recent_races(cursor=cursor)
+
+
 @pytest.mark.asyncio
 async def test_get_votes(db: Connection) -> None:
     # Given
@@ -496,6 +1318,71 @@ async def test_get_votes(db: Connection) -> None:
     assert results == RaceVotesResponse(upvotes=2, downvotes=1)
 
 
+@pytest.mark.asyncio
+async def test_get_votes_no_votes(db: Connection) -> None:
+    # Given
+    race_id, race_unique_id = store_race(db, [1, 2])
+
+    # When
+    results = await _get_votes(race_unique_id)
+
+    # Then
+    assert results == RaceVotesResponse(upvotes=0, downvotes=0)
+
+
+@pytest.mark.asyncio
+async def test_get_votes_unknown_race(db: Connection) -> None:
+    results = await _get_votes("unknown")
+    assert results == RaceVotesResponse(upvotes=0, downvotes=0)
+
+
+@pytest.mark.asyncio
+async def test_get_votes_batch(db: Connection, executed_queries: list[str]) -> None:
+    # Given
+    user_id_1 = store_user(db)
+    user_id_2 = store_user(db)
+    token = store_user_session(db, user_id_1)
+    race_id_1, race_unique_id_1 = store_race(db, [1, 2])
+    race_id_2, race_unique_id_2 = store_race(db, [1, 3])
+    _store_race_vote(db, race_unique_id_1, user_id_1, 1)
+    _store_race_vote(db, race_unique_id_1, user_id_2, 0)
+    _store_race_vote(db, race_unique_id_2, user_id_2, 1)
+    request = RaceVotesBatchRequest(
+        race_unique_ids=[race_unique_id_2, "unknown", race_unique_id_1]
+    )
+    user = make_auth_optional(token)
+    executed_queries.clear()
+    checkouts = pool_checkouts.count
+
+    # When
+    with request_scope():
+        result = await _get_votes_batch(request, user=user)
+
+    # Then
+    assert result == RaceVotesBatchResponse(
+        votes=[
+            RaceVotesSummary(
+                race_unique_id=race_unique_id_2, upvotes=1, downvotes=0, voted=False
+            ),
+            RaceVotesSummary(
+                race_unique_id="unknown", upvotes=0, downvotes=0, voted=False
+            ),
+            RaceVotesSummary(
+                race_unique_id=race_unique_id_1, upvotes=1, downvotes=1, voted=True
+            ),
+        ]
+    )
+    assert len(executed_queries) == 2
+    assert pool_checkouts.count - checkouts == 2
+
+
+@pytest.mark.asyncio
+async def test_get_votes_batch_too_many(db: Connection) -> None:
+    request = RaceVotesBatchRequest(race_unique_ids=["abc"] * 51)
+    with pytest.raises(HTTPException):
+        await _get_votes_batch(request, user=None)
+
+
 @pytest.mark.asyncio
 async def test_vote_race(db: Connection) -> None:
     # Given
@@ -511,6 +1398,26 @@ async def test_vote_race(db: Connection) -> None:
     votes = _get_race_votes(db, race_unique_id)
     assert votes[0].vote == vote_request.vote
     assert len(votes) == 1
+    stats = _get_race_stats(db, race_unique_id)
+    assert (stats.upvotes, stats.downvotes) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_vote_race_one_checkout(db: Connection) -> None:
+    # Given
+    token = store_user_session(db, store_user(db))
+    race_id, race_unique_id = store_race(db, [1, 2])
+    vote_request = RaceVoteRequest(race_unique_id=race_unique_id, vote=1)
+    checkouts = pool_checkouts.count
+
+    # When
+    with request_scope():
+        result = await _vote_race(vote_request, user=make_auth_required(token))
+
+    # Then
+    assert result == SuccessResponse(success=True)
+    assert pool_checkouts.count - checkouts == 1
+    assert any(dep.dependency is request_connection for dep in router.dependencies)
 
 
 @pytest.mark.asyncio
@@ -528,6 +1435,26 @@ async def test_vote_race_already_voted(db: Connection) -> None:
 
     votes = _get_race_votes(db, race_unique_id)
     assert len(votes) == 1
+    assert _get_race_stats(db, race_unique_id).upvotes == 1
+
+
+@pytest.mark.asyncio
+async def test_vote_race_change_vote(db: Connection) -> None:
+    # Given
+    user_id = store_user(db)
+    token = store_user_session(db, user_id)
+    race_id, race_unique_id = store_race(db, [1, 2])
+    _store_race_vote(db, race_unique_id, user_id, 1)
+    vote_request = RaceVoteRequest(race_unique_id=race_unique_id, vote=0)
+
+    # When
+    result = await _vote_race(vote_request, user=make_auth_required(token))
+
+    # Then
+    assert result == SuccessResponse(success=True)
+    votes = _get_race_votes(db, race_unique_id)
+    assert [vote.vote for vote in votes] == [0]
+    assert await _get_votes(race_unique_id) == RaceVotesResponse(upvotes=0, downvotes=1)
 
 
 @pytest.mark.asyncio
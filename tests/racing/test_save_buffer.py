@@ -0,0 +1,93 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from src.racing import save_buffer
+from src.racing.save_buffer import PendingRace, RaceSaveBuffer
+
+
+class _FakeDB:
+    @contextmanager
+    def connect(self) -> Iterator[Mock]:
+        yield Mock()
+
+
+def _race(race_id: int) -> PendingRace:
+    return PendingRace(race_id, datetime(2024, 1, 1), None, "abc", [1, 2], {}, {})
+
+
+@pytest.fixture(autouse=True)
+def fake_db(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(save_buffer, "db", _FakeDB())
+    monkeypatch.setattr(save_buffer, "RETRY_SECONDS", 0)
+
+
+def _writer(monkeypatch: pytest.MonkeyPatch, fail: Mock) -> list[list[int]]:
+    written: list[list[int]] = []
+
+    def write_races(conn: Mock, races: list[PendingRace]) -> None:
+        fail(races)
+        written.append([race.id for race in races])
+
+    monkeypatch.setattr(save_buffer, "write_races", write_races)
+    return written
+
+
+def test_retries_failed_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    error = OperationalError("INSERT", {}, Exception("gone away"))
+    written = _writer(monkeypatch, Mock(side_effect=[error, None]))
+    buffer = RaceSaveBuffer(flush_seconds=60)
+
+    # When
+    buffer.put(_race(1))
+    buffer.put(_race(2))
+    buffer.close()
+
+    # Then
+    assert written == [[1, 2]]
+
+
+def test_splits_batch_around_bad_race(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    def fail(races: list[PendingRace]) -> None:
+        if any(race.id == 3 for race in races):
+            raise IntegrityError("INSERT", {}, Exception("duplicate"))
+
+    written = _writer(monkeypatch, Mock(side_effect=fail))
+    buffer = RaceSaveBuffer(flush_seconds=60)
+
+    # When
+    for race_id in range(1, 5):
+        buffer.put(_race(race_id))
+    buffer.close()
+
+    # Then
+    assert written == [[1, 2], [4]]
+
+
+def test_writer_survives_unexpected_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    fail = Mock(side_effect=[ValueError("bad"), None])
+    written = _writer(monkeypatch, fail)
+    buffer = RaceSaveBuffer(flush_seconds=0)
+    buffer.put(_race(1))
+    while not fail.called:
+        time.sleep(0.001)
+    writer = buffer._thread
+    assert writer is not None
+
+    # When
+    buffer.put(_race(2))
+    while not written:
+        time.sleep(0.001)
+
+    # Then
+    assert written == [[2]]
+    assert buffer._thread is writer and writer.is_alive()
+    buffer.close()
@@ -6,6 +6,7 @@ from fastapi import HTTPException
 from freezegun.api import FrozenDateTimeFactory
 from sqlalchemy import Connection, Row, text
 
+from src.database import pool_checkouts, request_connection, request_scope
 from src.social.models import (
     AddCommentRequest,
     Comment,
@@ -13,9 +14,10 @@ from src.social.models import (
     DeleteCommentRequest,
     SuccessResponse,
 )
-from src.social.routes import _add_comment, _delete_comment, _get_comments
+from src.social.routes import _add_comment, _delete_comment, _get_comments, router
 from tests.dummy_data import TEST_DATA_MAKES, TEST_DATA_MODELS
 from tests.factories import (
+    increment_race_stat,
     make_auth_optional,
     make_auth_required,
     store_garage_item,
@@ -29,9 +31,11 @@ from tests.factories import (
 def clear_comments(db: Connection) -> Generator:
     yield
     db.execute(text("DELETE FROM race_racers"))
+    db.execute(text("DELETE FROM race_pair_counts"))
     db.execute(text("DELETE FROM race_history"))
     db.execute(text("ALTER TABLE race_history AUTO_INCREMENT = 1"))
     db.execute(text("DELETE FROM race_comments"))
+    db.execute(text("DELETE FROM race_unique_stats"))
     db.execute(text("DELETE FROM race_unique"))
     db.commit()
 
@@ -49,6 +53,7 @@ def _store_comment(
     txt: str = "Comment text",
 ) -> int:
     created_at = int(datetime.timestamp(datetime.now()))
+    increment_race_stat(db, race_unique_id, "comment_count")
     result = db.execute(
         text(
             _insert_comment_query.format(
@@ -67,6 +72,20 @@ def _get_first_comment(db: Connection) -> Row:
     return db.execute(text("SELECT * FROM race_comments")).first()
 
 
+def _get_comment_count(db: Connection, race_unique_id: str) -> int:
+    return cast(
+        int,
+        db.execute(
+            text(
+                "SELECT comment_count FROM race_unique_stats "
+                f"WHERE race_unique_id='{race_unique_id}'"
+            )
+        )
+        .one()
+        .comment_count,
+    )
+
+
 #############
 ### TESTS ###
 #############
@@ -93,6 +112,7 @@ async def test_add_comment(db: Connection, freezer: FrozenDateTimeFactory) -> No
     assert comment.race_unique_id == add_comment_request.race_unique_id
     assert comment.user_id == user_id
     assert comment.created_at == expected_created_at
+    assert _get_comment_count(db, race_unique_id) == 1
 
 
 @pytest.mark.asyncio
@@ -112,6 +132,26 @@ async def test_delete_comment(db: Connection) -> None:
     # Then
     assert not _get_first_comment(db)
     assert result.success
+    assert _get_comment_count(db, race_unique_id) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_comment_other_user(db: Connection) -> None:
+    # Given
+    user_id_1 = store_user(db, username="user1")
+    user_id_2 = store_user(db, username="user2")
+    token = store_user_session(db, user_id_2)
+    race_id, race_unique_id = store_race(db, [1, 2])
+    comment_id = _store_comment(db, user_id_1, race_unique_id)
+
+    # When
+    await _delete_comment(
+        DeleteCommentRequest(comment_id=comment_id), user=make_auth_required(token)
+    )
+
+    # Then
+    assert _get_first_comment(db)
+    assert _get_comment_count(db, race_unique_id) == 1
 
 
 @pytest.mark.asyncio
@@ -157,3 +197,23 @@ async def test_get_comments(db: Connection, freezer: FrozenDateTimeFactory) -> N
             ),
         ]
     )
+
+
+@pytest.mark.asyncio
+async def test_get_comments_one_checkout(db: Connection) -> None:
+    # Given
+    race_id, race_unique_id = store_race(db, [1, 2, 3])
+    for username in ("user1", "user2", "user3"):
+        user_id = store_user(db, username=username)
+        store_garage_item(db, user_id, 1, "OWNS")
+        _store_comment(db, user_id, race_unique_id)
+    checkouts = pool_checkouts.count
+
+    # When
+    with request_scope():
+        result = await _get_comments(race_unique_id)
+
+    # Then
+    assert len(result.comments) == 3
+    assert pool_checkouts.count - checkouts == 1
+    assert any(dep.dependency is request_connection for dep in router.dependencies)
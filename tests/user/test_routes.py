@@ -3,12 +3,14 @@ from typing import Generator, cast
 from unittest.mock import Mock
 
 import pytest
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from freezegun.api import FrozenDateTimeFactory
 from sqlalchemy import Connection, Row, text
 
-from src.auth import SESSION_KEY_NAME
+from src import tokens
+from src.auth import SESSION_KEY_NAME, auth_required_fresh, session_cache
 from src.constants import GarageItemRelations
+from src.database import pool_checkouts, request_connection, request_scope
 from src.user import service as user_service
 from src.user.models import (
     ChangePasswordRequest,
@@ -36,9 +38,11 @@ from src.user.routes import (
     _login_user,
     _logout_user,
     _signup_user,
+    router,
 )
 from tests.factories import (
     encrypt_password,
+    make_auth_optional,
     make_auth_required,
     store_garage_item,
     store_user,
@@ -46,19 +50,22 @@ from tests.factories import (
 )
 
 
-class MockResponse:
+class MockResponse(Response):
     def __init__(self) -> None:
+        super().__init__()
         self.cookie_key: str | None = None
         self.cookie_value: str | None = None
         self.cookie_deleted: bool = False
         self.expires: int | None = None
 
-    def set_cookie(self, key: str, value: str, expires: int) -> None:
+    def set_cookie(  # type: ignore[override]
+        self, key: str, value: str = "", expires: int | None = None
+    ) -> None:
         self.cookie_key = key
         self.cookie_value = value
         self.expires = expires
 
-    def delete_cookie(self, key: str) -> None:
+    def delete_cookie(self, key: str) -> None:  # type: ignore[override]
         self.cookie_deleted = True
 
 
@@ -67,8 +74,16 @@ def clear(db: Connection) -> Generator:
     yield
     db.execute(text("DELETE FROM user_garage"))
     db.execute(text("DELETE FROM user_sessions"))
+    db.execute(text("DELETE FROM token_revocations"))
     db.execute(text("DELETE FROM users"))
     db.commit()
+    session_cache.clear()
+    tokens.token_versions.clear()
+
+
+@pytest.fixture
+def signed_tokens(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tokens, "SESSION_SECRET", "test-secret")
 
 
 def _get_first_user_session(db: Connection) -> Row:
@@ -133,6 +148,67 @@ async def test_get_user_no_token(db: Connection) -> None:
         await _get_user(user=make_auth_required("bad"))
 
 
+@pytest.mark.asyncio
+async def test_get_user_cached(db: Connection, executed_queries: list[str]) -> None:
+    # Given
+    token = store_user_session(db, user_id=store_user(db))
+    make_auth_required(token)
+    executed_queries.clear()
+
+    # When
+    result = await _get_user(user=make_auth_required(token))
+
+    # Then
+    assert result.username == "user123"
+    assert not executed_queries
+
+
+@pytest.mark.asyncio
+async def test_get_user_bogus_token_cached(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    assert make_auth_optional("bogus") is None
+    executed_queries.clear()
+
+    # When
+    result = make_auth_optional("bogus")
+
+    # Then
+    assert result is None
+    assert not executed_queries
+
+
+@pytest.mark.asyncio
+async def test_get_user_expired_session(db: Connection) -> None:
+    # Given
+    expire = int(datetime.timestamp(datetime.now())) - 1
+    token = store_user_session(db, user_id=store_user(db), expire=expire)
+
+    # When / Then
+    with pytest.raises(HTTPException):
+        await _get_user(user=make_auth_required(token))
+
+
+@pytest.mark.asyncio
+async def test_get_user_session_expiry_caps_cache(
+    db: Connection, executed_queries: list[str], freezer: FrozenDateTimeFactory
+) -> None:
+    # Given
+    expire = int(datetime.timestamp(datetime.now())) + 5
+    token = store_user_session(db, user_id=store_user(db), expire=expire)
+    make_auth_required(token)
+    executed_queries.clear()
+
+    # When
+    freezer.tick(10)
+
+    # Then
+    with pytest.raises(HTTPException):
+        make_auth_required(token)
+    assert len(executed_queries) == 1
+
+
 @pytest.mark.asyncio
 async def test_sign_up_success(db: Connection, mock_send_mail: Mock) -> None:
     # Given
@@ -342,6 +418,20 @@ async def test_logout_user(db: Connection) -> None:
     assert _get_user_session_count(db) == 0
 
 
+@pytest.mark.asyncio
+async def test_logout_user_forgets_cached_session(db: Connection) -> None:
+    # Given
+    token = store_user_session(db, store_user(db))
+    make_auth_required(token)
+
+    # When
+    await _logout_user(MockResponse(), token)
+
+    # Then
+    with pytest.raises(HTTPException):
+        make_auth_required(token)
+
+
 @pytest.mark.asyncio
 async def test_logout_user_fails(db: Connection) -> None:
     # Given
@@ -355,6 +445,130 @@ async def test_logout_user_fails(db: Connection) -> None:
     assert not mock_response.cookie_deleted
 
 
+@pytest.mark.asyncio
+async def test_login_user_one_checkout(db: Connection) -> None:
+    # Given
+    user_id = store_user(db)
+    store_user_session(db, user_id, expire=int(datetime.timestamp(datetime.now())) - 1)
+    login_request = LoginRequest(username="user123", password="pass123")
+    checkouts = pool_checkouts.count
+
+    # When
+    with request_scope():
+        result = await _login_user(login_request, MockResponse())
+
+    # Then
+    assert result == SuccessResponse(success=True)
+    assert _get_user_session_count(db) == 1
+    assert pool_checkouts.count - checkouts == 1
+    assert any(dep.dependency is request_connection for dep in router.dependencies)
+
+
+@pytest.mark.asyncio
+async def test_login_user_signed_token(
+    db: Connection, signed_tokens: None, executed_queries: list[str]
+) -> None:
+    # Given
+    user_id = store_user(db)
+    mock_response = MockResponse()
+    login_request = LoginRequest(username="user123", password="pass123")
+
+    # When
+    result = await _login_user(login_request, mock_response)
+    token = cast(str, mock_response.cookie_value)
+    make_auth_required(token)
+    executed_queries.clear()
+    user = make_auth_required(token)
+
+    # Then
+    assert result == SuccessResponse(success=True)
+    assert tokens.is_signed_token(token)
+    assert _get_user_session_count(db) == 0
+    assert (user.id, user.username, user.email) == (
+        user_id,
+        "user123",
+        "test@gmail.com",
+    )
+    assert executed_queries == []
+
+
+@pytest.mark.asyncio
+async def test_logout_user_signed_token(db: Connection, signed_tokens: None) -> None:
+    # Given
+    store_user(db)
+    mock_response = MockResponse()
+    await _login_user(
+        LoginRequest(username="user123", password="pass123"), mock_response
+    )
+    token = cast(str, mock_response.cookie_value)
+
+    # When
+    result = await _logout_user(mock_response, token)
+
+    # Then
+    assert result == SuccessResponse(success=True)
+    assert mock_response.cookie_deleted
+    with pytest.raises(HTTPException):
+        make_auth_required(token)
+
+
+@pytest.mark.asyncio
+async def test_edit_field_user_signed_token(
+    db: Connection, signed_tokens: None
+) -> None:
+    # Given
+    store_user(db)
+    login_response, edit_response = MockResponse(), MockResponse()
+    await _login_user(
+        LoginRequest(username="user123", password="pass123"), login_response
+    )
+    token = cast(str, login_response.cookie_value)
+    edit_field_request = EditUserFieldRequest(field="username", value="user123456")
+
+    user = make_auth_required(token)
+
+    # When
+    result = await _edit_field_user(edit_field_request, edit_response, user=user)
+
+    # Then
+    assert result == SuccessResponse(success=True)
+    with pytest.raises(HTTPException):
+        make_auth_required(token)
+    new_user = make_auth_required(cast(str, edit_response.cookie_value))
+    assert new_user.username == "user123456"
+    assert new_user.expire == user.expire
+
+
+@pytest.mark.asyncio
+async def test_change_password_user_signed_token(
+    db: Connection, signed_tokens: None
+) -> None:
+    # Given
+    store_user(db)
+    login_request = LoginRequest(username="user123", password="pass123")
+    other_response, this_response, change_response = (
+        MockResponse(),
+        MockResponse(),
+        MockResponse(),
+    )
+    await _login_user(login_request, other_response)
+    await _login_user(login_request, this_response)
+    other_token = cast(str, other_response.cookie_value)
+    this_token = cast(str, this_response.cookie_value)
+    change_request = ChangePasswordRequest(old="pass123", new="newpass123")
+
+    # When
+    result = await _change_password_user(
+        change_request, change_response, user=make_auth_required(this_token)
+    )
+
+    # Then
+    assert result == SuccessResponse(success=True)
+    with pytest.raises(HTTPException):
+        make_auth_required(other_token)
+    assert make_auth_required(cast(str, change_response.cookie_value))
+
+
 @pytest.mark.asyncio
 async def test_forgot_password_success(db: Connection, mock_send_mail: Mock) -> None:
     # Given
@@ -407,6 +621,7 @@ async def test_change_password_user(db: Connection) -> None:
     # When
     result = await _change_password_user(
         change_password_request,
+        MockResponse(),
         user=make_auth_required(token),
     )
 
@@ -429,6 +644,7 @@ async def test_change_password_user_bad_auth(db: Connection) -> None:
     # When
     result = await _change_password_user(
         change_password_request,
+        MockResponse(),
         user=make_auth_required(token),
     )
 
@@ -454,6 +670,7 @@ async def test_change_password_user_invalid(db: Connection) -> None:
     # When
     result = await _change_password_user(
         change_password_request,
+        MockResponse(),
         user=make_auth_required(token),
     )
 
@@ -481,6 +698,34 @@ async def test_delete_user(db: Connection) -> None:
     # Then
     assert result == SuccessResponse(success=True)
     assert _get_first_user(db).deleted == True
+    assert _get_user_session_count(db) == 0
+    with pytest.raises(HTTPException):
+        make_auth_required(token)
+
+
+@pytest.mark.asyncio
+async def test_get_user_deleted(db: Connection) -> None:
+    # Given
+    token = store_user_session(db, user_id=store_user(db, deleted=True))
+
+    # When / Then
+    with pytest.raises(HTTPException):
+        await _get_user(user=make_auth_required(token))
+
+
+def test_auth_required_fresh_skips_cached_session(db: Connection) -> None:
+    # Given
+    token = store_user_session(db, store_user(db))
+    make_auth_required(token)
+    db.execute(text("DELETE FROM user_sessions"))  # Logged out on another worker
+    db.commit()
+
+    # When / Then
+    assert make_auth_required(token)
+    with pytest.raises(HTTPException):
+        auth_required_fresh(token)
+    with pytest.raises(HTTPException):
+        make_auth_required(token)
 
 
 @pytest.mark.asyncio
@@ -493,12 +738,14 @@ async def test_edit_field_user(db: Connection) -> None:
     # When
     result = await _edit_field_user(
         edit_field_request,
+        MockResponse(),
         user=make_auth_required(token),
     )
 
     # Then
     assert result == SuccessResponse(success=True)
     assert _get_first_user(db).username == "user123456"
+    assert make_auth_required(token).username == "user123456"
 
 
 @pytest.mark.asyncio
@@ -512,6 +759,7 @@ async def test_edit_field_user_bad_field(db: Connection) -> None:
     with pytest.raises(HTTPException):
         result = await _edit_field_user(
             edit_field_request,
+            MockResponse(),
             user=make_auth_required(token),
         )
 
@@ -530,6 +778,7 @@ async def test_edit_field_user_username_exists(db: Connection) -> None:
     # When
     result = await _edit_field_user(
         edit_field_request,
+        MockResponse(),
         user=make_auth_required(token),
     )
 
@@ -552,6 +801,7 @@ async def test_edit_field_user_email_exists(db: Connection) -> None:
     # When
     result = await _edit_field_user(
         edit_field_request,
+        MockResponse(),
         user=make_auth_required(token),
     )
 
@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import Generator
+
+import pytest
+from sqlalchemy import Connection, text
+
+from src.user.sweeper import sweep_expired_revocations, sweep_expired_sessions
+from tests.factories import store_token_revocation, store_user, store_user_session
+
+
+@pytest.fixture(scope="function", autouse=True)
+def clear(db: Connection) -> Generator:
+    yield
+    db.execute(text("DELETE FROM user_sessions"))
+    db.execute(text("DELETE FROM token_revocations"))
+    db.execute(text("DELETE FROM users"))
+    db.commit()
+
+
+def test_sweep_expired_sessions_in_batches(
+    db: Connection, executed_queries: list[str]
+) -> None:
+    # Given
+    user_id = store_user(db)
+    timestamp_now = int(datetime.timestamp(datetime.now()))
+    for _ in range(5):
+        store_user_session(db, user_id, expire=timestamp_now - 10)
+    token = store_user_session(db, user_id, expire=timestamp_now + 100)
+    executed_queries.clear()
+
+    # When
+    deleted = sweep_expired_sessions(batch_size=2, pause=0)
+
+    # Then
+    assert deleted == 5
+    assert len(executed_queries) == 3
+    assert [row.token for row in db.execute(text("SELECT * FROM user_sessions"))] == [
+        token
+    ]
+
+
+def test_sweep_expired_revocations(db: Connection) -> None:
+    # Given
+    user_id = store_user(db)
+    timestamp_now = int(datetime.timestamp(datetime.now()))
+    store_token_revocation(db, user_id, 1, expire=timestamp_now - 10)
+    store_token_revocation(db, user_id, 2, expire=timestamp_now + 100)
+
+    # When
+    deleted = sweep_expired_revocations()
+
+    # Then
+    assert deleted == 1
+    assert [
+        row.token_version for row in db.execute(text("SELECT * FROM token_revocations"))
+    ] == [2]
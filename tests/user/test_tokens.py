@@ -0,0 +1,153 @@
+import time
+from typing import Generator
+
+import pytest
+from sqlalchemy import Connection, text
+
+from src import tokens
+from src.tokens import (
+    TokenUser,
+    TokenVersions,
+    make_signed_token,
+    read_signed_token,
+    token_versions,
+    verify_signed_token,
+)
+from tests.factories import store_token_revocation, store_user
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tokens, "SESSION_SECRET", "test-secret")
+    monkeypatch.setattr(token_versions, "_versions", {})
+
+
+def _expire() -> int:
+    return int(time.time()) + 60
+
+
+def _token(expire: int | None = None, version: int = 0) -> str:
+    expire = _expire() if expire is None else expire
+    return make_signed_token(1, "caspar", "c@example.com", expire, version)
+
+
+def test_round_trip() -> None:
+    # Given
+    expire = int(time.time()) + 60
+
+    # When
+    user = verify_signed_token(_token(expire))
+
+    # Then
+    assert user == TokenUser(1, "caspar", "c@example.com", expire, 0)
+
+
+def test_tampered_payload() -> None:
+    # Given
+    prefix, payload, signature = _token().split(".")
+    other_payload = _token(version=1).split(".")[1]
+
+    # When / Then
+    assert read_signed_token(f"{prefix}.{other_payload}.{signature}") is None
+    assert read_signed_token(f"{prefix}.{payload}.{signature[:-2]}") is None
+    assert read_signed_token(f"{prefix}.{payload}") is None
+
+
+def test_other_secret(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    token = _token()
+
+    # When
+    monkeypatch.setattr(tokens, "SESSION_SECRET", "other-secret")
+
+    # Then
+    assert read_signed_token(token) is None
+
+
+def test_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    token = _token()
+
+    # When
+    monkeypatch.setattr(tokens, "SESSION_SECRET", "")
+
+    # Then
+    assert read_signed_token(token) is None
+
+
+def test_expired() -> None:
+    token = _token(expire=int(time.time()) - 1)
+    assert read_signed_token(token) is not None
+    assert verify_signed_token(token) is None
+
+
+def test_revoked(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    old_token, new_token = _token(version=0), _token(version=1)
+
+    # When
+    monkeypatch.setattr(token_versions, "_versions", {1: (1, _expire())})
+
+    # Then
+    assert verify_signed_token(old_token) is None
+    assert verify_signed_token(new_token) is not None
+
+
+def test_version_bumped_on_another_worker(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Given
+    bumped, stale = TokenVersions(), TokenVersions()
+    monkeypatch.setattr(bumped, "_versions", {1: (1, _expire())})
+    monkeypatch.setattr(stale, "_versions", {})
+    old_token, new_token = _token(version=0), _token(version=1)
+
+    # When
+    monkeypatch.setattr(tokens, "token_versions", bumped)
+    on_bumped = verify_signed_token(old_token), verify_signed_token(new_token)
+    monkeypatch.setattr(tokens, "token_versions", stale)
+    on_stale = verify_signed_token(new_token)
+
+    # Then
+    assert on_bumped[0] is None
+    assert on_bumped[1] is not None
+    assert on_stale is not None
+
+
+@pytest.fixture
+def clear_revocations(db: Connection) -> Generator:
+    yield
+    db.execute(text("DELETE FROM token_revocations"))
+    db.execute(text("DELETE FROM users"))
+    db.commit()
+
+
+def test_refresh_reads_unexpired_revocations(
+    db: Connection, clear_revocations: None
+) -> None:
+    # Given
+    user_id = store_user(db)
+    other_id = store_user(db, username="other123", email="other@gmail.com")
+    store_token_revocation(db, other_id, 1, expire=int(time.time()) - 1)
+    stale, bumping = TokenVersions(), TokenVersions()
+    stale.refresh()
+
+    # When
+    bumping.bump(user_id)
+    bumping.bump(user_id)
+    stale.refresh()
+
+    # Then
+    assert stale.get(user_id) == bumping.get(user_id) == 2
+    assert stale.get(other_id) == 0
+    assert db.execute(text("SELECT COUNT(*) FROM token_revocations")).scalar() == 3
+
+
+def test_session_token_is_not_signed() -> None:
+    assert read_signed_token("3f2a9c0e8b7d4f61a5c2e9d08b1f7a34") is None
+
+
+@pytest.mark.parametrize(
+    "token", ("s1.abc.é", "s1.é.abc", "s1.", "s1..", "s1.abc", "s1.a.b.c")
+)
+def test_malformed_token(token: str) -> None:
+    assert read_signed_token(token) is None
+    assert verify_signed_token(token) is None